@@ -38,9 +38,17 @@ else:
     print(f"Superuser '{username}' already exists.")
 EOF
 
+# One worker per queue, so thumbnails never wait behind HLS encodes.
+# The number of parallel ffmpeg processes is limited by the admission
+# control in content_app/api/admission.py, not by the number of workers.
+python manage.py rqworker fast &
 python manage.py rqworker default &
-# python manage.py rqworker fast &
-# python manage.py rqworker heavy &
+for i in $(seq "${RQ_HEAVY_WORKERS:-2}"); do
+  python manage.py rqworker heavy &
+done
+
+# Refill the shared catalog cache after a deploy without delaying the start.
+python manage.py warm_catalog_cache &
 
 exec gunicorn core.wsgi:application \
   --bind 0.0.0.0:8000 \
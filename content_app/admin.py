@@ -1,9 +1,30 @@
 from django.contrib import admin
-from .models import Video
+from .models import Video, VideoMetadata, VideoUpload
+
+
+class VideoMetadataInline(admin.StackedInline):
+    model = VideoMetadata
+    can_delete = False
+    readonly_fields = (
+        'width', 'height', 'fps', 'video_codec', 'video_profile', 'video_level', 'pixel_format', 'bit_depth', 'audio_codec',
+        'bitrate', 'duration', 'keyframe_interval', 'ladder', 'encoder_profile', 'probed_at',
+    )
+
+    def has_add_permission(self, request, obj=None):
+        """Metadata is only written by the probe task."""
+        return False
+
 
 @admin.register(Video)
 class VideoAdmin(admin.ModelAdmin):
     list_display = ('title', 'category', 'created_at')
     search_fields = ('title', 'description')
     list_filter = ('category', 'created_at')
-    readonly_fields = ('created_at', 'uuid')
+    readonly_fields = ('created_at', 'updated_at', 'uuid')
+    inlines = [VideoMetadataInline]
+
+
+@admin.register(VideoUpload)
+class VideoUploadAdmin(admin.ModelAdmin):
+    list_display = ('title', 'offset', 'length', 'video', 'created_at')
+    readonly_fields = ('uuid', 'file', 'length', 'offset', 'video', 'created_at', 'completed_at')
@@ -0,0 +1,88 @@
+import fcntl
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from django.conf import settings
+from rq import get_current_job
+
+FAST_QUEUE = "fast"
+
+
+def _cpu_count():
+    """Returns the number of cores this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _memory_mb():
+    """Returns the total memory of the host in MB, None if it is unknown."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def slot_limits():
+    """
+    Returns how many ffmpeg processes may run at once for regular jobs and
+    for jobs of the fast queue. The capacity follows from the cores and the
+    memory of the host, TRANSCODE_FAST_RESERVED_SLOTS of it are only
+    available to fast jobs, so thumbnails never wait for transcodes.
+    """
+    capacity = _cpu_count() // settings.TRANSCODE_CORES_PER_SLOT
+    memory_mb = _memory_mb()
+    if memory_mb:
+        capacity = min(capacity, memory_mb // settings.TRANSCODE_MEMORY_PER_SLOT_MB)
+    regular = max(1, capacity - settings.TRANSCODE_FAST_RESERVED_SLOTS)
+    return regular, regular + settings.TRANSCODE_FAST_RESERVED_SLOTS
+
+
+def _is_fast_job():
+    """Checks whether the running RQ job was taken from the fast queue."""
+    job = get_current_job()
+    return bool(job and job.origin == FAST_QUEUE)
+
+
+def _try_lock(slot_path: Path):
+    """Opens and locks a slot file, returns the open file or None if it is taken."""
+    slot_file = slot_path.open("a")
+    try:
+        fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        slot_file.close()
+        return None
+    return slot_file
+
+
+@contextmanager
+def transcode_slot():
+    """
+    Blocks until one of the host wide ffmpeg slots is free and holds it for
+    the duration of the block. Slots are lock files shared by all workers of
+    the host, the kernel releases them if a worker dies while holding one.
+    Fast jobs try the reserved slots first.
+    """
+    lock_dir = Path(settings.TRANSCODE_SLOT_DIR)
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    regular, fast = slot_limits()
+    slots = range(fast - 1, -1, -1) if _is_fast_job() else range(regular)
+
+    slot_file = None
+    while not slot_file:
+        for slot in slots:
+            slot_file = _try_lock(lock_dir / f"slot_{slot}.lock")
+            if slot_file:
+                break
+        else:
+            time.sleep(settings.TRANSCODE_SLOT_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        fcntl.flock(slot_file, fcntl.LOCK_UN)
+        slot_file.close()
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from django_redis.exceptions import ConnectionInterrupted
+from redis.exceptions import RedisError, WatchError
+
+VIDEO_KEY = "catalog:video:{video_id}"
+LIST_KEY = "catalog:list:{version}:{cursor}:{page_size}"
+VERSION_KEY = "videoflix:catalog:version"
+CHANGED_KEY = "videoflix:catalog:changed_at"
+LIST_PREFIX = "catalog:list:"
+INVALIDATION_CHANNEL = "videoflix:catalog:invalidate"
+CACHE_ERRORS = (RedisError, ConnectionInterrupted)
+
+
+class CatalogCache:
+    """
+    Two tier cache of serialized catalog payloads. Every worker process
+    keeps the most recently used entries in memory, backed by the Redis
+    cache shared by all workers. List pages are keyed by a catalog version
+    which is bumped on every change. Invalidations are broadcast over
+    Redis pub/sub, so the in-memory tier of every worker drops them too,
+    the local TTL bounds staleness if a message is missed.
+    Entries are stored per origin (scheme and host), because they contain
+    absolute URLs.
+    """
+
+    def __init__(self):
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def _local_get(self, key: str):
+        with self._lock:
+            entry = self._local.get(key)
+            if not entry or entry[1] < time.monotonic():
+                self._local.pop(key, None)
+                return None
+            self._local.move_to_end(key)
+            return entry[0]
+
+    def _local_set(self, key: str, value):
+        with self._lock:
+            self._local[key] = (value, time.monotonic() + settings.CATALOG_LOCAL_CACHE_TTL)
+            self._local.move_to_end(key)
+            while len(self._local) > settings.CATALOG_LOCAL_CACHE_SIZE:
+                self._local.popitem(last=False)
+
+    def _local_drop(self, keys: list, lists: bool = False):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+            if lists:
+                for key in [key for key in self._local if key.startswith(LIST_PREFIX) or key == VERSION_KEY]:
+                    del self._local[key]
+
+    def clear_local(self):
+        """Empties the in-memory tier of this process."""
+        with self._lock:
+            self._local.clear()
+
+    def get(self, key: str, origin: str):
+        """Returns the value stored for the origin or None."""
+        self._start_listener()
+        entry = self._local_get(key)
+        if entry is None:
+            try:
+                entry = cache.get(key)
+            except CACHE_ERRORS:
+                entry = None
+            if entry is not None:
+                self._local_set(key, entry)
+        if entry is None or entry["origin"] != origin:
+            return None
+        return entry["value"]
+
+    def set(self, key: str, origin: str, value, version: int = None):
+        """
+        Stores a value for the origin in both tiers. A value read from the
+        database at the given catalog version is only stored while the
+        version is current, so it cannot overwrite a concurrent invalidation.
+        """
+        entry = {"origin": origin, "value": value}
+        try:
+            if version is None:
+                cache.set(key, entry, settings.CATALOG_CACHE_TTL)
+            elif not self._set_at_version(key, entry, version):
+                self._local_drop([VERSION_KEY])
+                return
+        except CACHE_ERRORS:
+            pass
+        self._local_set(key, entry)
+
+    def _set_at_version(self, key: str, entry: dict, version: int):
+        """Writes an entry to Redis unless the catalog version changed, returns whether it was written."""
+        with get_redis_connection("default").pipeline() as pipeline:
+            try:
+                pipeline.watch(VERSION_KEY)
+                if int(pipeline.get(VERSION_KEY) or 0) != version:
+                    return False
+                pipeline.multi()
+                pipeline.set(cache.client.make_key(key), cache.client.encode(entry), ex=settings.CATALOG_CACHE_TTL)
+                pipeline.execute()
+            except WatchError:
+                return False
+        return True
+
+    def state(self):
+        """
+        Returns the catalog version which list page keys include and the
+        time of the last change, or None if Redis is unavailable. The time
+        is set on first use, so a version restarting after a Redis reset
+        never repeats a former state.
+        """
+        state = self._local_get(VERSION_KEY)
+        if state is None:
+            try:
+                pipeline = get_redis_connection("default").pipeline()
+                pipeline.set(CHANGED_KEY, time.time(), nx=True)
+                pipeline.mget(VERSION_KEY, CHANGED_KEY)
+                _, (version, changed_at) = pipeline.execute()
+            except CACHE_ERRORS:
+                return None
+            state = (int(version or 0), float(changed_at))
+            self._local_set(VERSION_KEY, state)
+        return state
+
+    def invalidate(self, video_ids: list = ()):
+        """
+        Drops the payloads of the given videos and every list page in all
+        workers. List pages are not deleted but orphaned by a new version.
+        """
+        keys = [VIDEO_KEY.format(video_id=video_id) for video_id in video_ids]
+        try:
+            if keys:
+                cache.delete_many(keys)
+            pipeline = get_redis_connection("default").pipeline()
+            pipeline.incr(VERSION_KEY)
+            pipeline.set(CHANGED_KEY, time.time())
+            pipeline.publish(INVALIDATION_CHANNEL, json.dumps(keys))
+            pipeline.execute()
+        except CACHE_ERRORS:
+            pass
+        self._local_drop(keys, lists=True)
+
+    def _start_listener(self):
+        """Starts the pub/sub listener of this process on first use, after the server forked."""
+        if self._listener and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._listener and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name="catalog-cache-invalidation", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        """Applies broadcast invalidations, the local tier is emptied after a reconnect."""
+        while True:
+            try:
+                pubsub = get_redis_connection("default").pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                self.clear_local()
+                for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._local_drop(json.loads(message["data"]), lists=True)
+            except CACHE_ERRORS:
+                time.sleep(1)
+
+
+catalog_cache = CatalogCache()
+
+
+def request_origin(request):
+    """Returns scheme and host of a request, the part of absolute URLs a cached payload depends on."""
+    return f"{request.scheme}://{request.get_host()}"
+
+
+def video_key(video_id):
+    """Returns the cache key of a retrieve payload."""
+    return VIDEO_KEY.format(video_id=video_id)
+
+
+def list_key(cursor: str, page_size: str):
+    """Returns the cache key of a list page in the current catalog version."""
+    state = catalog_cache.state()
+    return LIST_KEY.format(version=state and state[0], cursor=cursor or "", page_size=page_size or "")
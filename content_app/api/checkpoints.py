@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from .playlists import parse_media_playlist, referenced_files
+
+CHECKPOINT_DIR = ".checkpoints"
+
+
+def rendition_fingerprint(source_path: Path, encode_args: dict):
+    """
+    Hashes the identity of the source file and the encoder settings of a rendition.
+    A finished rendition is only reused while its fingerprint still matches.
+    """
+    stat = source_path.stat()
+    payload = json.dumps(
+        {"source": [source_path.name, stat.st_size, stat.st_mtime_ns], "args": encode_args},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _marker_path(directory: Path, name: str):
+    """Returns the path of a checkpoint marker."""
+    return directory / CHECKPOINT_DIR / f"{name}.json"
+
+
+def load_checkpoint(directory: Path, name: str, fingerprint: str):
+    """Returns the data of a checkpoint written by an earlier run or None if it is missing or stale."""
+    try:
+        marker = json.loads(_marker_path(directory, name).read_text())
+    except (OSError, ValueError):
+        return None
+    if marker.get("fingerprint") != fingerprint:
+        return None
+    return marker["entry"]
+
+
+def write_checkpoint(directory: Path, name: str, fingerprint: str, entry):
+    """
+    Writes a checkpoint marker.
+    The marker is replaced atomically, so a crash never leaves a half written one.
+    """
+    marker_path = _marker_path(directory, name)
+    marker_path.parent.mkdir(exist_ok=True)
+    tmp_path = marker_path.with_name(f".{marker_path.name}.tmp")
+    tmp_path.write_text(json.dumps({"fingerprint": fingerprint, "entry": entry}))
+    os.replace(tmp_path, marker_path)
+
+
+def clear_checkpoint(directory: Path, name: str):
+    """Removes a checkpoint marker."""
+    _marker_path(directory, name).unlink(missing_ok=True)
+
+
+def is_playlist_complete(playlist_path: Path):
+    """
+    Checks that a media playlist was fully written and that every
+    segment and init section it references exists and is not empty.
+    """
+    if not playlist_path.exists() or "#EXT-X-ENDLIST" not in playlist_path.read_text():
+        return False
+    for uri in referenced_files(parse_media_playlist(playlist_path)):
+        media_path = playlist_path.parent / uri
+        if not media_path.exists() or media_path.stat().st_size == 0:
+            return False
+    return True
+
+
+def load_completed_rendition(hls_dir: Path, label: str, fingerprint: str):
+    """
+    Returns the playlist data of a rendition finished by an earlier run
+    or None if it is missing, stale or only partially written.
+    """
+    entry = load_checkpoint(hls_dir, label, fingerprint)
+    if not entry or not is_playlist_complete(hls_dir / entry["filename"]):
+        return None
+    return entry
+
+
+def mark_rendition_complete(hls_dir: Path, label: str, fingerprint: str, entry: dict):
+    """Writes the completion marker of a rendition."""
+    write_checkpoint(hls_dir, label, fingerprint, entry)
+
+
+def clear_rendition(hls_dir: Path, label: str):
+    """
+    Removes the marker, playlist and segments a previous run left
+    behind for a rendition before it is encoded again.
+    """
+    clear_checkpoint(hls_dir, label)
+    for path in [*hls_dir.glob(f"{label}.*"), *hls_dir.glob(f"{label}_*")]:
+        if path.is_file():
+            path.unlink()
@@ -0,0 +1,62 @@
+import csv
+import os
+from pathlib import Path
+import ffmpeg
+from .playlists import parse_media_playlist, referenced_files, write_media_playlist
+
+
+def split_at_keyframes(source_path: Path, chunk_dir: Path, chunk_seconds: int, with_audio: bool = True):
+    """
+    Splits the source into chunks of roughly chunk_seconds without re-encoding.
+    The segment muxer only cuts at keyframes, so every chunk starts with one.
+    Returns a list of (chunk_path, start_time) tuples or None on errors.
+    """
+    chunk_dir.mkdir(parents=True, exist_ok=True)
+    chunk_list = chunk_dir / "chunks.csv"
+
+    try:
+        stream = ffmpeg.input(str(source_path))
+        streams = [stream.video, stream.audio] if with_audio else [stream.video]
+        (
+            ffmpeg
+            .output(
+                *streams,
+                str(chunk_dir / "chunk_%04d.mkv"),
+                c='copy', f='segment', segment_time=chunk_seconds, reset_timestamps=1,
+                segment_list=str(chunk_list), segment_list_type='csv',
+            )
+            .overwrite_output()
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        return None
+
+    with chunk_list.open(newline="") as f:
+        return [(chunk_dir / filename, float(start_time)) for filename, start_time, end_time in csv.reader(f)]
+
+
+def chunk_suffix(index: int):
+    """Returns the filename suffix used for the outputs of one chunk."""
+    return f"_c{index:04d}"
+
+
+def stitch_chunk_playlists(hls_dir: Path, chunk_dir: Path, label: str, chunk_count: int):
+    """
+    Joins the per-chunk playlists of a rendition into one continuous playlist.
+    The media files are moved into the HLS folder and renumbered in playback
+    order, #EXTINF durations, byte ranges and init sections are taken over
+    from the chunk playlists.
+    """
+    segments = []
+    renamed = {}
+    for index in range(chunk_count):
+        chunk_segments = parse_media_playlist(chunk_dir / f"{label}{chunk_suffix(index)}.m3u8")
+        for uri in referenced_files(chunk_segments):
+            filename = f"{label}_{len(renamed):03d}{Path(uri).suffix}"
+            os.replace(chunk_dir / uri, hls_dir / filename)
+            renamed[(index, uri)] = filename
+        for segment in chunk_segments:
+            if segment["map"]:
+                segment["map"] = {**segment["map"], "uri": renamed[(index, segment["map"]["uri"])]}
+            segments.append({**segment, "uri": renamed[(index, segment["uri"])]})
+    return write_media_playlist(hls_dir / f"{label}.m3u8", segments)
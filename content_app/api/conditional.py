@@ -0,0 +1,37 @@
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from .signing import token_window
+
+
+def catalog_validators(state: tuple):
+    """Returns ETag and Last-Modified of a list page from the catalog version and its change time."""
+    version, changed_at = state
+    return f'"catalog-{version}-{int(changed_at * 1000):x}"', int(changed_at)
+
+
+def video_validators(video_id, updated_at: float, signed: bool):
+    """
+    Returns ETag and Last-Modified of a video payload. A payload with a
+    signed playlist URL changes with every token bucket as well.
+    """
+    etag = f"video-{video_id}-{int(updated_at * 1_000_000):x}"
+    last_modified = updated_at
+    if signed:
+        issued_from, expires = token_window()
+        etag = f"{etag}-{expires:x}"
+        last_modified = max(updated_at, issued_from)
+    return f'"{etag}"', int(last_modified)
+
+
+def not_modified_response(request, etag: str, last_modified: int):
+    """Returns a 304 response if the client has the current payload, None otherwise."""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return response and with_validators(response, etag, last_modified)
+
+
+def with_validators(response, etag: str, last_modified: int):
+    """Sets the validators and makes clients revalidate before reusing the payload."""
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,163 @@
+import io
+import os
+import re
+from pathlib import Path
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils._os import safe_join
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+from user_app.authentication import CookieJWTAuthentication
+from .signing import TOKEN_PARAMETER, signed_playlist, verify_media_token
+
+HLS_MEDIA_PATH = r"^media/(?P<path>videos/[^/]+/hls/.+)$"
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+}
+RANGE_HEADER = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class FileRange:
+    """
+    Read-only window of an open file from start up to end (exclusive).
+    It exposes the file descriptor, so the WSGI server can sendfile() the
+    window, and limits read() for servers which iterate over the response.
+    Seeking to the end means the end of the window.
+    """
+
+    def __init__(self, file, start: int, end: int):
+        self.file = file
+        self.name = file.name
+        self.end = end
+        file.seek(start)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET):
+        if whence == io.SEEK_END:
+            offset, whence = self.end + offset, io.SEEK_SET
+        return self.file.seek(offset, whence)
+
+    def read(self, size: int = -1):
+        remaining = max(self.end - self.file.tell(), 0)
+        return self.file.read(remaining if size is None or size < 0 else min(size, remaining))
+
+    def close(self):
+        self.file.close()
+
+
+def _authenticate(request):
+    """Returns the user of the access token cookie or None."""
+    result = CookieJWTAuthentication().authenticate(request)
+    return result[0] if result else None
+
+
+def _etag(stat: os.stat_result):
+    """Returns an ETag which changes whenever the file is rewritten."""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header: str, size: int):
+    """
+    Returns the first and the last byte (exclusive) of a single byte range
+    header, None if the whole file should be sent and False if the range
+    can not be satisfied. Multiple ranges are answered with the whole file.
+    """
+    match = RANGE_HEADER.match(header.replace(" ", ""))
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size
+    else:
+        start, end = int(first), min(int(last) + 1, size) if last else size
+    if start >= end:
+        return False
+    return start, end
+
+
+def _proxy_response(path: str, file_path: Path, content_type: str):
+    """Hands the transfer off to the front proxy configured in MEDIA_DELIVERY_BACKEND."""
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_DELIVERY_BACKEND == "x-accel":
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX.rstrip("/") + "/" + path
+    else:
+        response["X-Sendfile"] = str(file_path)
+    return response
+
+
+@require_safe
+def hls_media(request, path: str):
+    """
+    Serves HLS playlists and segments to viewers with a valid signed token
+    or, without one, to logged in users. Playlists requested with a token
+    are rewritten, so every URI in them carries the token as well.
+    After the access check the transfer is either handed off to a front
+    proxy via X-Accel-Redirect or X-Sendfile, or sent as FileResponse the
+    WSGI server can sendfile(), with single byte ranges and If-None-Match support.
+    """
+    token = request.GET.get(TOKEN_PARAMETER)
+    signed = bool(token) and verify_media_token(token, path)
+    if not signed:
+        user = _authenticate(request)
+        if not user or not user.is_authenticated:
+            return JsonResponse({"error": "authentication credentials were not provided."}, status=401)
+
+    content_type = CONTENT_TYPES.get(os.path.splitext(path)[1].lower())
+    try:
+        file_path = Path(safe_join(settings.MEDIA_ROOT, path))
+    except SuspiciousFileOperation:
+        file_path = None
+    if not content_type or not file_path or not file_path.is_file():
+        return JsonResponse({"error": "file does not exist or is removed."}, status=404)
+
+    is_playlist = content_type == CONTENT_TYPES[".m3u8"]
+    if settings.MEDIA_DELIVERY_BACKEND != "django" and not (signed and is_playlist):
+        return _proxy_response(path, file_path, content_type)
+
+    stat = file_path.stat()
+    etag = _etag(stat)
+    if signed and is_playlist:
+        etag = f'{etag[:-1]}-{token.partition("-")[0]}"'
+    visibility = "public" if signed else "private"
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"{visibility}, no-cache" if is_playlist else f"{visibility}, max-age=86400",
+    }
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in parse_etags(if_none_match)):
+        return HttpResponseNotModified(headers=headers)
+
+    if signed and is_playlist:
+        del headers["Accept-Ranges"]
+        playlist = signed_playlist(str(file_path), stat.st_mtime_ns, token)
+        return HttpResponse(playlist, content_type=content_type, headers=headers)
+
+    byte_range = None
+    if "Range" in request.headers and request.headers.get("If-Range", etag) == etag:
+        byte_range = parse_range(request.headers["Range"], stat.st_size)
+    if byte_range is False:
+        return HttpResponse(status=416, headers={**headers, "Content-Range": f"bytes */{stat.st_size}"})
+
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response["Content-Length"] = stat.st_size
+        return response
+
+    file = file_path.open("rb")
+    if byte_range:
+        start, end = byte_range
+        response = FileResponse(FileRange(file, start, end), content_type=content_type, status=206, headers=headers)
+        response["Content-Range"] = f"bytes {start}-{end - 1}/{stat.st_size}"
+    else:
+        response = FileResponse(file, content_type=content_type, headers=headers)
+    return response
@@ -0,0 +1,31 @@
+import hashlib
+from pathlib import Path
+
+HASH_ALGORITHM = "sha256"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_digest(path: Path):
+    """
+    Hashes a file in chunks, so large uploads are never read into memory at once.
+    Returns the hex digest.
+    """
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, HASH_ALGORITHM).hexdigest()
+
+
+def hash_prefix(path: Path, length: int):
+    """
+    Returns a hash object fed with the first length bytes of a file,
+    to continue hashing a partial upload in a process that did not see
+    its earlier chunks.
+    """
+    hasher = hashlib.new(HASH_ALGORITHM)
+    with path.open("rb") as f:
+        while length > 0:
+            block = f.read(min(HASH_BLOCK_SIZE, length))
+            if not block:
+                break
+            hasher.update(block)
+            length -= len(block)
+    return hasher
@@ -0,0 +1,158 @@
+from pathlib import Path
+from .playlists import parse_media_playlist, write_media_playlist
+
+TS_PACKET_SIZE = 188
+TS_READ_PACKETS = 4096
+VIDEO_STREAM_TYPES = {0x01, 0x02, 0x1B, 0x24}
+
+
+def _section_start(packet: bytes, payload: int):
+    """Returns the offset of a PSI section behind the pointer field."""
+    return payload + 1 + packet[payload]
+
+
+def _parse_pat(packet: bytes, payload: int):
+    """Returns the PID of the first program map table listed in a PAT packet."""
+    section = _section_start(packet, payload)
+    section_end = min(section + 3 + (((packet[section + 1] & 0x0F) << 8) | packet[section + 2]) - 4, len(packet))
+    for index in range(section + 8, section_end - 3, 4):
+        program_number = (packet[index] << 8) | packet[index + 1]
+        if program_number:
+            return ((packet[index + 2] & 0x1F) << 8) | packet[index + 3]
+    return None
+
+
+def _parse_pmt(packet: bytes, payload: int):
+    """Returns the PID of the first video stream listed in a PMT packet."""
+    section = _section_start(packet, payload)
+    section_end = min(section + 3 + (((packet[section + 1] & 0x0F) << 8) | packet[section + 2]) - 4, len(packet))
+    index = section + 12 + (((packet[section + 10] & 0x0F) << 8) | packet[section + 11])
+    while index + 5 <= section_end:
+        stream_type = packet[index]
+        pid = ((packet[index + 1] & 0x1F) << 8) | packet[index + 2]
+        if stream_type in VIDEO_STREAM_TYPES:
+            return pid
+        index += 5 + (((packet[index + 3] & 0x0F) << 8) | packet[index + 4])
+    return None
+
+
+def _parse_pts(packet: bytes, payload: int):
+    """Returns the presentation timestamp of a PES header in seconds or None."""
+    if packet[payload:payload + 3] != b"\x00\x00\x01" or not packet[payload + 7] & 0x80:
+        return None
+    pts = packet[payload + 9:payload + 14]
+    ticks = (
+        ((pts[0] >> 1) & 0x07) << 30 | pts[1] << 22 | (pts[2] >> 1) << 15 | pts[3] << 7 | pts[4] >> 1
+    )
+    return ticks / 90000
+
+
+def scan_video_packets(ts_path: Path):
+    """
+    Reads the packet headers of an MPEG-TS file without decoding it.
+    The muxer flags the packet starting a keyframe as random access point,
+    so keyframes are found by their transport packet headers alone.
+    Yields a dictionary with offset, pts, keyframe flag and the byte range
+    of the preceding PAT/PMT pair for every video PES packet.
+    """
+    pmt_pid = None
+    video_pid = None
+    pat_offset = None
+    header = None
+    offset = 0
+    with ts_path.open("rb") as f:
+        while block := f.read(TS_PACKET_SIZE * TS_READ_PACKETS):
+            for start in range(0, len(block) - TS_PACKET_SIZE + 1, TS_PACKET_SIZE):
+                packet = block[start:start + TS_PACKET_SIZE]
+                packet_offset = offset + start
+                if packet[0] != 0x47:
+                    continue
+                pid = ((packet[1] & 0x1F) << 8) | packet[2]
+                unit_start = packet[1] & 0x40
+                adaptation = packet[3] & 0x20
+                payload = 4
+                random_access = False
+                if adaptation:
+                    random_access = packet[4] > 0 and bool(packet[5] & 0x40)
+                    payload = 5 + packet[4]
+                if not packet[3] & 0x10 or not unit_start or payload >= TS_PACKET_SIZE:
+                    continue
+
+                if pid == 0:
+                    pmt_pid = _parse_pat(packet, payload)
+                    pat_offset = packet_offset
+                elif pid == pmt_pid:
+                    video_pid = _parse_pmt(packet, payload)
+                    if pat_offset == packet_offset - TS_PACKET_SIZE:
+                        header = (pat_offset, 2 * TS_PACKET_SIZE)
+                elif pid == video_pid:
+                    yield {
+                        "offset": packet_offset,
+                        "pts": _parse_pts(packet, payload),
+                        "keyframe": random_access,
+                        "header": header,
+                    }
+            offset += len(block)
+
+
+def _segment_window(hls_dir: Path, segment: dict):
+    """Returns the first and the last byte (exclusive) of a segment in its file."""
+    if segment.get("byterange"):
+        length, start = segment["byterange"].split("@")
+        return int(start), int(start) + int(length)
+    return 0, (hls_dir / segment["uri"]).stat().st_size
+
+
+def write_iframe_playlist(playlist_path: Path):
+    """
+    Indexes the keyframes of an MPEG-TS rendition and writes an
+    #EXT-X-I-FRAMES-ONLY playlist next to it, with one byte range per
+    keyframe reaching up to the next video packet. The PAT/PMT needed to
+    decode a keyframe is referenced as init section.
+    Returns a tuple of the playlist path and its peak bandwidth or None
+    for fMP4 renditions and on errors.
+    """
+    hls_dir = playlist_path.parent
+    segments = parse_media_playlist(playlist_path)
+    if not segments or any(segment.get("map") for segment in segments):
+        return None
+
+    packets_by_file = {}
+    frames = []
+    for segment in segments:
+        if segment["uri"] not in packets_by_file:
+            packets_by_file[segment["uri"]] = list(scan_video_packets(hls_dir / segment["uri"]))
+        packets = packets_by_file[segment["uri"]]
+        start, end = _segment_window(hls_dir, segment)
+        window = [packet for packet in packets if start <= packet["offset"] < end]
+        for index, packet in enumerate(window):
+            if not packet["keyframe"] or packet["pts"] is None:
+                continue
+            frame_end = window[index + 1]["offset"] if index + 1 < len(window) else end
+            frame = {"uri": segment["uri"], "pts": packet["pts"], "offset": packet["offset"],
+                     "length": frame_end - packet["offset"], "map": None}
+            if packet["header"]:
+                header_offset, header_length = packet["header"]
+                frame["map"] = {"uri": segment["uri"], "byterange": f"{header_length}@{header_offset}"}
+            frames.append(frame)
+
+    if not frames:
+        return None
+
+    end_pts = frames[0]["pts"] + sum(segment["duration"] for segment in segments)
+    iframe_segments = []
+    peak_bandwidth = 0
+    for index, frame in enumerate(frames):
+        next_pts = frames[index + 1]["pts"] if index + 1 < len(frames) else end_pts
+        duration = max(next_pts - frame["pts"], 0.001)
+        peak_bandwidth = max(peak_bandwidth, round(frame["length"] * 8 / duration))
+        iframe_segments.append({
+            "duration": duration,
+            "uri": frame["uri"],
+            "byterange": f'{frame["length"]}@{frame["offset"]}',
+            "map": frame["map"],
+        })
+
+    iframe_path = playlist_path.with_name(f"{playlist_path.stem}_iframes.m3u8")
+    write_media_playlist(iframe_path, iframe_segments, iframes_only=True)
+    return iframe_path, peak_bandwidth
@@ -0,0 +1,40 @@
+REFERENCE_SCALE = "1280x720"
+MIN_BITRATE_RATIO = 0.3
+MIN_BITRATE_STEP = 1.6
+BITRATE_ROUNDING = 50
+
+
+def _pixels(scale: str):
+    """Returns the number of pixels of a "WIDTHxHEIGHT" scale."""
+    width, height = map(int, scale.split("x"))
+    return width * height
+
+
+def _kbps(bitrate: str):
+    """Converts a bitrate like "800k" into kbit/s."""
+    return int(bitrate.rstrip("k"))
+
+
+def build_per_title_ladder(resolutions: dict, reference_kbps: float):
+    """
+    Picks the rung bitrates for a title from the bitrate a constant quality
+    probe encode needed at the reference resolution. The bitrate is scaled
+    to each rung by pixel count, capped at the static ladder and floored at
+    MIN_BITRATE_RATIO of it. Rungs which are less than MIN_BITRATE_STEP
+    times the bitrate of the previous rung are dropped as redundant, the
+    highest rung is always kept.
+    Returns the ladder as a list of dictionaries with label, scale and bitrate.
+    """
+    ordered = sorted(resolutions.items(), key=lambda item: _pixels(item[1]["scale"]))
+    ladder = []
+    for index, (label, opts) in enumerate(ordered):
+        static_kbps = _kbps(opts["bitrate"])
+        needed_kbps = reference_kbps * (_pixels(opts["scale"]) / _pixels(REFERENCE_SCALE)) ** 0.75
+        kbps = min(static_kbps, max(static_kbps * MIN_BITRATE_RATIO, needed_kbps))
+        kbps = max(BITRATE_ROUNDING, round(kbps / BITRATE_ROUNDING) * BITRATE_ROUNDING)
+
+        is_highest = index == len(ordered) - 1
+        if ladder and not is_highest and kbps < _kbps(ladder[-1]["bitrate"]) * MIN_BITRATE_STEP:
+            continue
+        ladder.append({"label": label, "scale": opts["scale"], "bitrate": f"{kbps}k"})
+    return ladder
@@ -0,0 +1,14 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class VideoCursorPagination(CursorPagination):
+    """
+    Cursor pagination over the catalog, newest first. The id breaks ties
+    between videos created at the same time, so pages never skip or repeat
+    a video and every page is an index range scan regardless of its depth.
+    """
+    page_size = settings.VIDEO_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
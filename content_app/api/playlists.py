@@ -0,0 +1,93 @@
+import math
+import os
+import re
+from pathlib import Path
+
+ATTRIBUTE_PATTERN = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def parse_attributes(attribute_list: str):
+    """
+    Parses an HLS attribute list like URI="init.mp4",BYTERANGE="720@0".
+    Returns the attributes as a dictionary with unquoted values.
+    """
+    return {key: value.strip('"') for key, value in ATTRIBUTE_PATTERN.findall(attribute_list)}
+
+
+def parse_media_playlist(playlist_path: Path):
+    """
+    Reads the segments of an HLS media playlist.
+    Returns a list of dictionaries with duration, uri, byterange and the
+    init section (map) that applies to the segment.
+    """
+    segments = []
+    duration = None
+    byterange = None
+    init_map = None
+    for line in playlist_path.read_text().splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",")[0])
+        elif line.startswith("#EXT-X-BYTERANGE:"):
+            byterange = line[len("#EXT-X-BYTERANGE:"):]
+        elif line.startswith("#EXT-X-MAP:"):
+            attributes = parse_attributes(line[len("#EXT-X-MAP:"):])
+            init_map = {"uri": attributes["URI"], "byterange": attributes.get("BYTERANGE")}
+        elif line and not line.startswith("#") and duration is not None:
+            segments.append({"duration": duration, "uri": line, "byterange": byterange, "map": init_map})
+            duration = None
+            byterange = None
+    return segments
+
+
+def referenced_files(segments: list):
+    """
+    Returns the distinct file names referenced by the segments and
+    their init sections, in playback order.
+    """
+    files = []
+    for segment in segments:
+        for uri in (segment["map"]["uri"] if segment.get("map") else None, segment["uri"]):
+            if uri and uri not in files:
+                files.append(uri)
+    return files
+
+
+def _playlist_version(segments: list):
+    """Returns the lowest protocol version supporting the used tags."""
+    if any(segment.get("map") for segment in segments):
+        return 7
+    if any(segment.get("byterange") for segment in segments):
+        return 4
+    return 3
+
+
+def write_media_playlist(playlist_path: Path, segments: list, iframes_only: bool = False):
+    """
+    Writes a VOD media playlist for the given segments, or an I-frame
+    playlist if iframes_only is set.
+    The file is replaced atomically so readers never see a partial playlist.
+    """
+    target_duration = math.ceil(max(segment["duration"] for segment in segments))
+    tmp_path = playlist_path.with_name(f".{playlist_path.name}.tmp")
+    current_map = None
+    with tmp_path.open("w") as f:
+        f.write("#EXTM3U\n")
+        f.write(f"#EXT-X-VERSION:{_playlist_version(segments)}\n")
+        f.write(f"#EXT-X-TARGETDURATION:{target_duration}\n")
+        f.write("#EXT-X-MEDIA-SEQUENCE:0\n")
+        f.write("#EXT-X-PLAYLIST-TYPE:VOD\n")
+        if iframes_only:
+            f.write("#EXT-X-I-FRAMES-ONLY\n")
+        for segment in segments:
+            if segment.get("map") and segment["map"] != current_map:
+                current_map = segment["map"]
+                byterange = f',BYTERANGE="{current_map["byterange"]}"' if current_map.get("byterange") else ""
+                f.write(f'#EXT-X-MAP:URI="{current_map["uri"]}"{byterange}\n')
+            f.write(f'#EXTINF:{segment["duration"]:.6f},\n')
+            if segment.get("byterange"):
+                f.write(f'#EXT-X-BYTERANGE:{segment["byterange"]}\n')
+            f.write(f'{segment["uri"]}\n')
+        f.write("#EXT-X-ENDLIST\n")
+    os.replace(tmp_path, playlist_path)
+    return playlist_path
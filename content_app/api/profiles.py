@@ -0,0 +1,31 @@
+from django.conf import settings
+
+ENCODER_PROFILES = {
+    "fast": {"preset": "veryfast"},
+    "balanced": {"preset": "medium"},
+    "efficient": {"preset": "slow"},
+}
+
+
+def select_encoder_profile(queue_depth: int):
+    """
+    Picks the encoder profile for the backlog of the heavy queue: a fast
+    preset while the backlog is deep, a slow and more efficient one while
+    the workers are idle and a balanced one in between.
+    """
+    if queue_depth >= settings.HLS_BACKLOG_DEEP:
+        return "fast"
+    if queue_depth <= settings.HLS_BACKLOG_IDLE:
+        return "efficient"
+    return "balanced"
+
+
+def encoder_options(profile: str):
+    """
+    Returns the x264 options of a profile. Fast encodes run on as many
+    threads as one transcode slot has cores, so more of them share the host.
+    """
+    options = dict(ENCODER_PROFILES[profile])
+    if profile == "fast":
+        options["threads"] = settings.TRANSCODE_CORES_PER_SLOT
+    return options
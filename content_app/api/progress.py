@@ -0,0 +1,181 @@
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import ffmpeg
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+PROGRESS_KEY = "videoflix:progress:{video_id}"
+STATE_FIELD = "state"
+
+
+def _connection():
+    """Returns the Redis connection of the default cache."""
+    return get_redis_connection("default")
+
+
+def publish_state(video_id: int, state: str):
+    """
+    Stores the overall processing state of a video, e.g. "processing",
+    "finished" or "failed". Redis errors never fail the transcode.
+    """
+    key = PROGRESS_KEY.format(video_id=video_id)
+    try:
+        pipeline = _connection().pipeline()
+        pipeline.hset(key, STATE_FIELD, state)
+        pipeline.expire(key, settings.TRANSCODE_PROGRESS_TTL)
+        pipeline.execute()
+    except RedisError:
+        pass
+
+
+def get_progress(video_id: int):
+    """
+    Returns the stored progress of a video as dictionary with the overall
+    state and the progress of every stage (rendition, chunk or job),
+    or None if nothing was published for the video.
+    """
+    try:
+        fields = _connection().hgetall(PROGRESS_KEY.format(video_id=video_id))
+    except RedisError:
+        return None
+    if not fields:
+        return None
+    fields = {key.decode(): value.decode() for key, value in fields.items()}
+    state = fields.pop(STATE_FIELD, None)
+    return {"state": state, "stages": {stage: json.loads(value) for stage, value in sorted(fields.items())}}
+
+
+def _parse_time(value: str):
+    """Converts an ffmpeg microsecond value into seconds, None for N/A."""
+    try:
+        return max(int(value), 0) / 1_000_000
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_speed(value: str):
+    """Converts an ffmpeg speed like "1.52x" into a float, None for N/A."""
+    try:
+        return float(value.rstrip("x"))
+    except (AttributeError, ValueError):
+        return None
+
+
+class TranscodeProgress:
+    """
+    Runs ffmpeg processes of one video with -progress output and publishes
+    frame, speed, output time and ETA of every stage to a Redis hash.
+    Updates are written at most every TRANSCODE_PROGRESS_INTERVAL seconds.
+    """
+
+    def __init__(self, video_id: int, duration: float):
+        self.video_id = video_id
+        self.duration = duration
+        self.key = PROGRESS_KEY.format(video_id=video_id)
+        self._published_at = {}
+
+    def publish(self, stages: tuple, report: dict, duration: float = None, force: bool = False):
+        """
+        Writes the progress report of an ffmpeg run for the given stages,
+        unless the last update of these stages is more recent than the interval.
+        Runs without stages publish nothing.
+        """
+        if not stages:
+            return
+        now = time.monotonic()
+        if not force and now - self._published_at.get(stages, 0) < settings.TRANSCODE_PROGRESS_INTERVAL:
+            return
+        self._published_at[stages] = now
+
+        duration = duration or self.duration
+        out_time = _parse_time(report.get("out_time_us"))
+        speed = _parse_speed(report.get("speed"))
+        finished = report.get("progress") == "end"
+        percent = None
+        eta = None
+        if finished:
+            percent, eta = 100.0, 0
+        elif out_time is not None and duration:
+            percent = round(min(out_time / duration * 100, 99.9), 1)
+            if speed:
+                eta = round(max(duration - out_time, 0) / speed, 1)
+        value = json.dumps({
+            "state": "finished" if finished else "running",
+            "frame": int(report.get("frame") or 0),
+            "speed": speed,
+            "out_time": out_time,
+            "percent": percent,
+            "eta": eta,
+            "updated_at": time.time(),
+        })
+        try:
+            pipeline = _connection().pipeline()
+            pipeline.hset(self.key, mapping={stage: value for stage in stages})
+            pipeline.expire(self.key, settings.TRANSCODE_PROGRESS_TTL)
+            pipeline.execute()
+        except RedisError:
+            pass
+
+    def run(self, args: list, *stages: str, duration: float = None, capture_output: bool = False,
+            read_output=None, on_output=None):
+        """
+        Runs the ffmpeg command line args and reads its -progress output
+        while it runs. Raises ffmpeg.Error like ffmpeg-python if it fails.
+        With capture_output the progress goes to a separate pipe and the
+        standard output of ffmpeg, e.g. frames written to pipe:1, is returned.
+        A read_output callable reads the standard output stream instead, its
+        result is returned and passed to on_output in the calling thread with
+        the next progress report, while ffmpeg may still run.
+        """
+        capture_output = capture_output or bool(read_output)
+        if capture_output:
+            progress_fd, progress_target = os.pipe()
+            progress_args = ["-progress", f"pipe:{progress_target}"]
+        else:
+            progress_args = ["-progress", "pipe:1"]
+        args = [args[0], *progress_args, "-nostats", *args[1:]]
+        output = []
+        with tempfile.TemporaryFile() as stderr:
+            if capture_output:
+                process = subprocess.Popen(
+                    args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=stderr, pass_fds=(progress_target,)
+                )
+                os.close(progress_target)
+
+                def read():
+                    try:
+                        output.append(read_output(process.stdout) if read_output else process.stdout.read())
+                    finally:
+                        process.stdout.read()
+
+                reader = threading.Thread(target=read)
+                reader.start()
+                progress_lines = os.fdopen(progress_fd, "rb")
+            else:
+                process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=stderr)
+                progress_lines = process.stdout
+            with progress_lines:
+                report = {}
+                for line in progress_lines:
+                    key, _, value = line.decode(errors="replace").strip().partition("=")
+                    report[key] = value
+                    if key == "progress":
+                        self.publish(stages, report, duration, force=value == "end")
+                        report = {}
+                        if on_output and output:
+                            on_output(output[0])
+                            on_output = None
+            if capture_output:
+                reader.join()
+                if on_output and output:
+                    on_output(output[0])
+            process.wait()
+            if process.returncode:
+                stderr.seek(0)
+                raise ffmpeg.Error(args[0], None, stderr.read())
+        return output[0] if capture_output and output else None
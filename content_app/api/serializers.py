@@ -1,8 +1,12 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from ..models import Video
+from ..models import Video, VideoUpload
+from .thumbnails import thumbnail_srcset
 
 class VideoSerializer(serializers.ModelSerializer):
     """Serializer for Video model with all relevant fields."""
+    thumbnail_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Video
         fields = [
@@ -13,10 +17,48 @@ class VideoSerializer(serializers.ModelSerializer):
             'file',
             'preview',
             'thumbnail',
+            'thumbnail_srcset',
+            'trickplay',
             'preview_title',
             'duration',
             'category',
             'created_at',
+            'updated_at',
             'hls_playlist',
         ]
-        read_only_fields = ['id', 'created_at', 'duration', 'hls_playlist']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'duration', 'hls_playlist', 'trickplay']
+
+    def get_thumbnail_srcset(self, obj):
+        """Return a srcset string of the thumbnail sizes per image format."""
+        request = self.context.get('request')
+
+        def url(path):
+            return request.build_absolute_uri(default_storage.url(path)) if request else default_storage.url(path)
+
+        return thumbnail_srcset(obj.thumbnail_variants, url)
+
+
+class VideoListSerializer(VideoSerializer):
+    """Lean serializer with the fields of a catalog card."""
+    class Meta:
+        model = Video
+        fields = [
+            'id',
+            'uuid',
+            'title',
+            'preview_title',
+            'thumbnail',
+            'thumbnail_srcset',
+            'duration',
+            'category',
+            'created_at',
+        ]
+        # Model fields read by the list, thumbnail_srcset needs thumbnail_variants.
+        only = ['id', 'uuid', 'title', 'preview_title', 'thumbnail', 'thumbnail_variants', 'duration', 'category', 'created_at']
+
+
+class VideoUploadSerializer(serializers.ModelSerializer):
+    """Serializer for the metadata announced when a resumable upload is created."""
+    class Meta:
+        model = VideoUpload
+        fields = ['title', 'description', 'preview_title', 'category', 'length']
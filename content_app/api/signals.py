@@ -1,30 +1,106 @@
-import os
+import uuid
+from pathlib import Path
+from django.conf import settings
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.db import transaction
 import django_rq
-from content_app.api.tasks import convert_to_hls, create_thumbnail, create_preview
+from content_app.api.cache import catalog_cache
+from content_app.api.serializers import VideoListSerializer, VideoSerializer
+from content_app.api.tasks import hash_video, probe_video
 from ..models import Video
-import shutil
 
 @receiver(post_save, sender=Video)
 def video_post_save(sender, instance, created, **kwargs):
-    """Queue video processing tasks after creation."""
+    """Queue the probe task after creation, it queues the processing tasks.
+    Videos without content hash are hashed on the default queue first."""
     if created:
-        queueDefault = django_rq.get_queue('default', autocommit=True)
-        queueHeavy = django_rq.get_queue('default', autocommit=True)
-        queueFast = django_rq.get_queue('default', autocommit=True)
-        video_id = instance.id
-
-        queueHeavy.enqueue(convert_to_hls, video_id)
-        queueFast.enqueue(create_thumbnail, video_id)
-        queueDefault.enqueue(create_preview, video_id)
+        if not instance.content_hash:
+            queue = django_rq.get_queue('default', autocommit=True)
+            queue.enqueue(hash_video, instance.id)
+            return
+        queueFast = django_rq.get_queue('fast', autocommit=True)
+        queueFast.enqueue(probe_video, instance.id)
 
 
         
+def _media_paths(video):
+    """Returns the files and folders holding the media of a video."""
+    media_root = Path(settings.MEDIA_ROOT)
+    paths = {media_root / field.name for field in (video.file, video.thumbnail, video.preview) if field}
+    paths.update((media_root / field.name).parent for field in (video.hls_playlist, video.trickplay) if field)
+    for variants in (video.thumbnail_variants or {}).values():
+        paths.update(media_root / path for path in variants.values())
+    return paths
+
+
+def _has_owner(folder: Path):
+    """Checks whether the video a folder videos/<title>_<uuid> was created for still exists."""
+    try:
+        folder_uuid = uuid.UUID(folder.name.rpartition("_")[2])
+    except ValueError:
+        return False
+    return Video.objects.filter(uuid=folder_uuid).exists()
+
+
+def _delete_unreferenced(directory: Path, keep: set):
+    """Deletes everything below directory except the kept paths, and directory itself once it is empty."""
+    if not directory.is_dir():
+        return
+    for path in directory.iterdir():
+        if path in keep:
+            continue
+        if path.is_dir() and not path.is_symlink():
+            _delete_unreferenced(path, keep)
+        else:
+            path.unlink()
+    try:
+        directory.rmdir()
+    except OSError:
+        pass
+
+
 @receiver(post_delete, sender=Video)
 def delete_folder_on_model_delete(sender, instance, **kwargs):
-    """Delete video folder on model deletion."""
-    if instance.file:
-        folder_path = os.path.dirname(instance.file.path)
-        if os.path.isdir(folder_path):
-            shutil.rmtree(folder_path)
\ No newline at end of file
+    """
+    Delete the video folder on model deletion. Re-uploads of the same content
+    share the source, renditions and generated media of the first upload,
+    files they still use are kept. The folder of a shared source is cleaned
+    up once the video it was uploaded with is gone.
+    """
+    if not instance.file:
+        return
+    media_root = Path(settings.MEDIA_ROOT)
+    keep = set()
+    for video in Video.objects.filter(file=instance.file.name):
+        keep |= _media_paths(video)
+
+    folders = set(media_root.joinpath("videos").glob(f"*_{instance.uuid}"))
+    source_folder = (media_root / instance.file.name).parent
+    if not _has_owner(source_folder):
+        folders.add(source_folder)
+    for folder in folders:
+        _delete_unreferenced(folder, keep)
+
+
+# Model fields in the cached payloads. updated_at is left out, because
+# Video.save writes it with every field.
+CATALOG_FIELDS = (
+    {*VideoSerializer.Meta.fields, *VideoListSerializer.Meta.only} - {"thumbnail_srcset", "updated_at"}
+)
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+def invalidate_catalog_cache(sender, instance, update_fields=None, **kwargs):
+    """
+    Drop the cached payload of the video and the list pages. Inside a
+    transaction this is repeated after the commit, so payloads cached from
+    the old rows by requests running meanwhile are dropped as well. Saves
+    limited to fields no payload contains keep the cache.
+    """
+    if update_fields is not None and not CATALOG_FIELDS.intersection(update_fields):
+        return
+    video_id = instance.pk
+    catalog_cache.invalidate([video_id])
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: catalog_cache.invalidate([video_id]))
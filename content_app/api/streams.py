@@ -0,0 +1,97 @@
+import asyncio
+import json
+import re
+from http.cookies import SimpleCookie
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from user_app.authentication import CookieJWTAuthentication
+from ..models import Video
+from .progress import get_progress
+
+PROGRESS_STREAM_PATH = re.compile(r"/api/video/(?P<video_id>\d+)/status/stream/")
+HEARTBEAT_SECONDS = 15
+FINAL_STATES = {"finished", "failed"}
+
+
+class _CookieRequest:
+    """Minimal request object carrying the cookies for CookieJWTAuthentication."""
+
+    def __init__(self, scope):
+        cookie = SimpleCookie()
+        for name, value in scope.get("headers", []):
+            if name == b"cookie":
+                cookie.load(value.decode("latin-1"))
+        self.COOKIES = {key: morsel.value for key, morsel in cookie.items()}
+
+
+def _authenticate(scope):
+    """Returns the user of the access token cookie or None."""
+    result = CookieJWTAuthentication().authenticate(_CookieRequest(scope))
+    return result[0] if result else None
+
+
+def _load_status(video_id: int):
+    """Returns the status payload of a video, None if it does not exist."""
+    video = Video.objects.filter(pk=video_id).values("id", "hls_playlist").first()
+    if not video:
+        return None
+    progress = get_progress(video_id) or {"state": None, "stages": {}}
+    return {"id": video["id"], "ready": bool(video["hls_playlist"]), **progress}
+
+
+async def _send_error(send, status: int, message: str):
+    """Sends a JSON error response."""
+    body = json.dumps({"error": message}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def progress_stream(scope, receive, send, video_id: int):
+    """
+    Streams the processing status of a video as server-sent events.
+    An event is sent whenever the status changes, a comment line keeps idle
+    connections open. The stream ends once processing finished or failed,
+    or when the client disconnects.
+    """
+    user = await sync_to_async(_authenticate)(scope)
+    if not user or not user.is_authenticated:
+        return await _send_error(send, 401, "authentication credentials were not provided.")
+    status = await sync_to_async(_load_status)(video_id)
+    if status is None:
+        return await _send_error(send, 404, "video does not exist or is removed.")
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ],
+    })
+    last_payload = None
+    idle_seconds = 0
+    while True:
+        payload = json.dumps(status)
+        if payload != last_payload:
+            await send({"type": "http.response.body", "body": f"data: {payload}\n\n".encode(), "more_body": True})
+            last_payload = payload
+            idle_seconds = 0
+        elif idle_seconds >= HEARTBEAT_SECONDS:
+            await send({"type": "http.response.body", "body": b": keep-alive\n\n", "more_body": True})
+            idle_seconds = 0
+        if status["state"] in FINAL_STATES:
+            break
+
+        try:
+            message = await asyncio.wait_for(receive(), timeout=settings.TRANSCODE_PROGRESS_INTERVAL)
+            if message["type"] == "http.disconnect":
+                return
+        except asyncio.TimeoutError:
+            idle_seconds += settings.TRANSCODE_PROGRESS_INTERVAL
+        status = await sync_to_async(_load_status)(video_id) or {**status, "state": "failed"}
+    await send({"type": "http.response.body", "body": b""})
@@ -1,10 +1,29 @@
 import os
-import subprocess
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from content_app.models import Video
+from content_app.models import Video, VideoMetadata
 from core import settings
-from .ffmpeg_utils import run_ffmpeg_task
+from .admission import transcode_slot
+from .checkpoints import (
+    clear_checkpoint, clear_rendition, is_playlist_complete, load_checkpoint, load_completed_rendition,
+    mark_rendition_complete, rendition_fingerprint, write_checkpoint,
+)
+from .chunks import chunk_suffix, split_at_keyframes, stitch_chunk_playlists
+from .hashing import file_digest
+from .iframes import write_iframe_playlist
+from .ladder import REFERENCE_SCALE, build_per_title_ladder
+from .profiles import encoder_options, select_encoder_profile
+from .progress import TranscodeProgress, publish_state
+from .thumbnails import largest_variant, pick_thumbnail_frame, read_ppm_frames, write_thumbnail_variants
+from .trickplay import SPRITE_PATTERN, sprite_count, sprite_filter, write_trickplay_vtt
+import django_rq
 import ffmpeg
+from PIL import Image
+from rq import Retry
+from rq.job import Dependency
 
 def _get_video_and_paths(video_id: int):
     """
@@ -24,77 +43,619 @@ def _get_video_and_paths(video_id: int):
     hls_dir.mkdir(exist_ok=True)
     return video, source_path, hls_dir
 
+def _parse_frame_rate(rate: str):
+    """
+    Parses an ffprobe frame rate like "30000/1001" into frames per second.
+    """
+    numerator, _, denominator = rate.partition("/")
+    if not denominator:
+        return float(numerator)
+    return float(numerator) / float(denominator) if float(denominator) else 0.0
+
 def _probe_video_metadata(source_path: Path):
     """
-    Probes the video file for metadata like resolution and duration.
-    Returns the metadata as a tuple or None on errors.
+    Probes the video file for metadata like resolution, codecs and duration.
+    The packets of the first 30 seconds are read to measure the keyframe interval.
+    Returns the metadata as a dictionary or None on errors.
     """
     try:
-        probe = ffmpeg.probe(str(source_path))
+        probe = ffmpeg.probe(str(source_path), show_packets=None, read_intervals="%+30")
         video_stream = next(s for s in probe["streams"] if s["codec_type"] == "video")
-        source_width = int(video_stream["width"])
-        source_height = int(video_stream["height"])
-        duration_seconds = float(probe['format']['duration'])
-        return source_width, source_height, duration_seconds
-    except (ffmpeg.Error, StopIteration, ValueError, KeyError) as e:
+        audio_stream = next((s for s in probe["streams"] if s["codec_type"] == "audio"), None)
+        fps = _parse_frame_rate(video_stream.get("avg_frame_rate", "0/0")) or _parse_frame_rate(video_stream["r_frame_rate"])
+        bitrate = probe["format"].get("bit_rate") or video_stream.get("bit_rate") or 0
+        level = int(video_stream.get("level", 0))
+        bit_depth = video_stream.get("bits_per_raw_sample")
+
+        keyframes = sorted(
+            float(packet["pts_time"]) for packet in probe.get("packets", [])
+            if packet.get("stream_index") == video_stream["index"]
+            and "K" in packet.get("flags", "") and "pts_time" in packet
+        )
+        keyframe_interval = None
+        if len(keyframes) > 1:
+            keyframe_interval = (keyframes[-1] - keyframes[0]) / (len(keyframes) - 1)
+
+        return {
+            "width": int(video_stream["width"]),
+            "height": int(video_stream["height"]),
+            "fps": fps,
+            "video_codec": video_stream.get("codec_name", ""),
+            "video_profile": video_stream.get("profile", ""),
+            "video_level": level if level > 0 else None,
+            "pixel_format": video_stream.get("pix_fmt", ""),
+            "bit_depth": int(bit_depth) if bit_depth else None,
+            "audio_codec": audio_stream.get("codec_name", "") if audio_stream else "",
+            "bitrate": int(bitrate),
+            "duration": float(probe['format']['duration']),
+            "keyframe_interval": keyframe_interval,
+        }
+    except (ffmpeg.Error, StopIteration, ValueError, KeyError, ZeroDivisionError) as e:
         return None
 
-def _process_resolution(source_path: Path, hls_dir: Path, label: str, opts: dict, source_dims: tuple):
+def _store_video_metadata(video, source_path: Path):
     """
-    Converts the video to a specific resolution and bitrate.
-    Returns a dictionary with playlist data or None on errors/skipping.
+    Probes the source once and stores the result on the Video.
+    Returns the VideoMetadata object or None on errors.
+    """
+    fields = _probe_video_metadata(source_path)
+    if not fields:
+        return None
+
+    metadata, _ = VideoMetadata.objects.update_or_create(video=video, defaults=fields)
+    video.duration = int(metadata.duration)
+    video.save(update_fields=["duration"])
+    return metadata
+
+def _get_video_metadata(video, source_path: Path):
+    """
+    Returns the stored metadata of the video and only probes the
+    source if the probe task has not stored any yet.
+    """
+    try:
+        return VideoMetadata.objects.get(video=video)
+    except VideoMetadata.DoesNotExist:
+        return _store_video_metadata(video, source_path)
+
+HLS_SEGMENT_SECONDS = 4
+
+AUDIO_ENCODER_ARGS = {'acodec': 'aac', 'ar': 48000, 'b:a': '128k'}
+
+AUDIO_GROUP_ID = "audio"
+
+SINGLE_PASS_CHECKPOINT = "single_pass"
+
+STREAM_COPY_PROFILES = ("Constrained Baseline", "Baseline", "Main", "High")
+
+STREAM_COPY_MAX_LEVEL = 42
+
+HLS_RESOLUTIONS = {
+    "360p": {"scale": "640x360", "bitrate": "800k"},
+    "480p": {"scale": "854x480", "bitrate": "1400k"},
+    "720p": {"scale": "1280x720", "bitrate": "2800k"},
+    "1080p": {"scale": "1920x1080", "bitrate": "5000k"},
+}
+
+def _run_ffmpeg(output, progress: TranscodeProgress = None, stages: tuple = (), duration: float = None):
+    """
+    Runs an ffmpeg-python output once a transcode slot is free and
+    publishes its progress for the given stages if a tracker is passed.
+    """
+    output = output.overwrite_output()
+    with transcode_slot():
+        if progress:
+            progress.run(output.compile(), *stages, duration=duration)
+        else:
+            output.run(capture_stdout=True, capture_stderr=True)
+
+def _eligible_resolutions(resolutions: dict, source_dims: tuple):
+    """
+    Filters the ladder down to the rungs the source can fill without upscaling.
     """
     source_width, source_height = source_dims
+    eligible = {}
+    for label, opts in resolutions.items():
+        target_width, target_height = map(int, opts["scale"].split("x"))
+        if source_width >= target_width and source_height >= target_height:
+            eligible[label] = opts
+    return eligible
+
+def _scale_and_pad(video_stream, opts: dict):
+    """
+    Scales the video stream into the rung size and pads it to the exact dimensions.
+    """
     target_width, target_height = map(int, opts["scale"].split("x"))
+    return (
+        video_stream
+        .filter('scale', target_width, target_height, force_original_aspect_ratio='decrease')
+        .filter('pad', target_width, target_height, '(ow-iw)/2', '(oh-ih)/2')
+    )
 
-    if source_width < target_width or source_height < target_height:
+def _hls_muxer_args(hls_dir: Path, label: str, suffix: str = ""):
+    """
+    Builds the output file and HLS muxer options for one rendition.
+    """
+    output_file = hls_dir / f"{label}{suffix}.m3u8"
+    extension = ".m4s" if settings.HLS_SEGMENT_TYPE == "fmp4" else ".ts"
+    if settings.HLS_SINGLE_FILE:
+        segment_path = hls_dir / f"{label}{suffix}{extension}"
+    else:
+        segment_path = hls_dir / f"{label}{suffix}_%03d{extension}"
+    kwargs = {'hls_time': HLS_SEGMENT_SECONDS, 'hls_playlist_type': 'vod', 'hls_segment_filename': str(segment_path)}
+    if settings.HLS_SEGMENT_TYPE == "fmp4":
+        kwargs.update({'hls_segment_type': 'fmp4', 'hls_fmp4_init_filename': f"{label}{suffix}_init.mp4"})
+    if settings.HLS_SINGLE_FILE:
+        kwargs['hls_flags'] = 'single_file'
+    return str(output_file), kwargs
+
+def _hls_output_args(hls_dir: Path, label: str, opts: dict, suffix: str = "", stream_copy: bool = False):
+    """
+    Builds the output file and encoder options for one HLS rendition.
+    With stream_copy the source streams are remuxed without encoding.
+    """
+    output_file, kwargs = _hls_muxer_args(hls_dir, label, suffix)
+    if settings.HLS_SHARED_AUDIO:
+        kwargs['an'] = None
+    if stream_copy:
+        kwargs['c'] = 'copy'
+        return output_file, kwargs
+
+    kwargs.update({
+        'vcodec': 'libx264', 'b:v': opts['bitrate'], 'profile:v': 'main', 'sc_threshold': 0,
+        'g': 48, 'keyint_min': 48, 'maxrate': opts['bitrate'], 'bufsize': '4200k',
+    })
+    kwargs.update(opts.get('encoder', {}))
+    if not settings.HLS_SHARED_AUDIO:
+        kwargs.update(AUDIO_ENCODER_ARGS)
+    return output_file, kwargs
+
+def _output_streams(stream, video_stream):
+    """
+    Returns the streams muxed into a variant, the audio is left out
+    when it is published as a shared audio rendition.
+    """
+    if settings.HLS_SHARED_AUDIO:
+        return [video_stream]
+    return [video_stream, stream.audio]
+
+def _is_stream_copy_compatible(metadata):
+    """
+    Checks that the source is H.264 every HLS player decodes: 8-bit 4:2:0
+    in the Baseline, Main or High profile up to level 4.2, with AAC audio
+    or none. High 10, 4:2:2 and 4:4:4 sources have to be encoded.
+    """
+    if metadata.video_codec != "h264" or metadata.audio_codec not in ("aac", ""):
+        return False
+    if metadata.video_profile not in STREAM_COPY_PROFILES or metadata.pixel_format != "yuv420p":
+        return False
+    if metadata.bit_depth not in (None, 8):
+        return False
+    return metadata.video_level is not None and metadata.video_level <= STREAM_COPY_MAX_LEVEL
+
+def _stream_copy_resolutions(metadata, resolutions: dict):
+    """
+    Finds the rung the source already matches as compatible H.264/AAC with
+    the exact size, a compatible bitrate and keyframes at least every segment.
+    Returns the rung with the source bitrate, or an empty dict.
+    """
+    if not _is_stream_copy_compatible(metadata):
+        return {}
+    if not metadata.keyframe_interval or metadata.keyframe_interval > HLS_SEGMENT_SECONDS:
+        return {}
+
+    for label, opts in resolutions.items():
+        target_width, target_height = map(int, opts["scale"].split("x"))
+        max_bitrate = int(opts["bitrate"].rstrip("k")) * 1000 * settings.HLS_STREAM_COPY_MAX_BITRATE_RATIO
+        if (metadata.width, metadata.height) == (target_width, target_height) and 0 < metadata.bitrate <= max_bitrate:
+            return {label: {**opts, "bitrate": f"{round(metadata.bitrate / 1000)}k"}}
+    return {}
+
+def _playlist_entry(label: str, opts: dict):
+    """
+    Returns the master playlist data for a finished rendition.
+    """
+    return {"resolution": opts["scale"], "bandwidth": opts["bitrate"].replace("k", "000"), "filename": f"{label}.m3u8"}
+
+def _complete_rendition(hls_dir: Path, label: str, fingerprint: str, entry: dict):
+    """
+    Indexes the keyframes of a finished rendition into an I-frame playlist
+    and writes its completion marker.
+    """
+    iframes = write_iframe_playlist(hls_dir / entry["filename"])
+    if iframes:
+        iframe_path, iframe_bandwidth = iframes
+        entry = {**entry, "iframe_filename": iframe_path.name, "iframe_bandwidth": str(iframe_bandwidth)}
+    mark_rendition_complete(hls_dir, label, fingerprint, entry)
+    return entry
+
+def _measure_complexity(source_path: Path, duration_seconds: float):
+    """
+    Encodes a few short samples spread over the video at a constant quality
+    and the reference resolution of the per-title ladder.
+    Returns the bitrate the samples needed in kbit/s or None on errors
+    or without known duration.
+    """
+    samples = settings.HLS_PER_TITLE_SAMPLES
+    if not duration_seconds or duration_seconds <= 0 or samples <= 0:
         return None
+    sample_seconds = min(HLS_SEGMENT_SECONDS, duration_seconds / samples)
+    total_bytes = 0
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for index in range(samples):
+                start_time = duration_seconds * (index + 0.5) / samples - sample_seconds / 2
+                sample_path = Path(tmp_dir) / f"sample_{index}.mp4"
+                stream = ffmpeg.input(str(source_path), ss=start_time, t=sample_seconds)
+                output = ffmpeg.output(
+                    _scale_and_pad(stream.video, {"scale": REFERENCE_SCALE}),
+                    str(sample_path),
+                    vcodec='libx264', crf=settings.HLS_PER_TITLE_CRF, preset='veryfast',
+                )
+                _run_ffmpeg(output)
+                total_bytes += sample_path.stat().st_size
+    except ffmpeg.Error as e:
+        return None
+    return total_bytes * 8 / (samples * sample_seconds) / 1000
+
+def _select_ladder(metadata, source_path: Path):
+    """
+    Returns the ladder for the video. With HLS_PER_TITLE_LADDER the ladder
+    is chosen from a complexity probe once and stored on the metadata.
+    """
+    if not settings.HLS_PER_TITLE_LADDER:
+        return HLS_RESOLUTIONS
+    if not metadata.ladder:
+        reference_kbps = _measure_complexity(source_path, metadata.duration)
+        if reference_kbps is None:
+            return HLS_RESOLUTIONS
+        eligible = _eligible_resolutions(HLS_RESOLUTIONS, (metadata.width, metadata.height))
+        metadata.ladder = build_per_title_ladder(eligible, reference_kbps)
+        metadata.save(update_fields=["ladder"])
+    return {rung["label"]: {"scale": rung["scale"], "bitrate": rung["bitrate"]} for rung in metadata.ladder}
+
+def _choose_encoder_profile(metadata):
+    """
+    Picks the encoder profile from the backlog of the heavy queue and stores
+    it on the metadata. Once stored, every retried or repeated encode keeps
+    it, so the fingerprints of renditions finished or already published
+    before stay valid. Only upgrade_fast_encode replaces it afterwards.
+    """
+    if metadata.encoder_profile:
+        return metadata.encoder_profile
+    profile = select_encoder_profile(django_rq.get_queue('heavy').count)
+    metadata.encoder_profile = profile
+    metadata.needs_reencode = profile == "fast" and settings.HLS_REENCODE_FAST_ENCODES
+    metadata.save(update_fields=["encoder_profile", "needs_reencode"])
+    return profile
+
+def _apply_encoder_profile(resolutions: dict, profile: str):
+    """Adds the encoder options of the profile to every rung of the ladder."""
+    return {label: {**opts, "encoder": encoder_options(profile)} for label, opts in resolutions.items()}
+
+def _rendition_fingerprint(source_path: Path, label: str, opts: dict, stream_copy: bool = False):
+    """
+    Fingerprints the source and the encoder settings of one rendition.
+    """
+    output_file, kwargs = _hls_output_args(Path(), label, opts, stream_copy=stream_copy)
+    kwargs.pop('hls_segment_filename')
+    return rendition_fingerprint(source_path, {**kwargs, 'bandwidth': opts['bitrate']})
+
+def _process_resolution(source_path: Path, hls_dir: Path, label: str, opts: dict, source_dims: tuple,
+                        stream_copy: bool = False, progress: TranscodeProgress = None):
+    """
+    Converts the video to a specific resolution and bitrate, or remuxes
+    it without encoding if the source already matches the rendition.
+    A rendition finished by an earlier run with the same settings is reused.
+    Returns a dictionary with playlist data or None on errors/skipping.
+    """
+    if label not in _eligible_resolutions({label: opts}, source_dims):
+        return None
+
+    fingerprint = _rendition_fingerprint(source_path, label, opts, stream_copy)
+    entry = load_completed_rendition(hls_dir, label, fingerprint)
+    if entry:
+        return entry
+    clear_rendition(hls_dir, label)
 
     try:
-        output_file = hls_dir / f"{label}.m3u8"
-        segment_path = hls_dir / f"{label}_%03d.ts"
-        
         stream = ffmpeg.input(str(source_path))
-        video_stream = stream.video
-        audio_stream = stream.audio
+        output_file, kwargs = _hls_output_args(hls_dir, label, opts, stream_copy=stream_copy)
+        if stream_copy:
+            output = stream.output(output_file, **kwargs)
+        else:
+            output = ffmpeg.output(*_output_streams(stream, _scale_and_pad(stream.video, opts)), output_file, **kwargs)
+        _run_ffmpeg(output, progress, (label,))
+        return _complete_rendition(hls_dir, label, fingerprint, _playlist_entry(label, opts))
+    except ffmpeg.Error as e:
+        return None
 
-        video_processed = (
-            video_stream
-            .filter('scale', target_width, target_height, force_original_aspect_ratio='decrease')
-            .filter('pad', target_width, target_height, '(ow-iw)/2', '(oh-ih)/2')
-        )
-        (
-            ffmpeg
-            .output(
-                video_processed,
-                audio_stream,
-                str(output_file),
-                vcodec='libx264', acodec='aac', **{'b:v': opts['bitrate'], 'profile:v': 'main', 'sc_threshold': 0, 'g': 48,
-                                                  'keyint_min': 48, 'hls_time': 4, 'hls_playlist_type': 'vod',
-                                                  'hls_segment_filename': str(segment_path), 'ar': 48000,
-                                                  'b:a': '128k', 'maxrate': opts['bitrate'], 'bufsize': '4200k'}
-            )
-            .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True)
+def _process_audio(source_path: Path, hls_dir: Path, metadata, progress: TranscodeProgress = None):
+    """
+    Converts the audio track once into its own HLS rendition, which all
+    video variants reference as shared audio group. AAC sources are remuxed.
+    Returns a dictionary with playlist data or None without audio or on errors.
+    """
+    if not metadata.audio_codec:
+        return None
+
+    stream_copy = settings.HLS_STREAM_COPY and metadata.audio_codec == "aac"
+    output_file, kwargs = _hls_muxer_args(hls_dir, AUDIO_GROUP_ID)
+    kwargs.update({'acodec': 'copy'} if stream_copy else AUDIO_ENCODER_ARGS)
+    fingerprint_args = {key: value for key, value in kwargs.items() if key != 'hls_segment_filename'}
+    fingerprint = rendition_fingerprint(source_path, fingerprint_args)
+    entry = load_completed_rendition(hls_dir, AUDIO_GROUP_ID, fingerprint)
+    if entry:
+        return entry
+    clear_rendition(hls_dir, AUDIO_GROUP_ID)
+
+    try:
+        output = ffmpeg.input(str(source_path)).audio.output(output_file, **kwargs)
+        _run_ffmpeg(output, progress, (AUDIO_GROUP_ID,))
+    except ffmpeg.Error as e:
+        return None
+    entry = {"bandwidth": AUDIO_ENCODER_ARGS['b:a'].replace("k", "000"), "filename": f"{AUDIO_GROUP_ID}.m3u8"}
+    mark_rendition_complete(hls_dir, AUDIO_GROUP_ID, fingerprint, entry)
+    return entry
+
+def _process_resolution_or_copy(source_path: Path, hls_dir: Path, label: str, opts: dict, source_dims: tuple,
+                                copy_resolutions: dict, progress: TranscodeProgress = None):
+    """
+    Remuxes the rendition if the source already matches it and
+    encodes it if it does not or remuxing fails.
+    """
+    if label in copy_resolutions:
+        entry = _process_resolution(
+            source_path, hls_dir, label, copy_resolutions[label], source_dims, stream_copy=True, progress=progress
         )
-        return {"resolution": opts["scale"], "bandwidth": opts["bitrate"].replace("k", "000"), "filename": f"{label}.m3u8"}
+        if entry:
+            return entry
+    return _process_resolution(source_path, hls_dir, label, opts, source_dims, progress=progress)
+
+def _process_resolutions_per_rendition(source_path: Path, hls_dir: Path, resolutions: dict, source_dims: tuple,
+                                       copy_resolutions: dict, progress: TranscodeProgress = None):
+    """
+    Converts the video with one ffmpeg process per rendition.
+    Returns a list with playlist data of all finished renditions.
+    """
+    playlist_entries = []
+    for label, opts in resolutions.items():
+        entry = _process_resolution_or_copy(source_path, hls_dir, label, opts, source_dims, copy_resolutions, progress)
+        if entry:
+            playlist_entries.append(entry)
+    return playlist_entries
+
+def _process_resolutions_single_pass(source_path: Path, hls_dir: Path, resolutions: dict, source_dims: tuple,
+                                     suffix: str = "", trickplay_dir: Path = None,
+                                     progress: TranscodeProgress = None, **output_kwargs):
+    """
+    Converts the video to all eligible resolutions with a single ffmpeg process.
+    The source is decoded once and split into one scale/pad branch per rung,
+    plus a branch for the trickplay sprite sheets if trickplay_dir is given.
+    Returns a list with playlist data or None on errors.
+    """
+    eligible = _eligible_resolutions(resolutions, source_dims)
+    if not eligible:
+        return None
+
+    try:
+        stream = ffmpeg.input(str(source_path))
+        branches = stream.video.filter_multi_output('split', len(eligible) + bool(trickplay_dir))
+        outputs = []
+        for index, (label, opts) in enumerate(eligible.items()):
+            output_file, kwargs = _hls_output_args(hls_dir, label, opts, suffix)
+            kwargs.update(output_kwargs)
+            video_stream = _scale_and_pad(branches.stream(index), opts)
+            outputs.append(ffmpeg.output(*_output_streams(stream, video_stream), output_file, **kwargs))
+        if trickplay_dir:
+            trickplay_dir.mkdir(exist_ok=True)
+            sprites = sprite_filter(branches.stream(len(eligible)), source_dims)
+            outputs.append(ffmpeg.output(sprites, str(trickplay_dir / SPRITE_PATTERN), **{'q:v': 5}))
+        stages = tuple(f"{label}{suffix}" for label in eligible)
+        _run_ffmpeg(ffmpeg.merge_outputs(*outputs), progress, stages)
+        return [_playlist_entry(label, opts) for label, opts in eligible.items()]
     except ffmpeg.Error as e:
         return None
 
-def _create_master_playlist(hls_dir: Path, playlist_entries: list):
+def _split_chunks(source_path: Path, chunk_dir: Path):
+    """
+    Splits the source into keyframe aligned chunks. The chunks of an
+    interrupted earlier run are reused while the source is unchanged.
+    Returns a list of (chunk_path, start_time) tuples or None on errors.
+    """
+    with_audio = not settings.HLS_SHARED_AUDIO
+    fingerprint = rendition_fingerprint(
+        source_path, {"chunk_seconds": settings.HLS_CHUNK_DURATION, "with_audio": with_audio}
+    )
+    chunks = load_checkpoint(chunk_dir, "split", fingerprint)
+    if chunks and all((chunk_dir / filename).exists() for filename, start_time in chunks):
+        return [(chunk_dir / filename, start_time) for filename, start_time in chunks]
+
+    shutil.rmtree(chunk_dir, ignore_errors=True)
+    chunks = split_at_keyframes(source_path, chunk_dir, settings.HLS_CHUNK_DURATION, with_audio=with_audio)
+    if chunks:
+        write_checkpoint(chunk_dir, "split", fingerprint, [[path.name, start_time] for path, start_time in chunks])
+    return chunks
+
+def _process_resolutions_chunked(source_path: Path, hls_dir: Path, resolutions: dict, source_dims: tuple,
+                                 progress: TranscodeProgress = None):
+    """
+    Converts long videos by splitting them into keyframe aligned chunks,
+    encoding the chunks in parallel ffmpeg processes and stitching the
+    chunk playlists back into one playlist per resolution.
+    Every finished chunk is checkpointed and the chunk folder is kept until
+    the playlists are stitched, so a retry after the job was killed only
+    encodes the chunks which were not finished yet.
+    Returns a list with playlist data or None on errors.
+    """
+    eligible = _eligible_resolutions(resolutions, source_dims)
+    if not eligible:
+        return None
+
+    chunk_dir = hls_dir / "chunks"
+    chunks = _split_chunks(source_path, chunk_dir)
+    if not chunks:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+        return None
+    fingerprints = {label: _rendition_fingerprint(source_path, label, opts) for label, opts in eligible.items()}
+
+    def encode_chunk(index):
+        chunk_path, start_time = chunks[index]
+        suffix = chunk_suffix(index)
+        name = f"chunk{suffix}"
+        fingerprint = rendition_fingerprint(
+            source_path, {"chunk": index, "start_time": start_time, "renditions": fingerprints}
+        )
+        entries = load_checkpoint(chunk_dir, name, fingerprint)
+        if entries and all(is_playlist_complete(chunk_dir / f"{label}{suffix}.m3u8") for label in eligible):
+            return entries
+        for label in eligible:
+            clear_rendition(chunk_dir, f"{label}{suffix}")
+
+        chunk_progress = None
+        if progress:
+            end_time = chunks[index + 1][1] if index + 1 < len(chunks) else progress.duration
+            chunk_progress = TranscodeProgress(progress.video_id, end_time - start_time)
+        entries = _process_resolutions_single_pass(
+            chunk_path, chunk_dir, eligible, source_dims,
+            suffix=suffix, progress=chunk_progress, output_ts_offset=start_time,
+        )
+        if entries:
+            write_checkpoint(chunk_dir, name, fingerprint, entries)
+        return entries
+
+    with ThreadPoolExecutor(max_workers=settings.HLS_CHUNK_WORKERS) as executor:
+        results = list(executor.map(encode_chunk, range(len(chunks))))
+    if not all(results):
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+        return None
+
+    for label in eligible:
+        stitch_chunk_playlists(hls_dir, chunk_dir, label, len(chunks))
+    shutil.rmtree(chunk_dir, ignore_errors=True)
+    return [_playlist_entry(label, opts) for label, opts in eligible.items()]
+
+def _process_pending_resolutions(encode, source_path: Path, hls_dir: Path, resolutions: dict, source_dims: tuple,
+                                 copy_resolutions: dict = None, progress: TranscodeProgress = None):
+    """
+    Runs a multi-rendition encoder only for the renditions without a valid
+    completion marker, removes their partial output beforehand and marks
+    them as complete afterwards. Renditions in copy_resolutions are remuxed
+    separately and only encoded if remuxing fails.
+    Returns a list with playlist data of all finished renditions or None on errors.
+    """
+    copy_resolutions = copy_resolutions or {}
+    playlist_entries = []
+    pending = {}
+    fingerprints = {}
+    for label, opts in _eligible_resolutions(resolutions, source_dims).items():
+        if label in copy_resolutions:
+            entry = _process_resolution(
+                source_path, hls_dir, label, copy_resolutions[label], source_dims, stream_copy=True, progress=progress
+            )
+            if entry:
+                playlist_entries.append(entry)
+                continue
+        fingerprints[label] = _rendition_fingerprint(source_path, label, opts)
+        entry = load_completed_rendition(hls_dir, label, fingerprints[label])
+        if entry:
+            playlist_entries.append(entry)
+        else:
+            clear_rendition(hls_dir, label)
+            pending[label] = opts
+
+    if pending:
+        entries = encode(source_path, hls_dir, pending, source_dims, progress=progress)
+        if not entries:
+            return None
+        for label, entry in zip(pending, entries):
+            playlist_entries.append(_complete_rendition(hls_dir, label, fingerprints[label], entry))
+
+    playlist_entries.sort(key=lambda entry: int(entry["bandwidth"]))
+    return playlist_entries
+
+def _process_resolutions_single_pass_once(source_path: Path, hls_dir: Path, resolutions: dict, source_dims: tuple,
+                                          copy_resolutions: dict = None, progress: TranscodeProgress = None):
+    """
+    Runs the single pass encode unless an earlier run of it was interrupted.
+    The renditions of a single pass only finish together, so a retry after
+    the job was killed returns None and falls back to one process per
+    rendition, which checkpoints every rendition as soon as it is done.
+    """
+    fingerprint = rendition_fingerprint(source_path, {"mode": SINGLE_PASS_CHECKPOINT})
+    if load_checkpoint(hls_dir, SINGLE_PASS_CHECKPOINT, fingerprint) is not None:
+        return None
+    write_checkpoint(hls_dir, SINGLE_PASS_CHECKPOINT, fingerprint, {})
+    encode = partial(_process_resolutions_single_pass, trickplay_dir=source_path.parent / "trickplay")
+    playlist_entries = _process_pending_resolutions(
+        encode, source_path, hls_dir, resolutions, source_dims, copy_resolutions, progress
+    )
+    clear_checkpoint(hls_dir, SINGLE_PASS_CHECKPOINT)
+    return playlist_entries
+
+def _process_resolutions_progressive(video, source_path: Path, hls_dir: Path, resolutions: dict,
+                                     source_dims: tuple, duration_seconds: float, copy_resolutions: dict = None,
+                                     audio_entry: dict = None, progress: TranscodeProgress = None):
+    """
+    Converts the video from the lowest to the highest resolution and
+    republishes the master playlist after every finished rendition,
+    so the video is playable as soon as the lowest rendition is done.
+    Returns a list with playlist data of all finished renditions.
+    """
+    eligible = _eligible_resolutions(resolutions, source_dims)
+    playlist_entries = []
+    for label, opts in sorted(eligible.items(), key=lambda item: int(item[1]["bitrate"].rstrip("k"))):
+        entry = _process_resolution_or_copy(
+            source_path, hls_dir, label, opts, source_dims, copy_resolutions or {}, progress
+        )
+        if not entry:
+            continue
+        playlist_entries.append(entry)
+        master_path = _create_master_playlist(hls_dir, playlist_entries, audio_entry)
+        if len(playlist_entries) == 1:
+            _update_django_model(video, master_path, duration_seconds)
+    return playlist_entries
+
+def _create_master_playlist(hls_dir: Path, playlist_entries: list, audio_entry: dict = None):
     """
     Creates the master playlist file from all generated playlists.
+    With a shared audio rendition the variants reference it as audio group,
+    I-frame playlists are listed after the variants.
+    The file is replaced atomically, so players never read a partial master.
     """
     if not playlist_entries:
         return None
         
     master_path = hls_dir / "master.m3u8"
-    with master_path.open("w") as f:
+    tmp_path = hls_dir / ".master.m3u8.tmp"
+    with tmp_path.open("w") as f:
         f.write("#EXTM3U\n")
-        f.write("#EXT-X-VERSION:3\n")
+        if settings.HLS_SEGMENT_TYPE == 'fmp4':
+            version = 7
+        elif any(entry.get("iframe_filename") for entry in playlist_entries):
+            version = 4
+        else:
+            version = 3
+        f.write(f"#EXT-X-VERSION:{version}\n")
+        audio_group = ""
+        audio_bandwidth = 0
+        if audio_entry:
+            f.write(
+                f'#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="{AUDIO_GROUP_ID}",NAME="Default",'
+                f'DEFAULT=YES,AUTOSELECT=YES,URI="{audio_entry["filename"]}"\n'
+            )
+            audio_group = f',AUDIO="{AUDIO_GROUP_ID}"'
+            audio_bandwidth = int(audio_entry["bandwidth"])
         for entry in playlist_entries:
-            f.write(f'#EXT-X-STREAM-INF:BANDWIDTH={entry["bandwidth"]},RESOLUTION={entry["resolution"]}\n')
+            bandwidth = int(entry["bandwidth"]) + audio_bandwidth
+            f.write(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={entry["resolution"]}{audio_group}\n')
             f.write(f'{entry["filename"]}\n')
+        for entry in playlist_entries:
+            if entry.get("iframe_filename"):
+                f.write(
+                    f'#EXT-X-I-FRAME-STREAM-INF:BANDWIDTH={entry["iframe_bandwidth"]},'
+                    f'RESOLUTION={entry["resolution"]},URI="{entry["iframe_filename"]}"\n'
+                )
+    os.replace(tmp_path, master_path)
     return master_path
 
 def _update_django_model(video, master_path: Path, duration: float):
@@ -108,8 +669,203 @@ def _update_django_model(video, master_path: Path, duration: float):
     video.duration = int(duration)
     video.save(update_fields=["hls_playlist", "duration"])
 
-def convert_to_hls(video_id: int):
-    """Convert video to HLS format with multiple quality levels."""
+def _enqueue_parallel_renditions(video_id: int, resolutions: dict, source_dims: tuple, duration_seconds: float,
+                                 copy_resolutions: dict = None, audio_entry: dict = None):
+    """
+    Fans the ladder out into one job per rendition on the heavy queue
+    and enqueues a finalizer job that depends on all of them.
+    """
+    eligible = _eligible_resolutions(resolutions, source_dims)
+    if not eligible:
+        return
+
+    queue = django_rq.get_queue('heavy', autocommit=True)
+    rendition_jobs = [
+        queue.enqueue(encode_rendition, video_id, label, opts, source_dims, (copy_resolutions or {}).get(label))
+        for label, opts in eligible.items()
+    ]
+    queue.enqueue(
+        finalize_hls,
+        video_id,
+        duration_seconds,
+        resolutions,
+        source_dims,
+        copy_resolutions,
+        audio_entry,
+        depends_on=Dependency(jobs=rendition_jobs, allow_failure=True),
+    )
+
+def encode_rendition(video_id: int, label: str, opts: dict, source_dims: tuple, copy_opts: dict = None):
+    """Encode a single rendition of the HLS ladder, or remux it if copy_opts are given."""
+    video, source_path, hls_dir = _get_video_and_paths(video_id)
+    if not video:
+        return None
+    copy_resolutions = {label: copy_opts} if copy_opts else {}
+    progress = TranscodeProgress(video_id, video.metadata.duration)
+    return _process_resolution_or_copy(source_path, hls_dir, label, opts, source_dims, copy_resolutions, progress)
+
+def _load_finished_renditions(source_path: Path, hls_dir: Path, resolutions: dict, source_dims: tuple,
+                              copy_resolutions: dict = None):
+    """
+    Returns the playlist data of every rendition with a valid completion
+    marker, remuxed or encoded, sorted by bandwidth.
+    """
+    copy_resolutions = copy_resolutions or {}
+    playlist_entries = []
+    for label, opts in _eligible_resolutions(resolutions, source_dims).items():
+        fingerprints = [_rendition_fingerprint(source_path, label, opts)]
+        if label in copy_resolutions:
+            fingerprints.insert(0, _rendition_fingerprint(source_path, label, copy_resolutions[label], stream_copy=True))
+        entries = (load_completed_rendition(hls_dir, label, fingerprint) for fingerprint in fingerprints)
+        entry = next(filter(None, entries), None)
+        if entry:
+            playlist_entries.append(entry)
+    playlist_entries.sort(key=lambda entry: int(entry["bandwidth"]))
+    return playlist_entries
+
+def finalize_hls(video_id: int, duration_seconds: float, resolutions: dict, source_dims: tuple,
+                 copy_resolutions: dict = None, audio_entry: dict = None):
+    """
+    Write the master playlist from all successfully encoded renditions.
+    They are read from the completion markers in the HLS folder, because
+    RQ drops the results of renditions finished long before the last one.
+    """
+    video, source_path, hls_dir = _get_video_and_paths(video_id)
+    if not video:
+        return
+
+    playlist_entries = _load_finished_renditions(source_path, hls_dir, resolutions, source_dims, copy_resolutions)
+
+    master_path = _create_master_playlist(hls_dir, playlist_entries, audio_entry)
+    if master_path:
+        _update_django_model(video, master_path, duration_seconds)
+        _schedule_upgrade()
+    publish_state(video_id, "finished" if master_path else "failed")
+
+def _find_processed_duplicate(video):
+    """Returns the oldest other video with the same content and finished HLS output or None."""
+    return (
+        Video.objects
+        .filter(content_hash=video.content_hash, hls_playlist__gt="")
+        .exclude(pk=video.pk)
+        .order_by("created_at")
+        .first()
+    )
+
+def _share_processed_media(video, original):
+    """
+    Points the unsaved fields of the video at the source and the processed
+    media of an identical earlier video. Media uploaded with the video itself,
+    e.g. a custom thumbnail, is kept.
+    Returns the probe results and the ladder of the original as metadata
+    fields or None without metadata. The shared renditions stay owned by
+    the original, which alone schedules their upgrade.
+    """
+    video.file.name = original.file.name
+    video.hls_playlist.name = original.hls_playlist.name
+    if not video.thumbnail:
+        video.thumbnail_variants = original.thumbnail_variants
+    for field in ("thumbnail", "preview", "trickplay"):
+        if not getattr(video, field):
+            setattr(video, field, getattr(original, field).name)
+    video.duration = original.duration
+
+    metadata = VideoMetadata.objects.filter(video=original).first()
+    if not metadata:
+        return None
+    fields = {
+        field.name: getattr(metadata, field.name) for field in VideoMetadata._meta.concrete_fields
+        if field.name not in ("id", "video", "probed_at", "encoder_profile", "needs_reencode")
+    }
+    return {**fields, "needs_reencode": False}
+
+def _reuse_processed_duplicate(video, source_path: Path, original):
+    """
+    Points the video at the source and the processed media of an identical
+    earlier upload and removes the re-uploaded copy.
+    """
+    fields = _share_processed_media(video, original)
+    video.save(update_fields=[
+        "file", "hls_playlist", "thumbnail", "thumbnail_variants", "preview", "trickplay", "duration"
+    ])
+    if fields:
+        VideoMetadata.objects.update_or_create(video=video, defaults=fields)
+
+    source_path.unlink()
+    for directory in (source_path.parent / "hls", source_path.parent):
+        try:
+            directory.rmdir()
+        except OSError:
+            pass
+
+def hash_video(video_id: int):
+    """
+    Hash an uploaded video on the default queue and queue its probe again.
+    Reading the whole file takes minutes for large uploads, too long for
+    the fast queue. Chunked uploads and ingested files are hashed already.
+    """
+    video, source_path, hls_dir = _get_video_and_paths(video_id)
+    if not video:
+        return
+
+    if not video.content_hash:
+        video.content_hash = file_digest(source_path)
+        video.save(update_fields=["content_hash"])
+    django_rq.get_queue('fast', autocommit=True).enqueue(probe_video, video_id)
+
+def probe_video(video_id: int):
+    """
+    Probe the uploaded video once and queue the processing tasks.
+    Re-uploads of an already processed file reuse its media instead,
+    videos without content hash are hashed first.
+    """
+    video, source_path, hls_dir = _get_video_and_paths(video_id)
+    if not video:
+        return
+
+    if not video.content_hash:
+        django_rq.get_queue('default', autocommit=True).enqueue(hash_video, video_id)
+        return
+    original = _find_processed_duplicate(video)
+    if original:
+        _reuse_processed_duplicate(video, source_path, original)
+        publish_state(video_id, "finished")
+        return
+
+    if not _store_video_metadata(video, source_path):
+        return
+    enqueue_processing_jobs(video_id)
+
+def processing_jobs():
+    """
+    Returns the queue name, task and enqueue options of every
+    task which processes a probed video. Thumbnail and preview are created
+    in one ffmpeg process on the default queue, which publishes the
+    thumbnail before the preview encode is done.
+    """
+    jobs = [
+        ('heavy', convert_to_hls, {'retry': Retry(max=2)}),
+        ('default', create_thumbnail_and_preview, {}),
+    ]
+    if settings.HLS_ENCODE_MODE != "single_pass":
+        jobs.append(('default', create_trickplay, {}))
+    return jobs
+
+def enqueue_processing_jobs(video_id: int):
+    """Queue the tasks which read the probed metadata."""
+    for queue_name, task, options in processing_jobs():
+        django_rq.get_queue(queue_name, autocommit=True).enqueue(task, video_id, **options)
+
+def convert_to_hls(video_id: int, mode: str = None, encoder_profile: str = None, publish: bool = True):
+    """
+    Convert video to HLS format with multiple quality levels.
+    A retried run resumes from the renditions and chunks finished before,
+    an interrupted single pass is continued one rendition at a time.
+    The mode defaults to HLS_ENCODE_MODE, "chunked" chunks any source.
+    A given encoder profile is used instead of the stored or chosen one.
+    With publish=False neither progress nor states are published and no
+    follow-up jobs are queued, e.g. for benchmarks.
+    """
     video, source_path, hls_dir = _get_video_and_paths(video_id)
     if not video:
         return
@@ -117,115 +873,243 @@ def convert_to_hls(video_id: int):
     if source_path.suffix.lower() == '.webp':
         return
         
-    metadata = _probe_video_metadata(source_path)
+    metadata = _get_video_metadata(video, source_path)
     if not metadata:
         return
-    source_width, source_height, duration_seconds = metadata
+    duration_seconds = metadata.duration
+    mode = mode or settings.HLS_ENCODE_MODE
+    chunked = mode == "chunked" or duration_seconds >= settings.HLS_CHUNKED_MIN_DURATION
+    if mode == "chunked":
+        mode = "single_pass"
+    progress = TranscodeProgress(video_id, duration_seconds) if publish else None
+    if publish:
+        publish_state(video_id, "processing")
 
-    resolutions = {
-        "360p": {"scale": "640x360", "bitrate": "800k"},
-        "480p": {"scale": "854x480", "bitrate": "1400k"},
-        "720p": {"scale": "1280x720", "bitrate": "2800k"},
-        "1080p": {"scale": "1920x1080", "bitrate": "5000k"},
-    }
-    
-    playlist_entries = []
-    for label, opts in resolutions.items():
-        entry = _process_resolution(source_path, hls_dir, label, opts, (source_width, source_height))
-        if entry:
-            playlist_entries.append(entry)
+    source_dims = (metadata.width, metadata.height)
+    resolutions = _apply_encoder_profile(
+        _select_ladder(metadata, source_path), encoder_profile or _choose_encoder_profile(metadata)
+    )
+    copy_resolutions = _stream_copy_resolutions(metadata, resolutions) if settings.HLS_STREAM_COPY else {}
+    audio_entry = _process_audio(source_path, hls_dir, metadata, progress) if settings.HLS_SHARED_AUDIO else None
+    playlist_entries = None
+    if chunked:
+        playlist_entries = _process_pending_resolutions(
+            _process_resolutions_chunked, source_path, hls_dir, resolutions, source_dims, copy_resolutions, progress
+        )
+    elif mode == "parallel":
+        _enqueue_parallel_renditions(
+            video_id, resolutions, source_dims, duration_seconds, copy_resolutions, audio_entry
+        )
+        return
+    elif mode == "progressive":
+        playlist_entries = _process_resolutions_progressive(
+            video, source_path, hls_dir, resolutions, source_dims, duration_seconds, copy_resolutions, audio_entry,
+            progress,
+        )
 
-    master_path = _create_master_playlist(hls_dir, playlist_entries)
+    if not playlist_entries and mode == "single_pass":
+        playlist_entries = _process_resolutions_single_pass_once(
+            source_path, hls_dir, resolutions, source_dims, copy_resolutions, progress
+        )
+
+    if not playlist_entries:
+        playlist_entries = _process_resolutions_per_rendition(
+            source_path, hls_dir, resolutions, source_dims, copy_resolutions, progress
+        )
+
+    master_path = _create_master_playlist(hls_dir, playlist_entries, audio_entry)
     if master_path:
         _update_django_model(video, master_path, duration_seconds)
+        clear_checkpoint(hls_dir, SINGLE_PASS_CHECKPOINT)
+    if not publish:
+        return
+    if master_path:
+        _schedule_upgrade()
+    publish_state(video_id, "finished" if master_path else "failed")
 
-def create_thumbnail(video_id):
-    """Create thumbnail from video frame at 5 seconds."""
-    video = Video.objects.get(id=video_id)
-    source = Path(video.file.path)
-    thumbnail_dir = source.parent / "thumbnails"
+    if mode == "single_pass":
+        django_rq.get_queue('default', autocommit=True).enqueue(create_trickplay, video_id)
 
-    if thumbnail_dir.exists() and any(thumbnail_dir.iterdir()):
-        return
-
-    def args(source, target):
-        return [
-            "ffmpeg",
-            "-ss", "00:00:05",
-            "-i", str(source),
-            "-vframes", "1",
-            "-q:v", "2",
-            str(target),
-        ]
-
-    run_ffmpeg_task(
-        video_id=video_id,
-        target_subdir="thumbnails",
-        filename_suffix="thumb.jpg",
-        ffmpeg_args=args,
-        model_field="thumbnail",
-    )
+def _schedule_upgrade():
+    """Queues the upgrade of fast encodes once the heavy queue ran empty."""
+    queue = django_rq.get_queue('heavy', autocommit=True)
+    if not queue.count and VideoMetadata.objects.filter(needs_reencode=True).exists():
+        queue.enqueue(upgrade_fast_encode)
 
-def get_video_resolution(path: Path) -> tuple[int, int]:
+def _reencode_hls(source_path: Path, hls_dir: Path, metadata):
     """
-    Get the resolution (width and height) of a video file.
+    Encodes the full ladder with the efficient profile into a staging folder
+    and swaps it with the published HLS folder once every rendition is done.
+    Returns True if the published renditions were replaced.
     """
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "stream=width,height",
-        "-of", "csv=p=0",
-        str(path),
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    width, height = map(int, result.stdout.strip().split(','))
-    return width, height
+    staging_dir = hls_dir.with_name("hls_staging")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    staging_dir.mkdir()
+
+    source_dims = (metadata.width, metadata.height)
+    resolutions = _apply_encoder_profile(_select_ladder(metadata, source_path), "efficient")
+    copy_resolutions = _stream_copy_resolutions(metadata, resolutions) if settings.HLS_STREAM_COPY else {}
+    audio_entry = _process_audio(source_path, staging_dir, metadata) if settings.HLS_SHARED_AUDIO else None
+    playlist_entries = _process_pending_resolutions(
+        _process_resolutions_single_pass, source_path, staging_dir, resolutions, source_dims, copy_resolutions
+    ) or _process_resolutions_per_rendition(source_path, staging_dir, resolutions, source_dims, copy_resolutions)
 
-def get_video_duration(path: Path) -> float:
+    complete = len(playlist_entries) == len(_eligible_resolutions(resolutions, source_dims))
+    if not complete or not _create_master_playlist(staging_dir, playlist_entries, audio_entry):
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return False
+
+    replaced_dir = hls_dir.with_name("hls_replaced")
+    shutil.rmtree(replaced_dir, ignore_errors=True)
+    os.rename(hls_dir, replaced_dir)
+    os.rename(staging_dir, hls_dir)
+    shutil.rmtree(replaced_dir, ignore_errors=True)
+    return True
+
+def upgrade_fast_encode():
     """
-    Get the duration of a video file in seconds.
+    Re-encodes one video published with the fast profile while the heavy
+    queue is idle and queues itself again for the next one.
     """
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        str(path),
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return float(result.stdout.strip())
+    if django_rq.get_queue('heavy').count:
+        return
+    metadata = (
+        VideoMetadata.objects
+        .filter(needs_reencode=True, video__hls_playlist__gt="")
+        .order_by("probed_at")
+        .first()
+    )
+    if not metadata or not VideoMetadata.objects.filter(pk=metadata.pk, needs_reencode=True).update(needs_reencode=False):
+        return
 
-def create_preview(video_id):
-    """Create 20-second preview video starting at 25% duration."""
+    video, source_path, hls_dir = _get_video_and_paths(metadata.video_id)
+    if video and _reencode_hls(source_path, hls_dir, metadata):
+        metadata.encoder_profile = "efficient"
+        metadata.save(update_fields=["encoder_profile"])
+    _schedule_upgrade()
+
+def create_trickplay(video_id):
+    """
+    Create trickplay sprite sheets and their WebVTT index for seek previews.
+    Sprite sheets already written by the single pass HLS encode are reused.
+    """
     video = Video.objects.get(id=video_id)
     source = Path(video.file.path)
+    trickplay_dir = source.parent / "trickplay"
+
+    metadata = _get_video_metadata(video, source)
+    if not metadata:
+        return
+    source_dims = (metadata.width, metadata.height)
+
+    sprites = list(trickplay_dir.glob("sprite_*.jpg")) if trickplay_dir.exists() else []
+    if len(sprites) != sprite_count(metadata.duration):
+        for sprite in sprites:
+            sprite.unlink()
+        trickplay_dir.mkdir(exist_ok=True)
+        try:
+            sprites = sprite_filter(ffmpeg.input(str(source)).video, source_dims)
+            output = ffmpeg.output(sprites, str(trickplay_dir / SPRITE_PATTERN), **{'q:v': 5})
+            _run_ffmpeg(output, TranscodeProgress(video_id, metadata.duration), ("trickplay",))
+        except ffmpeg.Error as e:
+            return
+
+    vtt_path = write_trickplay_vtt(trickplay_dir, metadata.duration, source_dims)
+    video.trickplay.name = str(vtt_path.relative_to(Path(settings.MEDIA_ROOT)))
+    video.save(update_fields=["trickplay"])
+
+def _create_thumbnail_and_preview(video_id: int, thumbnail: bool = True, preview: bool = True,
+                                  publish: bool = True):
+    """
+    Creates the thumbnail variants and the preview clip with one ffmpeg
+    process. The 20-second preview is encoded from 25% of the video, while
+    THUMBNAIL_CANDIDATES frames one second apart from THUMBNAIL_SECONDS are
+    piped to Pillow as raw PPM. The most detailed one is resized into every
+    thumbnail width and format in memory and published as soon as the frames
+    arrived, before the preview is finished. With THUMBNAIL_FROM_PREVIEW
+    both are taken from one seek. An uploaded thumbnail is resized instead,
+    parts which already exist are skipped. With publish=False no progress
+    is published.
+    """
+    video = Video.objects.get(id=video_id)
+    source = Path(video.file.path)
+    thumbnail_dir = source.parent / "thumbnails"
     preview_dir = source.parent / "preview"
+    media_root = Path(settings.MEDIA_ROOT)
 
-    if preview_dir.exists() and any(preview_dir.iterdir()):
+    if thumbnail and video.thumbnail and not video.thumbnail_variants:
+        with Image.open(video.thumbnail.path) as image:
+            video.thumbnail_variants = write_thumbnail_variants(image, thumbnail_dir, source.stem)
+        video.save(update_fields=["thumbnail_variants"])
+    thumbnail = thumbnail and not video.thumbnail
+    preview = preview and not (preview_dir.exists() and any(preview_dir.iterdir()))
+    if not thumbnail and not preview:
         return
 
-    duration = get_video_duration(source)
-    start_time = int(duration * 0.25)
-    width, height = get_video_resolution(source)
-    target_width, target_height = (1920, 1080) if width >= 1280 else (1280, 720)
-    vf_filter = (
-        f"scale={target_width}:{target_height}:force_original_aspect_ratio=decrease,"
-        f"pad={target_width}:{target_height}:(ow-iw)/2:(oh-ih)/2"
-    )
+    metadata = _get_video_metadata(video, source)
+    if not metadata:
+        return
+    start_time = int(metadata.duration * 0.25)
+    preview_duration = min(20, metadata.duration - start_time)
+    if settings.THUMBNAIL_FROM_PREVIEW:
+        thumbnail_time = start_time
+    else:
+        thumbnail_time = settings.THUMBNAIL_SECONDS if metadata.duration > settings.THUMBNAIL_SECONDS else 0
 
-    def args(source, target):
-        return [
-            "ffmpeg", "-ss", str(start_time), "-i", str(source),
-            "-t", "20",
-            "-vf", vf_filter,
-            "-c:v", "libx264", "-c:a", "aac", str(target)
-        ]
-
-    run_ffmpeg_task(
-        video_id=video_id,
-        target_subdir="preview",
-        filename_suffix="preview.mp4",
-        ffmpeg_args=args,
-        model_field="preview",
-    )
+    seeks = [time for time, wanted in ((start_time, preview), (thumbnail_time, thumbnail)) if wanted]
+    inputs = {time: ffmpeg.input(str(source), ss=time) for time in seeks}
+    branches = {time: stream.video.filter_multi_output('split', seeks.count(time)) for time, stream in inputs.items()}
+    outputs = []
+    if preview:
+        preview_dir.mkdir(exist_ok=True)
+        preview_path = preview_dir / f"{source.stem}_preview.mp4"
+        target = {"scale": "1920x1080" if metadata.width >= 1280 else "1280x720"}
+        preview_streams = [_scale_and_pad(branches[start_time].stream(0), target)]
+        if metadata.audio_codec:
+            preview_streams.append(inputs[start_time].audio)
+        outputs.append(ffmpeg.output(
+            *preview_streams, str(preview_path), t=20, vcodec='libx264', acodec='aac'
+        ))
+    if thumbnail:
+        frames = (
+            branches[thumbnail_time].stream(seeks.count(thumbnail_time) - 1)
+            .filter('fps', 1)
+            .filter('scale', min(metadata.width, max(settings.THUMBNAIL_WIDTHS)), -2)
+        )
+        outputs.append(ffmpeg.output(
+            frames, 'pipe:1', format='image2pipe', vcodec='ppm', vframes=settings.THUMBNAIL_CANDIDATES
+        ))
+
+    def publish_thumbnail(images):
+        """Publishes the thumbnail from the piped frames while the preview is still encoded."""
+        if images:
+            video.thumbnail_variants = write_thumbnail_variants(pick_thumbnail_frame(images), thumbnail_dir, source.stem)
+            video.thumbnail.name = largest_variant(video.thumbnail_variants)
+            video.save(update_fields=["thumbnail", "thumbnail_variants"])
+
+    stages = tuple(stage for stage, wanted in (("thumbnail", thumbnail), ("preview", preview)) if wanted and publish)
+    try:
+        with transcode_slot():
+            TranscodeProgress(video_id, preview_duration if preview else settings.THUMBNAIL_CANDIDATES).run(
+                ffmpeg.merge_outputs(*outputs).overwrite_output().compile(), *stages,
+                read_output=partial(read_ppm_frames, count=settings.THUMBNAIL_CANDIDATES) if thumbnail else None,
+                on_output=publish_thumbnail if thumbnail else None,
+            )
+    except ffmpeg.Error as e:
+        return
+
+    if preview:
+        video.preview.name = str(preview_path.relative_to(media_root))
+        video.save(update_fields=["preview"])
+
+def create_thumbnail_and_preview(video_id, publish: bool = True):
+    """Create the thumbnail variants and the preview clip in one pass over the source."""
+    _create_thumbnail_and_preview(video_id, publish=publish)
+
+def create_thumbnail(video_id, publish: bool = True):
+    """Create the thumbnail variants from frames at THUMBNAIL_SECONDS."""
+    _create_thumbnail_and_preview(video_id, preview=False, publish=publish)
+
+def create_preview(video_id, publish: bool = True):
+    """Create 20-second preview video starting at 25% duration."""
+    _create_thumbnail_and_preview(video_id, thumbnail=False, publish=publish)
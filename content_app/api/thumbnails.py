@@ -0,0 +1,79 @@
+import re
+from pathlib import Path
+from django.conf import settings
+from PIL import Image
+
+PPM_HEADER = re.compile(rb"P6\s+(\d+)\s+(\d+)\s+255\s")
+EXTENSIONS = {"jpeg": "jpg"}
+SAVE_OPTIONS = {
+    "avif": {"quality": 60},
+    "webp": {"quality": 80, "method": 4},
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+}
+
+
+def thumbnail_formats():
+    """Returns the configured thumbnail formats this Pillow build can encode."""
+    Image.init()
+    return [name for name in settings.THUMBNAIL_FORMATS if name.upper() in Image.SAVE]
+
+
+def read_ppm_frames(stream, count: int):
+    """
+    Reads up to count binary PPM frames from a pipe as soon as ffmpeg writes
+    them, without waiting for the end of the stream. Returns the RGB images.
+    """
+    images = []
+    data = bytearray()
+    while len(images) < count:
+        match = PPM_HEADER.match(data)
+        if match:
+            width, height = int(match[1]), int(match[2])
+            end = match.end() + width * height * 3
+            if len(data) >= end:
+                images.append(Image.frombytes("RGB", (width, height), bytes(data[match.end():end])))
+                del data[:end]
+                continue
+        block = stream.read1(1024 * 1024)
+        if not block:
+            break
+        data += block
+    return images
+
+
+def pick_thumbnail_frame(images: list):
+    """Returns the frame with the most detail, so black or faded frames are skipped."""
+    return max(images, key=lambda image: image.entropy())
+
+
+def write_thumbnail_variants(image: Image.Image, thumbnail_dir: Path, stem: str):
+    """
+    Writes the image in every configured width and format, never larger
+    than the image itself. Returns a dictionary of format to width to the
+    file path relative to MEDIA_ROOT.
+    """
+    image = image.convert("RGB")
+    thumbnail_dir.mkdir(parents=True, exist_ok=True)
+    variants = {}
+    for width in sorted({min(width, image.width) for width in settings.THUMBNAIL_WIDTHS}):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for name in thumbnail_formats():
+            path = thumbnail_dir / f"{stem}_{width}w.{EXTENSIONS.get(name, name)}"
+            resized.save(path, name.upper(), **SAVE_OPTIONS.get(name, {}))
+            variants.setdefault(name, {})[str(width)] = str(path.relative_to(Path(settings.MEDIA_ROOT)))
+    return variants
+
+
+def largest_variant(variants: dict):
+    """Returns the path of the widest JPEG variant, or of the first format without JPEG."""
+    sizes = variants.get("jpeg") or next(iter(variants.values()), {})
+    return sizes[max(sizes, key=int)] if sizes else None
+
+
+def thumbnail_srcset(variants: dict, url):
+    """Builds a srcset string per format, url turns a relative path into its URL."""
+    return {
+        name: ", ".join(f"{url(path)} {width}w" for width, path in sorted(sizes.items(), key=lambda item: int(item[0])))
+        for name, sizes in (variants or {}).items()
+    }
@@ -0,0 +1,70 @@
+import math
+from pathlib import Path
+from django.conf import settings
+
+SPRITE_PATTERN = "sprite_%03d.jpg"
+VTT_FILENAME = "trickplay.vtt"
+
+
+def tile_size(source_dims: tuple):
+    """
+    Returns width and height of one thumbnail in the sprite sheets,
+    keeping the aspect ratio of the source at an even height.
+    """
+    source_width, source_height = source_dims
+    tile_width = settings.TRICKPLAY_TILE_WIDTH
+    tile_height = max(2, round(tile_width * source_height / source_width / 2) * 2)
+    return tile_width, tile_height
+
+
+def sprite_filter(video_stream, source_dims: tuple):
+    """
+    Samples one frame every TRICKPLAY_INTERVAL seconds, scales it to the
+    tile size and packs the frames into sprite sheets.
+    """
+    tile_width, tile_height = tile_size(source_dims)
+    return (
+        video_stream
+        .filter('fps', f"1/{settings.TRICKPLAY_INTERVAL}")
+        .filter('scale', tile_width, tile_height)
+        .filter('tile', f"{settings.TRICKPLAY_COLUMNS}x{settings.TRICKPLAY_ROWS}")
+    )
+
+
+def sprite_count(duration: float):
+    """Returns the number of sprite sheets for a video of the given duration."""
+    thumbnails = math.ceil(duration / settings.TRICKPLAY_INTERVAL)
+    return math.ceil(thumbnails / (settings.TRICKPLAY_COLUMNS * settings.TRICKPLAY_ROWS))
+
+
+def _timestamp(seconds: float):
+    """Formats seconds as WebVTT timestamp."""
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+
+def write_trickplay_vtt(trickplay_dir: Path, duration: float, source_dims: tuple):
+    """
+    Writes the WebVTT index which maps every interval of the video to
+    its thumbnail in the sprite sheets via a #xywh media fragment.
+    """
+    tile_width, tile_height = tile_size(source_dims)
+    per_sheet = settings.TRICKPLAY_COLUMNS * settings.TRICKPLAY_ROWS
+    interval = settings.TRICKPLAY_INTERVAL
+    vtt_path = trickplay_dir / VTT_FILENAME
+
+    with vtt_path.open("w") as f:
+        f.write("WEBVTT\n")
+        for index in range(math.ceil(duration / interval)):
+            sheet, position = divmod(index, per_sheet)
+            row, column = divmod(position, settings.TRICKPLAY_COLUMNS)
+            start, end = index * interval, min((index + 1) * interval, duration)
+            f.write(f"\n{_timestamp(start)} --> {_timestamp(end)}\n")
+            f.write(
+                f"{SPRITE_PATTERN % (sheet + 1)}"
+                f"#xywh={column * tile_width},{row * tile_height},{tile_width},{tile_height}\n"
+            )
+    return vtt_path
@@ -0,0 +1,157 @@
+import base64
+import binascii
+import os
+import time
+from pathlib import Path
+from django.conf import settings
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from ..models import Video, VideoUpload, video_upload_path
+from .hashing import hash_prefix
+
+TUS_VERSION = "1.0.0"
+TUS_EXTENSIONS = "creation,termination"
+OFFSET_CONTENT_TYPE = "application/offset+octet-stream"
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+_running_hashes = {}
+
+
+def parse_upload_metadata(header: str):
+    """
+    Parses a tus Upload-Metadata header of comma separated keys with
+    base64 encoded values into a dictionary. Raises ValueError if a value
+    is not valid base64 or UTF-8.
+    """
+    metadata = {}
+    for pair in filter(None, (item.strip() for item in header.split(","))):
+        key, _, value = pair.partition(" ")
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode() if value else ""
+        except (binascii.Error, UnicodeDecodeError):
+            raise ValueError(f"invalid value for {key}")
+    return metadata
+
+
+def create_upload(validated_data: dict, filename: str):
+    """
+    Creates an upload and the empty file at the final location of the video,
+    so chunks are appended in place and never copied afterwards.
+    """
+    upload = VideoUpload(**validated_data)
+    upload.file.name = video_upload_path(upload, get_valid_filename(os.path.basename(filename)) or "upload")
+    path = Path(upload.file.path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    upload.save()
+    return upload
+
+
+def _running_hash(upload: VideoUpload, path: Path):
+    """
+    Returns the hash of the bytes received so far. It is kept in memory
+    between chunks, a process that did not receive the previous chunk
+    rehashes the partial file once and drops its outdated entry.
+    """
+    offset, hasher, _ = _running_hashes.pop(upload.pk, (None, None, None))
+    if offset != upload.offset:
+        hasher = hash_prefix(path, upload.offset)
+    return hasher
+
+
+def _prune_running_hashes():
+    """Drops the running hashes of uploads without chunk for VIDEO_UPLOAD_HASH_TTL seconds."""
+    expired = time.monotonic() - settings.VIDEO_UPLOAD_HASH_TTL
+    for pk in [pk for pk, (_, _, used_at) in _running_hashes.items() if used_at < expired]:
+        _running_hashes.pop(pk, None)
+
+
+def append_chunk(upload: VideoUpload, stream):
+    """
+    Appends the request body to the upload file in blocks, so memory use is
+    constant for any chunk size. Bytes received before the client went away
+    are kept and the offset is saved in any case. Anything written past the
+    stored offset by an interrupted earlier request is truncated first.
+    """
+    _prune_running_hashes()
+    path = Path(upload.file.path)
+    hasher = _running_hash(upload, path)
+    remaining = upload.length - upload.offset
+    try:
+        with path.open("r+b") as f:
+            f.seek(upload.offset)
+            f.truncate()
+            while remaining and stream:
+                try:
+                    block = stream.read(min(UPLOAD_BLOCK_SIZE, remaining))
+                except OSError:
+                    break
+                if not block:
+                    break
+                f.write(block)
+                hasher.update(block)
+                upload.offset += len(block)
+                remaining -= len(block)
+    finally:
+        _running_hashes[upload.pk] = (upload.offset, hasher, time.monotonic())
+        upload.save(update_fields=["offset"])
+
+
+def claim_upload(upload: VideoUpload):
+    """
+    Marks a fully received upload as completed. Returns True only for the
+    one request that changed the state, the others must not complete it.
+    """
+    if upload.offset != upload.length:
+        return False
+    upload.completed_at = timezone.now()
+    return bool(
+        VideoUpload.objects.filter(pk=upload.pk, completed_at__isnull=True).update(completed_at=upload.completed_at)
+    )
+
+
+def complete_upload(upload: VideoUpload):
+    """
+    Creates the video of a claimed upload on the uploaded file, with the
+    content hash computed while the chunks arrived. Creating the video
+    queues its processing. The claim is released if that fails, so the
+    client can complete the upload again.
+    """
+    try:
+        return _create_video(upload)
+    except Exception:
+        VideoUpload.objects.filter(pk=upload.pk).update(completed_at=None)
+        raise
+
+
+def _create_video(upload: VideoUpload):
+    """Creates the video of an upload and links it to the upload."""
+    path = Path(upload.file.path)
+    _, hasher, _ = _running_hashes.pop(upload.pk, (None, None, None))
+    if hasher is None:
+        hasher = hash_prefix(path, upload.length)
+    video = Video(
+        uuid=upload.uuid,
+        title=upload.title,
+        description=upload.description,
+        preview_title=upload.preview_title,
+        category=upload.category,
+        content_hash=hasher.hexdigest(),
+    )
+    video.file.name = upload.file.name
+    video.save()
+    upload.video = video
+    upload.save(update_fields=["video"])
+    return video
+
+
+def discard_upload(upload: VideoUpload):
+    """Deletes an incomplete upload together with its partial file."""
+    _running_hashes.pop(upload.pk, None)
+    path = Path(upload.file.path)
+    path.unlink(missing_ok=True)
+    try:
+        path.parent.rmdir()
+    except OSError:
+        pass
+    upload.delete()
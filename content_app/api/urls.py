@@ -1,10 +1,11 @@
 from rest_framework import routers
-from .views import VideoViewSet
+from .views import VideoUploadViewSet, VideoViewSet
 from django.urls import path
 
 app_name = 'content_app'
 
 router = routers.SimpleRouter()
+router.register(r'video/upload', VideoUploadViewSet, basename='video-upload')
 router.register(r'video', VideoViewSet)
 
 urlpatterns = router.urls 
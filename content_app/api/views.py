@@ -1,6 +1,21 @@
-from ..models import Video
-from rest_framework import viewsets
-from .serializers import VideoSerializer
+from ..models import Video, VideoUpload
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.urls import reverse
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from .progress import get_progress
+from .cache import catalog_cache, list_key, request_origin, video_key
+from .conditional import catalog_validators, not_modified_response, video_validators, with_validators
+from .pagination import VideoCursorPagination
+from .serializers import VideoListSerializer, VideoSerializer, VideoUploadSerializer
+from .signing import TOKEN_PARAMETER, sign_media_path
+from .uploads import (
+    OFFSET_CONTENT_TYPE, TUS_EXTENSIONS, TUS_VERSION,
+    append_chunk, claim_upload, complete_upload, create_upload, discard_upload, parse_upload_metadata,
+)
 from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from user_app.authentication import CookieJWTAuthentication
@@ -11,17 +26,217 @@ class VideoViewSet(viewsets.ReadOnlyModelViewSet):
     authentication_classes = [CookieJWTAuthentication]
     serializer_class = VideoSerializer
     queryset = Video.objects.all()
+    pagination_class = VideoCursorPagination
+
+    def get_queryset(self):
+        """Load only the card fields for the list."""
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.only(*VideoListSerializer.Meta.only)
+        return queryset
+
+    def get_serializer_class(self):
+        """Use the lean card serializer for the list and the full one otherwise."""
+        if self.action == 'list':
+            return VideoListSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        """
+        List one catalog page, served from the catalog cache while the catalog is unchanged.
+        Conditional requests are answered from the catalog version before any query runs.
+        """
+        state = catalog_cache.state()
+        validators = catalog_validators(state) if state else None
+        if validators and (not_modified := not_modified_response(request, *validators)):
+            return not_modified
+
+        origin = request_origin(request)
+        key = list_key(request.query_params.get('cursor'), request.query_params.get('page_size'))
+        data = catalog_cache.get(key, origin)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            catalog_cache.set(key, origin, data)
+        response = Response(data)
+        return with_validators(response, *validators) if validators else response
 
     def retrieve(self, request, *args, **kwargs):
-        """Retrieve single video instance with HTTPS URLs."""
+        """
+        Retrieve single video instance with HTTPS URLs, cached until the video changes.
+        Conditional requests are answered from updated_at before the video is serialized.
+        """
+        origin = request_origin(request)
+        pk = kwargs.get('pk')
+        key = video_key(pk)
+        cached = catalog_cache.get(key, origin)
+        if cached is None or 'updated_at' not in cached:
+            state = catalog_cache.state()
+            try:
+                row = Video.objects.filter(pk=pk).values('updated_at', 'hls_playlist').first()
+            except ValueError:
+                row = None
+            if not row:
+                raise NotFound({"error": "video does not exist or is removed."})
+            validators = video_validators(pk, row['updated_at'].timestamp(), bool(row['hls_playlist']))
+            if not_modified := not_modified_response(request, *validators):
+                return not_modified
+
+            try:
+                instance = self.get_object()
+            except:
+                raise NotFound({"error": "video does not exist or is removed."})
+            serializer = self.get_serializer(instance)
+            data = serializer.data
+
+            if hasattr(instance, 'file') and hasattr(instance.file, 'url'):
+             data['file'] = request.build_absolute_uri(instance.file.url).replace("http://", "https://")
+
+            cached = {
+                "data": data,
+                "hls_playlist": instance.hls_playlist.name or None,
+                "updated_at": instance.updated_at.timestamp(),
+            }
+            catalog_cache.set(key, origin, cached, version=state and state[0])
+
+        validators = video_validators(pk, cached["updated_at"], bool(cached["hls_playlist"]))
+        if not_modified := not_modified_response(request, *validators):
+            return not_modified
+        data = dict(cached["data"])
+        if cached["hls_playlist"]:
+            data['hls_playlist'] = f"{data['hls_playlist']}?{TOKEN_PARAMETER}={sign_media_path(cached['hls_playlist'])}"
+
+        return with_validators(Response(data), *validators)
+
+    @action(detail=True, methods=['get'])
+    def status(self, request, pk=None):
+        """Return the processing progress of a video without serializing the video itself."""
         try:
-            instance = self.get_object()
-        except:
+            video = Video.objects.filter(pk=pk).values('id', 'hls_playlist').first()
+        except ValueError:
+            video = None
+        if not video:
             raise NotFound({"error": "video does not exist or is removed."})
-        serializer = self.get_serializer(instance)
-        data = serializer.data
+        progress = get_progress(video['id']) or {"state": None, "stages": {}}
+        return Response({"id": video['id'], "ready": bool(video['hls_playlist']), **progress})
+
+
+def _tus_headers(upload=None):
+    """Return the tus protocol headers, with the offset and length of an upload."""
+    headers = {'Tus-Resumable': TUS_VERSION}
+    if upload:
+        headers.update({'Upload-Offset': str(upload.offset), 'Upload-Length': str(upload.length)})
+    return headers
+
+
+class VideoUploadViewSet(viewsets.ViewSet):
+    """
+    Resumable chunked uploads following the tus protocol, admins only.
+    POST announces size and metadata, HEAD returns the received offset and
+    PATCH appends a chunk at that offset. The video is created once the
+    last byte arrived.
+    """
+    authentication_classes = [CookieJWTAuthentication]
+    permission_classes = [IsAdminUser]
+    lookup_field = 'uuid'
+
+    def _get_upload(self, uuid, lock=False):
+        """Return the upload with the given uuid, locked for the transaction if requested."""
+        uploads = VideoUpload.objects.select_for_update() if lock else VideoUpload.objects
+        try:
+            upload = uploads.filter(uuid=uuid).first()
+        except (ValueError, ValidationError):
+            upload = None
+        if not upload:
+            raise NotFound({"error": "upload does not exist or is removed."})
+        return upload
+
+    def options(self, request, *args, **kwargs):
+        """Announce the supported tus version, extensions and maximum size."""
+        headers = {
+            **_tus_headers(),
+            'Tus-Version': TUS_VERSION,
+            'Tus-Extension': TUS_EXTENSIONS,
+            'Tus-Max-Size': str(settings.VIDEO_UPLOAD_MAX_SIZE),
+        }
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=headers)
+
+    def create(self, request):
+        """Create an upload from the Upload-Length and Upload-Metadata headers."""
+        try:
+            length = int(request.headers.get('Upload-Length', ''))
+            metadata = parse_upload_metadata(request.headers.get('Upload-Metadata', ''))
+        except ValueError:
+            return Response(
+                {"error": "Upload-Length and valid Upload-Metadata headers are required."},
+                status=status.HTTP_400_BAD_REQUEST, headers=_tus_headers(),
+            )
+        if length > settings.VIDEO_UPLOAD_MAX_SIZE:
+            return Response(
+                {"error": "upload is too large."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, headers=_tus_headers(),
+            )
+        if not metadata.get('filename'):
+            return Response(
+                {"error": "filename metadata is required."},
+                status=status.HTTP_400_BAD_REQUEST, headers=_tus_headers(),
+            )
+        serializer = VideoUploadSerializer(data={**metadata, 'length': length})
+        serializer.is_valid(raise_exception=True)
+        upload = create_upload(serializer.validated_data, metadata['filename'])
+        location = request.build_absolute_uri(
+            reverse('content_app:video-upload-detail', kwargs={'uuid': upload.uuid})
+        )
+        return Response(status=status.HTTP_201_CREATED, headers={**_tus_headers(upload), 'Location': location})
+
+    def retrieve(self, request, uuid=None):
+        """Return the received offset, HEAD requests get the headers only."""
+        upload = self._get_upload(uuid)
+        data = {"uuid": upload.uuid, "offset": upload.offset, "length": upload.length, "video": upload.video_id}
+        return Response(data, headers={**_tus_headers(upload), 'Cache-Control': 'no-store'})
+
+    def partial_update(self, request, uuid=None):
+        """Append the request body at Upload-Offset, create the video once complete."""
+        if request.content_type.split(';')[0].strip() != OFFSET_CONTENT_TYPE:
+            return Response(
+                {"error": f"content type must be {OFFSET_CONTENT_TYPE}."},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, headers=_tus_headers(),
+            )
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            content_length = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            return Response(
+                {"error": "Upload-Offset header is required."},
+                status=status.HTTP_400_BAD_REQUEST, headers=_tus_headers(),
+            )
+
+        with transaction.atomic():
+            upload = self._get_upload(uuid, lock=True)
+            if upload.completed_at or offset != upload.offset:
+                return Response(
+                    {"error": "offset does not match the upload."},
+                    status=status.HTTP_409_CONFLICT, headers=_tus_headers(upload),
+                )
+            if offset + content_length > upload.length:
+                return Response(
+                    {"error": "chunk exceeds the upload length."},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, headers=_tus_headers(upload),
+                )
+            append_chunk(upload, request.stream)
+            completed = claim_upload(upload)
 
-        if hasattr(instance, 'file') and hasattr(instance.file, 'url'):
-         data['file'] = request.build_absolute_uri(instance.file.url).replace("http://", "https://")
+        if completed:
+            complete_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=_tus_headers(upload))
 
-        return Response(data)
\ No newline at end of file
+    def destroy(self, request, uuid=None):
+        """Terminate an incomplete upload and delete its partial file."""
+        with transaction.atomic():
+            upload = self._get_upload(uuid, lock=True)
+            if upload.completed_at:
+                return Response(
+                    {"error": "upload is complete, delete the video instead."},
+                    status=status.HTTP_409_CONFLICT, headers=_tus_headers(upload),
+                )
+            discard_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=_tus_headers())
@@ -0,0 +1,256 @@
+import json
+import multiprocessing
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.test import override_settings
+from django.test.utils import setup_databases, teardown_databases
+from core import settings as core_settings
+from content_app.api import signals, tasks
+from content_app.api.profiles import ENCODER_PROFILES
+from content_app.models import Video
+
+STAGES = {
+    "probe": None,
+    "hls": tasks.convert_to_hls,
+    "thumbnail": tasks.create_thumbnail,
+    "preview": tasks.create_preview,
+    "thumbnail_preview": tasks.create_thumbnail_and_preview,
+}
+MODES = ["single_pass", "per_rendition", "progressive", "chunked"]
+SIGNAL_RECEIVERS = [
+    (post_save, signals.video_post_save),
+    (post_save, signals.invalidate_catalog_cache),
+    (post_delete, signals.delete_folder_on_model_delete),
+    (post_delete, signals.invalidate_catalog_cache),
+]
+
+
+def generate_clip(clip_dir: Path, size: str, duration: int):
+    """
+    Renders a deterministic test clip from the lavfi test sources with a
+    fixed GOP like real uploads. Bitexact flags and a single encoder thread
+    make the file identical on every run, existing clips are reused.
+    """
+    clip_path = clip_dir / f"{size}_{duration}s.mp4"
+    if clip_path.exists():
+        return clip_path
+    clip_dir.mkdir(parents=True, exist_ok=True)
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=24:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-g", "48", "-threads", "1",
+        "-c:a", "aac", "-b:a", "128k",
+        "-fflags", "+bitexact", "-flags:v", "+bitexact", "-flags:a", "+bitexact",
+        str(clip_path),
+    ], check=True, capture_output=True)
+    return clip_path
+
+
+def _directory_size(directory: Path, exclude: Path):
+    """Returns the size of all files below directory except exclude in bytes."""
+    return sum(path.stat().st_size for path in directory.rglob("*") if path.is_file() and path != exclude)
+
+
+def _cpu_seconds(usage):
+    """Returns user plus system time of a resource usage."""
+    return usage.ru_utime + usage.ru_stime
+
+
+def _disconnect_signals():
+    """
+    Disconnects the signal receivers of videos, so a case neither queues
+    jobs nor touches the catalog cache of the running system. The process
+    is a forked child, the receivers are not connected again.
+    """
+    for signal, receiver in SIGNAL_RECEIVERS:
+        signal.disconnect(receiver, sender=Video)
+
+
+def _run_stage(stage: str, video_id: int, mode: str, encoder_profile: str):
+    """
+    Runs one stage without publishing progress or states and without
+    queueing follow-up jobs. HLS cases get the mode and the pinned encoder
+    profile passed, so results do not depend on the heavy queue backlog.
+    """
+    if stage == "hls":
+        tasks.convert_to_hls(video_id, mode=mode, encoder_profile=encoder_profile, publish=False)
+    else:
+        STAGES[stage](video_id, publish=False)
+
+
+def _run_case(clip_path: Path, stage: str, mode: str, media_root: Path, encoder_profile: str, results):
+    """
+    Runs one stage on a fresh Video in a forked process, so the resource
+    usage of the ffmpeg children belongs to this case alone. Transcode
+    slots are taken from a private folder, so workers of the host do not
+    delay the case. Puts the measurements into the results queue.
+    """
+    connections.close_all()
+    overrides = {"MEDIA_ROOT": str(media_root), "TRANSCODE_SLOT_DIR": str(media_root / "slots")}
+    for name, value in overrides.items():
+        setattr(core_settings, name, value)
+
+    with override_settings(**overrides):
+        _disconnect_signals()
+        video = Video(title=f"benchmark {clip_path.stem}")
+        video.file.name = f"videos/benchmark_{video.uuid}/{clip_path.name}"
+        source_path = media_root / video.file.name
+        source_path.parent.mkdir(parents=True)
+        source_path.symlink_to(clip_path)
+        video = Video.objects.bulk_create([video])[0]
+        try:
+            if stage != "probe":
+                tasks._store_video_metadata(video, source_path)
+
+            self_before = resource.getrusage(resource.RUSAGE_SELF)
+            children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+            started = time.perf_counter()
+            if stage == "probe":
+                tasks._store_video_metadata(video, source_path)
+            else:
+                _run_stage(stage, video.id, mode, encoder_profile)
+            wall_seconds = time.perf_counter() - started
+            self_after = resource.getrusage(resource.RUSAGE_SELF)
+            children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+            results.put({
+                "wall_seconds": wall_seconds,
+                "cpu_seconds": (
+                    _cpu_seconds(self_after) - _cpu_seconds(self_before)
+                    + _cpu_seconds(children_after) - _cpu_seconds(children_before)
+                ),
+                "peak_rss_mb": max(self_after.ru_maxrss, children_after.ru_maxrss) / 1024,
+                "output_bytes": _directory_size(source_path.parent, source_path),
+            })
+        finally:
+            video.delete()
+            shutil.rmtree(source_path.parent, ignore_errors=True)
+
+
+def measure(clip_path: Path, stage: str, mode: str, media_root: Path, encoder_profile: str):
+    """Measures one stage on one clip in a child process, returns None if it failed."""
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    process = context.Process(target=_run_case, args=(clip_path, stage, mode, media_root, encoder_profile, results))
+    process.start()
+    process.join()
+    return results.get() if process.exitcode == 0 and not results.empty() else None
+
+
+def compare(results: list, baseline: list, threshold: float):
+    """
+    Matches results with the baseline by clip, stage and mode.
+    Returns a list of (case, baseline seconds, seconds, relative change, regressed) tuples.
+    """
+    baseline_by_case = {(entry["clip"], entry["stage"], entry["mode"]): entry for entry in baseline}
+    comparison = []
+    for entry in results:
+        case = (entry["clip"], entry["stage"], entry["mode"])
+        if case not in baseline_by_case:
+            continue
+        before = baseline_by_case[case]["wall_seconds"]
+        change = (entry["wall_seconds"] - before) / before if before else 0
+        comparison.append((case, before, entry["wall_seconds"], change, change > threshold))
+    return comparison
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the processing stages on generated clips and compares the results with a baseline. "
+        "The cases run against a separate test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="640x360,1280x720,1920x1080")
+        parser.add_argument("--durations", default="10,60", help="clip durations in seconds")
+        parser.add_argument("--stages", default=",".join(STAGES))
+        parser.add_argument("--modes", default="single_pass,per_rendition", help=f"HLS modes of {', '.join(MODES)}")
+        parser.add_argument("--repeat", type=int, default=3, help="runs per case, the median is reported")
+        parser.add_argument(
+            "--encoder-profile", choices=list(ENCODER_PROFILES), default="balanced",
+            help="encoder profile of every HLS case, pinned so results do not depend on the queues",
+        )
+        parser.add_argument("--clip-dir", type=Path, default=Path(tempfile.gettempdir()) / "videoflix-benchmark")
+        parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"))
+        parser.add_argument("--baseline", type=Path, help="results file of an earlier run to compare with")
+        parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown reported as regression")
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        stages = options["stages"].split(",")
+        modes = options["modes"].split(",")
+        unknown = set(stages) - set(STAGES) | set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown stages or modes: {', '.join(sorted(unknown))}")
+
+        results = []
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={"default"})
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                for size in options["sizes"].split(","):
+                    for duration in map(int, options["durations"].split(",")):
+                        clip_path = generate_clip(options["clip_dir"], size, duration)
+                        for stage in stages:
+                            for mode in modes if stage == "hls" else ["-"]:
+                                measured = self._benchmark(
+                                    clip_path, stage, mode, Path(media_root), options["repeat"], options["encoder_profile"]
+                                )
+                                if measured:
+                                    entry = {"clip": clip_path.stem, "duration": duration, **measured}
+                                    entry["realtime_factor"] = round(duration / entry["wall_seconds"], 2)
+                                    results.append(entry)
+                                    self.stdout.write(
+                                        f"{clip_path.stem:>18} {stage:>9} {mode:>13} "
+                                        f"{entry['wall_seconds']:8.2f}s {entry['realtime_factor']:7.2f}x"
+                                    )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        options["output"].write_text(json.dumps({
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "host": {"cpus": multiprocessing.cpu_count(), "platform": platform.platform()},
+            "encoder_profile": options["encoder_profile"],
+            "results": results,
+        }, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}."))
+
+        if options["baseline"]:
+            self._report(results, options["baseline"], options["threshold"], options["fail_on_regression"])
+
+    def _benchmark(self, clip_path: Path, stage: str, mode: str, media_root: Path, repeat: int, encoder_profile: str):
+        """Runs a case repeat times and returns the medians, None if a run failed."""
+        runs = [measure(clip_path, stage, mode, media_root, encoder_profile) for _ in range(repeat)]
+        if not all(runs):
+            self.stderr.write(f"{clip_path.stem} {stage} {mode} failed.")
+            return None
+        return {
+            "stage": stage,
+            "mode": mode,
+            "wall_seconds": round(statistics.median(run["wall_seconds"] for run in runs), 3),
+            "cpu_seconds": round(statistics.median(run["cpu_seconds"] for run in runs), 3),
+            "peak_rss_mb": round(max(run["peak_rss_mb"] for run in runs), 1),
+            "output_bytes": runs[-1]["output_bytes"],
+        }
+
+    def _report(self, results: list, baseline_path: Path, threshold: float, fail_on_regression: bool):
+        """Prints the comparison with the baseline and fails on regressions if requested."""
+        baseline = json.loads(baseline_path.read_text())["results"]
+        regressions = 0
+        for case, before, after, change, regressed in compare(results, baseline, threshold):
+            regressions += regressed
+            line = f"{' '.join(case):>44} {before:8.2f}s -> {after:8.2f}s {change:+7.1%}"
+            self.stdout.write(self.style.ERROR(line) if regressed else line)
+        if regressions and fail_on_regression:
+            raise CommandError(f"{regressions} cases are more than {threshold:.0%} slower than the baseline.")
@@ -0,0 +1,187 @@
+import os
+import shutil
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+import django_rq
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rq import Queue
+from content_app.api.cache import catalog_cache
+from content_app.api.hashing import file_digest
+from content_app.api.tasks import (
+    _find_processed_duplicate, _probe_video_metadata, _share_processed_media, processing_jobs,
+)
+from content_app.models import CATEGORY_CHOICES, Video, VideoMetadata, video_upload_path
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".mkv", ".m4v", ".avi", ".webm"}
+
+
+def _list_directory(directory: Path):
+    """Returns the subdirectories and the video files of one directory."""
+    directories, files = [], []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(Path(entry.path))
+            elif entry.is_file() and Path(entry.name).suffix.lower() in VIDEO_EXTENSIONS:
+                files.append(Path(entry.path))
+    return directories, files
+
+
+def scan_directory(root: Path, workers: int):
+    """
+    Walks the directory tree with one thread pool task per directory,
+    so slow network mounts are listed concurrently.
+    Returns the sorted paths of all video files.
+    """
+    files = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(_list_directory, root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                directories, found = future.result()
+                files.extend(found)
+                pending |= {executor.submit(_list_directory, directory) for directory in directories}
+    return sorted(files)
+
+
+class Command(BaseCommand):
+    help = "Ingests all video files of a directory as Video objects and queues their processing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", type=Path)
+        parser.add_argument("--category", default="Other", choices=[choice for choice, _ in CATEGORY_CHOICES])
+        parser.add_argument("--move", action="store_true", help="move the files instead of copying them")
+        parser.add_argument("--workers", type=int, default=8, help="threads for scanning, probing and copying")
+        parser.add_argument("--batch-size", type=int, default=200, help="videos per database insert and enqueue")
+        parser.add_argument(
+            "--max-queued", type=int, default=500,
+            help="pause enqueueing while the heavy queue holds more jobs than this",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        if not directory.is_dir():
+            raise CommandError(f"{directory} is not a directory.")
+
+        files = scan_directory(directory, options["workers"])
+        self.stdout.write(f"Found {len(files)} video files.")
+
+        ingested = skipped = failed = 0
+        batch = []
+        seen = set()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            prepare = partial(self._prepare, category=options["category"])
+            for path, prepared in zip(files, executor.map(prepare, files)):
+                if not prepared:
+                    failed += 1
+                    self.stderr.write(f"Skipped {path}, it could not be probed.")
+                    continue
+                video, fields = prepared
+                if self._is_ingested(video, seen):
+                    skipped += 1
+                    continue
+                original = _find_processed_duplicate(video)
+                if original:
+                    fields = _share_processed_media(video, original) or fields
+                batch.append((path, video, fields, bool(original)))
+                if len(batch) >= options["batch_size"]:
+                    ingested += self._ingest_batch(batch, executor, options["move"], options["max_queued"])
+                    batch = []
+            if batch:
+                ingested += self._ingest_batch(batch, executor, options["move"], options["max_queued"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {ingested} videos, {skipped} already ingested, {failed} failed."
+        ))
+
+    def _is_ingested(self, video: Video, seen: set):
+        """
+        Checks whether a file with the same content and name was ingested
+        before or earlier in this run. A different file with a known name
+        is new, so is known content under another name, which then reuses
+        the processed media of the first video.
+        """
+        key = (video.content_hash, video.title)
+        if key in seen:
+            return True
+        seen.add(key)
+        return Video.objects.filter(content_hash=video.content_hash, title=video.title).exists()
+
+    def _prepare(self, path: Path, category: str):
+        """
+        Probes and hashes a file for a new, unsaved Video in the media folder.
+        Returns the Video and its metadata fields or None if probing failed.
+        """
+        fields = _probe_video_metadata(path)
+        if not fields:
+            return None
+
+        video = Video(
+            title=path.stem[:255], category=category, duration=int(fields["duration"]), content_hash=file_digest(path)
+        )
+        video.file.name = video_upload_path(video, path.name)
+        return video, fields
+
+    def _place(self, item: tuple, move: bool):
+        """
+        Copies or moves the file of a batch item into the media folder of its
+        video. Files whose video reuses the media of an identical processed
+        one are not copied, a moved one is removed.
+        """
+        path, video, _, reused = item
+        if reused:
+            if move:
+                path.unlink()
+            return
+        target = Path(settings.MEDIA_ROOT) / video.file.name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if move:
+            shutil.move(path, target)
+        else:
+            shutil.copy2(path, target)
+
+    def _ingest_batch(self, batch: list, executor: ThreadPoolExecutor, move: bool, max_queued: int):
+        """
+        Places the files of a batch, inserts the videos with their metadata
+        and queues the processing jobs of videos which reuse no processed
+        media. bulk_create sends no post_save signals, so the catalog cache
+        is invalidated and the jobs are enqueued here with one Redis
+        pipeline per connection.
+        Returns the number of ingested videos.
+        """
+        list(executor.map(partial(self._place, move=move), batch))
+        with transaction.atomic():
+            videos = Video.objects.bulk_create([video for _, video, _, _ in batch])
+            VideoMetadata.objects.bulk_create([VideoMetadata(video=video, **fields) for _, video, fields, _ in batch])
+        catalog_cache.invalidate()
+
+        pending = [video for _, video, _, reused in batch if not reused]
+        self._wait_for_capacity(max_queued, len(pending))
+        job_datas = defaultdict(list)
+        for video in pending:
+            for queue_name, task, enqueue_options in processing_jobs():
+                job_datas[queue_name].append(Queue.prepare_data(task, (video.id,), **enqueue_options))
+
+        pipelines = {}
+        for queue_name, datas in job_datas.items():
+            queue = django_rq.get_queue(queue_name)
+            connection_kwargs = queue.connection.connection_pool.connection_kwargs
+            address = (connection_kwargs.get("host"), connection_kwargs.get("port"), connection_kwargs.get("db"))
+            pipeline = pipelines.setdefault(address, queue.connection.pipeline())
+            queue.enqueue_many(datas, pipeline=pipeline)
+        for pipeline in pipelines.values():
+            pipeline.execute()
+
+        self.stdout.write(f"Queued {len(pending)} videos, {len(videos) - len(pending)} reuse processed media.")
+        return len(videos)
+
+    def _wait_for_capacity(self, max_queued: int, batch_size: int):
+        """Blocks while queueing the batch would grow the heavy queue beyond max_queued."""
+        queue = django_rq.get_queue("heavy")
+        while queue.count and queue.count + batch_size > max_queued:
+            time.sleep(5)
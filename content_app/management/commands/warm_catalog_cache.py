@@ -0,0 +1,58 @@
+from urllib.parse import parse_qs, urlsplit
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpRequest, QueryDict
+from rest_framework.request import Request
+from content_app.api.views import VideoViewSet
+from content_app.models import Video
+
+
+def _default_origin():
+    """Returns the origin of the absolute MEDIA_URL, the local dev server otherwise."""
+    parts = urlsplit(settings.MEDIA_URL)
+    return f"{parts.scheme}://{parts.netloc}" if parts.netloc else "http://localhost:8000"
+
+
+def _request(origin: str, query: dict = None):
+    """Builds a request for the origin as the views see it behind the proxy."""
+    parts = urlsplit(origin)
+    http_request = HttpRequest()
+    http_request.method = "GET"
+    http_request.path = "/api/video/"
+    http_request.META = {"HTTP_HOST": parts.netloc, "SERVER_PORT": str(parts.port or 443)}
+    if parts.scheme == "https" and settings.SECURE_PROXY_SSL_HEADER:
+        header, value = settings.SECURE_PROXY_SSL_HEADER
+        http_request.META[header] = value
+    http_request.GET = QueryDict(mutable=True)
+    http_request.GET.update(query or {})
+    return Request(http_request)
+
+
+class Command(BaseCommand):
+    help = "Fills the catalog cache with every list page and video payload, e.g. after a deploy."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--origin", default=_default_origin(), help="scheme and host clients use, e.g. https://example.com")
+        parser.add_argument("--page-size", help="page size the clients request, default page size if omitted")
+        parser.add_argument("--skip-videos", action="store_true", help="only warm the list pages")
+
+    def handle(self, *args, **options):
+        query = {"page_size": options["page_size"]} if options["page_size"] else {}
+        pages = 0
+        while True:
+            request = _request(options["origin"], query)
+            view = VideoViewSet(request=request, action="list", format_kwarg=None, args=(), kwargs={})
+            data = view.list(request).data
+            pages += 1
+            if not data.get("next"):
+                break
+            query["cursor"] = parse_qs(urlsplit(data["next"]).query)["cursor"][0]
+
+        videos = 0
+        if not options["skip_videos"]:
+            for video_id in Video.objects.values_list("id", flat=True).iterator():
+                request = _request(options["origin"])
+                view = VideoViewSet(request=request, action="retrieve", format_kwarg=None, args=(), kwargs={"pk": video_id})
+                view.retrieve(request, pk=video_id)
+                videos += 1
+        self.stdout.write(self.style.SUCCESS(f"Cached {pages} list pages and {videos} videos for {options['origin']}."))
@@ -29,6 +29,11 @@ def thumbnail_upload_path(instance, filename):
     return f"videos/{instance.title}_{instance.uuid}/thumbnails/{filename}"
 
 
+def trickplay_upload_path(instance, filename):
+    """Generate upload path for trickplay sprite sheets and their index."""
+    return f"videos/{instance.title}_{instance.uuid}/trickplay/{filename}"
+
+
 class Video(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     title = models.CharField(max_length=255, help_text="title of the video")
@@ -48,6 +53,16 @@ class Video(models.Model):
     )
     preview = models.FileField(upload_to=preview_upload_path, max_length=255, blank=True, null=False)
     thumbnail = models.ImageField(upload_to=thumbnail_upload_path, max_length=255, blank=True, null=True, help_text="thumbnail")
+    thumbnail_variants = models.JSONField(
+        blank=True, null=True, help_text="resized thumbnails as format to width to file path"
+    )
+    trickplay = models.FileField(
+        upload_to=trickplay_upload_path,
+        blank=True,
+        null=True,
+        help_text="WebVTT index of the trickplay sprite sheets",
+        max_length=255,
+    )
     preview_title = models.CharField(max_length=50, help_text="short preview text of video e.g. Pokemon", blank=True, null=True)
     category = models.CharField(
         choices=CATEGORY_CHOICES,
@@ -55,12 +70,92 @@ class Video(models.Model):
         help_text="Main category of the video",
     )
     created_at = models.DateTimeField(auto_now_add=True, help_text="date of creation")
+    updated_at = models.DateTimeField(auto_now=True, help_text="date of the last change")
+    content_hash = models.CharField(
+        max_length=64, blank=True, db_index=True, editable=False,
+        help_text="sha256 of the uploaded file, identical uploads share their processed media",
+    )
 
     def __str__(self):
         """Return string representation of Video."""
         return f"{self.title} ({self.get_category_display()})"
 
+    def save(self, *args, **kwargs):
+        """Save the video, updated_at is also written by saves limited to some fields."""
+        if kwargs.get("update_fields"):
+            kwargs["update_fields"] = {*kwargs["update_fields"], "updated_at"}
+        super().save(*args, **kwargs)
+
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [models.Index(fields=["-created_at", "-id"], name="video_catalog_order_idx")]
         verbose_name = "Video"
         verbose_name_plural = "Videos"
+
+
+class VideoMetadata(models.Model):
+    video = models.OneToOneField(Video, on_delete=models.CASCADE, related_name="metadata")
+    width = models.PositiveIntegerField(default=0, help_text="width of the video stream in pixels")
+    height = models.PositiveIntegerField(default=0, help_text="height of the video stream in pixels")
+    fps = models.FloatField(default=0, help_text="frames per second of the video stream")
+    video_codec = models.CharField(max_length=32, blank=True, help_text="codec of the video stream e.g. h264")
+    video_profile = models.CharField(max_length=32, blank=True, help_text="codec profile of the video stream e.g. High")
+    video_level = models.IntegerField(blank=True, null=True, help_text="codec level of the video stream e.g. 41 for 4.1")
+    pixel_format = models.CharField(max_length=32, blank=True, help_text="pixel format of the video stream e.g. yuv420p")
+    bit_depth = models.PositiveSmallIntegerField(
+        blank=True, null=True, help_text="bits per sample of the video stream, empty if the probe did not report it"
+    )
+    audio_codec = models.CharField(max_length=32, blank=True, help_text="codec of the audio stream, empty without audio")
+    bitrate = models.PositiveIntegerField(default=0, help_text="overall bitrate in bits per second")
+    duration = models.FloatField(default=0, help_text="Duration in seconds")
+    keyframe_interval = models.FloatField(
+        blank=True, null=True, help_text="average seconds between keyframes at the start of the video"
+    )
+    ladder = models.JSONField(
+        blank=True, null=True, help_text="per-title bitrate ladder as list of label, scale and bitrate"
+    )
+    encoder_profile = models.CharField(
+        max_length=16, blank=True, help_text="encoder profile of the HLS renditions e.g. fast or efficient"
+    )
+    needs_reencode = models.BooleanField(
+        default=False, help_text="renditions were encoded fast and wait for an upgrade while workers are idle"
+    )
+    probed_at = models.DateTimeField(auto_now=True, help_text="date of the last probe")
+
+    def __str__(self):
+        """Return string representation of VideoMetadata."""
+        return f"{self.video.title} ({self.width}x{self.height}, {self.video_codec})"
+
+    class Meta:
+        verbose_name = "Video metadata"
+        verbose_name_plural = "Video metadata"
+
+
+class VideoUpload(models.Model):
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    title = models.CharField(max_length=255, help_text="title of the video")
+    description = models.TextField(help_text="description of the video", blank=True, null=True)
+    preview_title = models.CharField(max_length=50, help_text="short preview text of video e.g. Pokemon", blank=True, null=True)
+    category = models.CharField(
+        choices=CATEGORY_CHOICES,
+        default="Other",
+        help_text="Main category of the video",
+    )
+    file = models.FileField(upload_to=video_upload_path, help_text="final location of the uploaded file", max_length=300)
+    length = models.PositiveBigIntegerField(help_text="total size of the upload in bytes")
+    offset = models.PositiveBigIntegerField(default=0, help_text="bytes received so far")
+    video = models.OneToOneField(
+        Video, on_delete=models.CASCADE, null=True, blank=True, related_name="upload",
+        help_text="video created once the upload is complete",
+    )
+    completed_at = models.DateTimeField(null=True, blank=True, help_text="date the last chunk was received")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="date of creation")
+
+    def __str__(self):
+        """Return string representation of VideoUpload."""
+        return f"{self.title} ({self.offset}/{self.length} bytes)"
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Video upload"
+        verbose_name_plural = "Video uploads"
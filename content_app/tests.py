@@ -44,7 +44,25 @@ class VideoTests(APITestCase):
         url = reverse('content_app:video-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertTrue(len(response.data) > 0)
+        self.assertTrue(len(response.data['results']) > 0)
+        self.assertNotIn('description', response.data['results'][0])
+
+    def test_list_videos_cursor_pagination(self):
+        """Test that the cursor pages through videos with equal creation times without gaps."""
+        from django.utils import timezone
+        self.client.force_authenticate(user=self.regular_user)
+        created_at = timezone.now()
+        for index in range(4):
+            video = Video.objects.create(title=f'Paged {index}', file=SimpleUploadedFile('paged.mp4', b'x'))
+            Video.objects.filter(pk=video.pk).update(created_at=created_at)
+        url = reverse('content_app:video-list')
+        ids = []
+        while url:
+            response = self.client.get(url, {'page_size': 2} if not ids else None)
+            ids += [video['id'] for video in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(sorted(ids), sorted(Video.objects.values_list('id', flat=True)))
+        self.assertEqual(len(ids), len(set(ids)))
 
     def test_list_videos_unauthenticated(self):
         """Test that unauthenticated users cannot list videos."""
@@ -98,3 +116,1133 @@ class VideoTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         if 'file' in response.data and response.data['file']:
             self.assertTrue(response.data['file'].startswith('https://'))
+
+    def test_status_returns_progress(self):
+        """Test that the status endpoint returns the stored transcode progress."""
+        from unittest import mock
+        self.client.force_authenticate(user=self.regular_user)
+        url = reverse('content_app:video-status', kwargs={'pk': self.video.pk})
+        progress = {"state": "processing", "stages": {"720p": {"percent": 42.0, "eta": 12.5}}}
+        with mock.patch('content_app.api.views.get_progress', return_value=progress):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['ready'])
+        self.assertEqual(response.data['stages']['720p']['eta'], 12.5)
+
+
+class VideoProbeTests(TestCase):
+    """Test suite for the persisted probe metadata."""
+    def setUp(self):
+        self.video = Video.objects.create(
+            title='Probe Video',
+            file=SimpleUploadedFile('probe.mp4', b'fake video content'),
+        )
+        self.probe_result = {
+            'streams': [
+                {'index': 0, 'codec_type': 'video', 'codec_name': 'h264', 'width': 1920, 'height': 1080,
+                 'avg_frame_rate': '24000/1001', 'r_frame_rate': '24000/1001',
+                 'profile': 'High', 'level': 40, 'pix_fmt': 'yuv420p', 'bits_per_raw_sample': '8'},
+                {'index': 1, 'codec_type': 'audio', 'codec_name': 'aac'},
+            ],
+            'format': {'duration': '95.5', 'bit_rate': '4500000'},
+            'packets': [
+                {'stream_index': 0, 'pts_time': '0.000000', 'flags': 'K__'},
+                {'stream_index': 0, 'pts_time': '1.000000', 'flags': '___'},
+                {'stream_index': 1, 'pts_time': '1.500000', 'flags': 'K__'},
+                {'stream_index': 0, 'pts_time': '2.000000', 'flags': 'K__'},
+                {'stream_index': 0, 'pts_time': '4.000000', 'flags': 'K__'},
+            ],
+        }
+
+    def test_probe_metadata_is_stored(self):
+        """Test that the probe result is parsed and stored on the video."""
+        from unittest import mock
+        from .api.tasks import _get_video_metadata
+
+        with mock.patch('ffmpeg.probe', return_value=self.probe_result) as probe:
+            metadata = _get_video_metadata(self.video, self.video.file.path)
+            _get_video_metadata(self.video, self.video.file.path)
+
+        self.assertEqual(probe.call_count, 1)
+        self.assertEqual((metadata.width, metadata.height), (1920, 1080))
+        self.assertAlmostEqual(metadata.fps, 23.976, places=3)
+        self.assertEqual(metadata.video_codec, 'h264')
+        self.assertEqual((metadata.video_profile, metadata.video_level), ('High', 40))
+        self.assertEqual((metadata.pixel_format, metadata.bit_depth), ('yuv420p', 8))
+        self.assertEqual(metadata.audio_codec, 'aac')
+        self.assertEqual(metadata.bitrate, 4500000)
+        self.assertEqual(metadata.keyframe_interval, 2.0)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.duration, 95)
+
+
+class StreamCopyTests(TestCase):
+    """Test suite for remuxing sources which already match a rung."""
+    def _metadata(self, **fields):
+        """Returns metadata of a 720p H.264 High source every player decodes, changed by fields."""
+        from .models import VideoMetadata
+        defaults = {
+            'width': 1280, 'height': 720, 'video_codec': 'h264', 'video_profile': 'High', 'video_level': 31,
+            'pixel_format': 'yuv420p', 'bit_depth': 8, 'audio_codec': 'aac', 'bitrate': 2500000,
+            'keyframe_interval': 2.0,
+        }
+        return VideoMetadata(**{**defaults, **fields})
+
+    def test_compatible_source_is_remuxed(self):
+        """Test that 8-bit 4:2:0 Baseline, Main and High sources are copied into the matching rung."""
+        from .api.tasks import HLS_RESOLUTIONS, _stream_copy_resolutions
+        for fields in [{}, {'video_profile': 'Main'}, {'video_profile': 'Constrained Baseline'}, {'bit_depth': None}]:
+            with self.subTest(**fields):
+                copy = _stream_copy_resolutions(self._metadata(**fields), HLS_RESOLUTIONS)
+                self.assertEqual(list(copy), ['720p'])
+                self.assertEqual(copy['720p']['bitrate'], '2500k')
+
+    def test_incompatible_source_is_encoded(self):
+        """Test that High 10, 4:2:2, 4:4:4, high levels and unknown profiles are not copied."""
+        from .api.tasks import HLS_RESOLUTIONS, _stream_copy_resolutions
+        cases = [
+            {'video_profile': 'High 10', 'pixel_format': 'yuv420p10le', 'bit_depth': 10},
+            {'video_profile': 'High 4:2:2', 'pixel_format': 'yuv422p'},
+            {'video_profile': 'High 4:4:4 Predictive', 'pixel_format': 'yuv444p'},
+            {'pixel_format': 'yuv420p10le'},
+            {'bit_depth': 10},
+            {'video_level': 51},
+            {'video_level': None},
+            {'video_profile': ''},
+            {'video_codec': 'hevc'},
+            {'keyframe_interval': 10.0},
+            {'bitrate': 9000000},
+        ]
+        for fields in cases:
+            with self.subTest(**fields):
+                self.assertEqual(_stream_copy_resolutions(self._metadata(**fields), HLS_RESOLUTIONS), {})
+
+
+class RenditionCheckpointTests(TestCase):
+    """Test suite for the per-rendition completion markers."""
+    def setUp(self):
+        from pathlib import Path
+        self.hls_dir = Path(tempfile.mkdtemp())
+        (self.hls_dir / '360p_000.ts').write_bytes(b'segment')
+        (self.hls_dir / '360p.m3u8').write_text(
+            '#EXTM3U\n#EXTINF:4.000000,\n360p_000.ts\n#EXT-X-ENDLIST\n'
+        )
+        self.entry = {'resolution': '640x360', 'bandwidth': '800000', 'filename': '360p.m3u8'}
+
+    def test_completed_rendition_is_reused(self):
+        """Test that a marked rendition is returned while its fingerprint matches."""
+        from .api.checkpoints import load_completed_rendition, mark_rendition_complete
+        mark_rendition_complete(self.hls_dir, '360p', 'abc', self.entry)
+        self.assertEqual(load_completed_rendition(self.hls_dir, '360p', 'abc'), self.entry)
+        self.assertIsNone(load_completed_rendition(self.hls_dir, '360p', 'changed'))
+
+    def test_partial_rendition_is_redone(self):
+        """Test that missing segments invalidate the marker and are cleaned up."""
+        from .api.checkpoints import clear_rendition, load_completed_rendition, mark_rendition_complete
+        mark_rendition_complete(self.hls_dir, '360p', 'abc', self.entry)
+        (self.hls_dir / '360p_000.ts').unlink()
+        self.assertIsNone(load_completed_rendition(self.hls_dir, '360p', 'abc'))
+        clear_rendition(self.hls_dir, '360p')
+        self.assertFalse((self.hls_dir / '360p.m3u8').exists())
+
+    def test_interrupted_single_pass_is_not_repeated(self):
+        """Test that a single pass killed midway makes the retry fall back to per-rendition encodes."""
+        from unittest import mock
+        from .api import tasks
+        source_path = self.hls_dir / 'source.mp4'
+        source_path.write_bytes(b'source')
+        with mock.patch.object(tasks, '_process_pending_resolutions', side_effect=RuntimeError('killed')):
+            with self.assertRaises(RuntimeError):
+                tasks._process_resolutions_single_pass_once(source_path, self.hls_dir, {}, (640, 360))
+        with mock.patch.object(tasks, '_process_pending_resolutions') as encode:
+            self.assertIsNone(tasks._process_resolutions_single_pass_once(source_path, self.hls_dir, {}, (640, 360)))
+        encode.assert_not_called()
+
+
+class MediaPlaylistTests(TestCase):
+    """Test suite for reading and writing media playlists."""
+    def test_byte_ranges_and_init_sections_survive_a_round_trip(self):
+        """Test that a single file fMP4 playlist is written back with the same ranges and init section."""
+        from pathlib import Path
+        from .api.playlists import parse_media_playlist, referenced_files, write_media_playlist
+        source = (
+            '#EXTM3U\n#EXT-X-VERSION:7\n#EXT-X-TARGETDURATION:4\n#EXT-X-MEDIA-SEQUENCE:0\n'
+            '#EXT-X-MAP:URI="360p.m4s",BYTERANGE="812@0"\n'
+            '#EXTINF:4.000000,\n#EXT-X-BYTERANGE:50000@812\n360p.m4s\n'
+            '#EXTINF:3.500000,\n#EXT-X-BYTERANGE:42000@50812\n360p.m4s\n'
+            '#EXT-X-ENDLIST\n'
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            playlist_path = Path(tmp) / '360p.m3u8'
+            playlist_path.write_text(source)
+            segments = parse_media_playlist(playlist_path)
+            written = write_media_playlist(Path(tmp) / 'copy.m3u8', segments).read_text()
+            self.assertEqual(parse_media_playlist(Path(tmp) / 'copy.m3u8'), segments)
+
+        init_map = {'uri': '360p.m4s', 'byterange': '812@0'}
+        self.assertEqual(segments, [
+            {'duration': 4.0, 'uri': '360p.m4s', 'byterange': '50000@812', 'map': init_map},
+            {'duration': 3.5, 'uri': '360p.m4s', 'byterange': '42000@50812', 'map': init_map},
+        ])
+        self.assertEqual(referenced_files(segments), ['360p.m4s'])
+        self.assertEqual(written.count('#EXT-X-MAP:URI="360p.m4s",BYTERANGE="812@0"\n'), 1)
+        self.assertIn('#EXTINF:3.500000,\n#EXT-X-BYTERANGE:42000@50812\n360p.m4s\n', written)
+        self.assertIn('#EXT-X-VERSION:7\n', written)
+
+    def test_byte_ranges_without_init_section_need_version_4(self):
+        """Test that MPEG-TS byte ranges round trip without an init section at protocol version 4."""
+        from pathlib import Path
+        from .api.playlists import parse_media_playlist, write_media_playlist
+        segments = [
+            {'duration': 4.0, 'uri': '360p.ts', 'byterange': '188000@0', 'map': None},
+            {'duration': 4.0, 'uri': '360p.ts', 'byterange': '94000@188000', 'map': None},
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            playlist_path = write_media_playlist(Path(tmp) / '360p.m3u8', segments)
+            written = playlist_path.read_text()
+            self.assertEqual(parse_media_playlist(playlist_path), segments)
+        self.assertIn('#EXT-X-VERSION:4\n', written)
+        self.assertNotIn('#EXT-X-MAP', written)
+
+
+class ChunkStitchingTests(TestCase):
+    """Test suite for joining the playlists of chunked encodes."""
+    def test_chunk_playlists_are_joined_and_renumbered(self):
+        """Test that segments and init sections are moved in playback order under continuous names."""
+        from pathlib import Path
+        from .api.chunks import stitch_chunk_playlists
+        from .api.playlists import parse_media_playlist
+        with tempfile.TemporaryDirectory() as tmp:
+            hls_dir = Path(tmp)
+            chunk_dir = hls_dir / 'chunks'
+            chunk_dir.mkdir()
+            chunks = [
+                ('_c0000', [(4.0, '000'), (2.5, '001')]),
+                ('_c0001', [(4.2, '000')]),
+            ]
+            for suffix, segments in chunks:
+                (chunk_dir / f'360p{suffix}_init.mp4').write_bytes(b'init' + suffix.encode())
+                lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:4', f'#EXT-X-MAP:URI="360p{suffix}_init.mp4"']
+                for duration, number in segments:
+                    (chunk_dir / f'360p{suffix}_{number}.m4s').write_bytes(f'{suffix}{number}'.encode())
+                    lines += [f'#EXTINF:{duration},', f'360p{suffix}_{number}.m4s']
+                (chunk_dir / f'360p{suffix}.m3u8').write_text('\n'.join(lines + ['#EXT-X-ENDLIST', '']))
+
+            playlist_path = stitch_chunk_playlists(hls_dir, chunk_dir, '360p', len(chunks))
+            playlist = playlist_path.read_text()
+            segments = parse_media_playlist(playlist_path)
+            self.assertEqual((hls_dir / '360p_003.mp4').read_bytes(), b'init_c0001')
+            self.assertEqual((hls_dir / '360p_004.m4s').read_bytes(), b'_c0001000')
+            self.assertEqual(list(chunk_dir.glob('*.m4s')), [])
+
+        self.assertEqual(
+            [(segment['duration'], segment['uri'], segment['map']['uri']) for segment in segments],
+            [(4.0, '360p_001.m4s', '360p_000.mp4'), (2.5, '360p_002.m4s', '360p_000.mp4'),
+             (4.2, '360p_004.m4s', '360p_003.mp4')],
+        )
+        self.assertIn('#EXT-X-TARGETDURATION:5\n', playlist)
+        self.assertIn('#EXT-X-VERSION:7\n', playlist)
+        self.assertNotIn('#EXT-X-DISCONTINUITY', playlist)
+        self.assertTrue(playlist.endswith('#EXT-X-ENDLIST\n'))
+
+
+class PerTitleLadderTests(TestCase):
+    """Test suite for the per-title bitrate ladder."""
+    def test_simple_content_gets_lower_bitrates(self):
+        """Test that low complexity lowers the bitrates below the static ladder."""
+        from .api.ladder import build_per_title_ladder
+        from .api.tasks import HLS_RESOLUTIONS
+        ladder = build_per_title_ladder(HLS_RESOLUTIONS, 600)
+        self.assertEqual([rung['label'] for rung in ladder], ['360p', '480p', '720p', '1080p'])
+        self.assertEqual(ladder[-1]['bitrate'], '1500k')
+
+    def test_redundant_rungs_are_pruned(self):
+        """Test that rungs too close to the previous bitrate are dropped."""
+        from .api.ladder import build_per_title_ladder
+        from .api.tasks import HLS_RESOLUTIONS
+        ladder = build_per_title_ladder(HLS_RESOLUTIONS, 2300)
+        self.assertEqual([rung['label'] for rung in ladder], ['360p', '720p', '1080p'])
+
+    def test_unknown_duration_keeps_the_static_ladder(self):
+        """Test that a source without duration skips the complexity probe instead of dividing by zero."""
+        from pathlib import Path
+        from unittest import mock
+        from .api import tasks
+        from .models import VideoMetadata
+        metadata = VideoMetadata(width=1280, height=720, duration=0)
+        with mock.patch.object(tasks.settings, 'HLS_PER_TITLE_LADDER', True), \
+                mock.patch.object(tasks, '_run_ffmpeg') as run_ffmpeg:
+            self.assertEqual(tasks._select_ladder(metadata, Path('source.mp4')), tasks.HLS_RESOLUTIONS)
+        run_ffmpeg.assert_not_called()
+
+
+class TrickplayTests(TestCase):
+    """Test suite for the trickplay sprite sheets."""
+    def test_vtt_maps_intervals_to_sprite_tiles(self):
+        """Test that the WebVTT cues point at the right tile of the right sheet."""
+        from pathlib import Path
+        from django.test import override_settings
+        from .api.trickplay import sprite_count, write_trickplay_vtt
+        with override_settings(TRICKPLAY_INTERVAL=10, TRICKPLAY_COLUMNS=2, TRICKPLAY_ROWS=2, TRICKPLAY_TILE_WIDTH=160):
+            with tempfile.TemporaryDirectory() as tmp:
+                vtt = write_trickplay_vtt(Path(tmp), 45, (1920, 1080)).read_text()
+                self.assertEqual(sprite_count(45), 2)
+        self.assertTrue(vtt.startswith('WEBVTT\n'))
+        self.assertIn('00:00:10.000 --> 00:00:20.000\nsprite_001.jpg#xywh=160,0,160,90', vtt)
+        self.assertIn('00:00:40.000 --> 00:00:45.000\nsprite_002.jpg#xywh=0,0,160,90', vtt)
+
+
+class IFramePlaylistTests(TestCase):
+    """Test suite for the I-frame playlists of MPEG-TS renditions."""
+    def _packet(self, pid, payload, unit_start=True, random_access=False):
+        """Builds a transport stream packet padded with an adaptation field."""
+        header = bytes([0x47, (0x40 if unit_start else 0) | pid >> 8, pid & 0xFF])
+        stuffing = 188 - 4 - len(payload)
+        if stuffing == 0 and not random_access:
+            return header + bytes([0x10]) + payload
+        adaptation = bytes([stuffing - 1, 0x40 if random_access else 0]) + b'\xff' * (stuffing - 2)
+        return header + bytes([0x30]) + adaptation + payload
+
+    def _pes(self, seconds):
+        """Builds a video PES header carrying a presentation timestamp."""
+        ticks = int(seconds * 90000)
+        pts = bytes([
+            0x21 | ((ticks >> 29) & 0x0E), (ticks >> 22) & 0xFF, ((ticks >> 14) & 0xFE) | 1,
+            (ticks >> 7) & 0xFF, ((ticks << 1) & 0xFE) | 1,
+        ])
+        return b'\x00\x00\x01\xe0\x00\x00\x80\x80\x05' + pts + b'\x00\x00\x00\x01\x09\xf0'
+
+    def test_keyframes_are_indexed_by_byte_range(self):
+        """Test that every keyframe gets a byte range up to the next video packet."""
+        from pathlib import Path
+        from .api.iframes import write_iframe_playlist
+        pat = self._packet(0, b'\x00\x00\xb0\x0d\x00\x01\xc1\x00\x00\x00\x01\xf0\x00' + b'\x00' * 4)
+        pmt = self._packet(0x1000, b'\x00\x02\xb0\x12\x00\x01\xc1\x00\x00\xe1\x00\xf0\x00\x1b\xe1\x00\xf0\x00' + b'\x00' * 4)
+        ts = (
+            pat + pmt + self._packet(0x100, self._pes(1.0), random_access=True)
+            + self._packet(0x100, b'\x00' * 184, unit_start=False)
+            + self._packet(0x100, self._pes(1.5))
+            + pat + pmt + self._packet(0x100, self._pes(3.0), random_access=True)
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            hls_dir = Path(tmp)
+            (hls_dir / '360p_000.ts').write_bytes(ts)
+            (hls_dir / '360p.m3u8').write_text(
+                '#EXTM3U\n#EXT-X-TARGETDURATION:4\n#EXTINF:4.0,\n360p_000.ts\n#EXT-X-ENDLIST\n'
+            )
+            iframe_path, bandwidth = write_iframe_playlist(hls_dir / '360p.m3u8')
+            playlist = iframe_path.read_text()
+        self.assertEqual(iframe_path.name, '360p_iframes.m3u8')
+        self.assertIn('#EXT-X-I-FRAMES-ONLY', playlist)
+        self.assertIn('#EXT-X-MAP:URI="360p_000.ts",BYTERANGE="376@0"\n#EXTINF:2.000000,\n#EXT-X-BYTERANGE:376@376', playlist)
+        self.assertIn('#EXT-X-MAP:URI="360p_000.ts",BYTERANGE="376@940"\n#EXTINF:2.000000,\n#EXT-X-BYTERANGE:188@1316', playlist)
+        self.assertEqual(bandwidth, 1504)
+
+
+class MasterPlaylistTests(TestCase):
+    """Test suite for the master playlist."""
+    def test_variants_reference_the_shared_audio_group(self):
+        """Test that audio is listed once and every variant points at its group with audio in the bandwidth."""
+        from pathlib import Path
+        from .api.tasks import _create_master_playlist
+        entries = [
+            {'resolution': '640x360', 'bandwidth': '800000', 'filename': '360p.m3u8',
+             'iframe_filename': '360p_iframes.m3u8', 'iframe_bandwidth': '90000'},
+            {'resolution': '1280x720', 'bandwidth': '2800000', 'filename': '720p.m3u8'},
+        ]
+        audio_entry = {'bandwidth': '128000', 'filename': 'audio.m3u8'}
+        with tempfile.TemporaryDirectory() as tmp:
+            master = _create_master_playlist(Path(tmp), entries, audio_entry).read_text()
+            without_audio = _create_master_playlist(Path(tmp), entries[1:]).read_text()
+
+        lines = master.splitlines()
+        self.assertEqual(lines[:2], ['#EXTM3U', '#EXT-X-VERSION:4'])
+        self.assertEqual(
+            [line for line in lines if line.startswith('#EXT-X-MEDIA:')],
+            ['#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="audio",NAME="Default",DEFAULT=YES,AUTOSELECT=YES,URI="audio.m3u8"'],
+        )
+        self.assertIn('#EXT-X-STREAM-INF:BANDWIDTH=928000,RESOLUTION=640x360,AUDIO="audio"\n360p.m3u8\n', master)
+        self.assertIn('#EXT-X-STREAM-INF:BANDWIDTH=2928000,RESOLUTION=1280x720,AUDIO="audio"\n720p.m3u8\n', master)
+        self.assertIn('#EXT-X-I-FRAME-STREAM-INF:BANDWIDTH=90000,RESOLUTION=640x360,URI="360p_iframes.m3u8"', master)
+        self.assertNotIn('#EXT-X-MEDIA', without_audio)
+        self.assertIn('#EXT-X-STREAM-INF:BANDWIDTH=2800000,RESOLUTION=1280x720\n720p.m3u8\n', without_audio)
+
+
+class TranscodeProgressTests(TestCase):
+    """Test suite for the transcode progress tracking."""
+    def test_progress_report_is_published_with_eta(self):
+        """Test that an ffmpeg progress block is stored with percent and ETA."""
+        import json
+        from unittest import mock
+        from .api.progress import TranscodeProgress
+        connection = mock.MagicMock()
+        with mock.patch('content_app.api.progress._connection', return_value=connection):
+            tracker = TranscodeProgress(1, 100)
+            report = {"frame": "480", "out_time_us": "20000000", "speed": "2.00x", "progress": "continue"}
+            tracker.publish(("720p",), report)
+            tracker.publish(("720p",), report)
+        mapping = connection.pipeline().hset.call_args.kwargs['mapping']
+        self.assertEqual(connection.pipeline().hset.call_count, 1)
+        self.assertEqual(json.loads(mapping['720p'])['percent'], 20.0)
+        self.assertEqual(json.loads(mapping['720p'])['eta'], 40.0)
+
+
+    def test_output_is_handled_while_ffmpeg_runs(self):
+        """Test that piped output is passed on with the next progress report, before the process ends."""
+        import stat
+        import sys
+        from pathlib import Path
+        from unittest import mock
+        from .api.progress import TranscodeProgress
+        from .api.thumbnails import read_ppm_frames
+        with tempfile.TemporaryDirectory() as tmp:
+            handled = Path(tmp) / 'handled'
+            script = Path(tmp) / 'ffmpeg'
+            script.write_text(
+                f'#!{sys.executable}\n'
+                'import os, sys, time\n'
+                'progress = os.fdopen(int(sys.argv[2].removeprefix("pipe:")), "w", buffering=1)\n'
+                'sys.stdout.buffer.write(b"P6\\n1 1\\n255\\n\\1\\2\\3")\n'
+                'sys.stdout.flush()\n'
+                f'while not os.path.exists({str(handled)!r}):\n'
+                '    progress.write("progress=continue\\n")\n'
+                '    time.sleep(0.05)\n'
+                'progress.write("progress=end\\n")\n'
+            )
+            script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+            def on_output(images):
+                handled.touch()
+                self.assertEqual(images[0].getpixel((0, 0)), (1, 2, 3))
+
+            with mock.patch('content_app.api.progress._connection'):
+                images = TranscodeProgress(1, 10).run(
+                    [str(script)], 'thumbnail', read_output=lambda stdout: read_ppm_frames(stdout, 1),
+                    on_output=on_output,
+                )
+            self.assertTrue(handled.exists())
+            self.assertEqual(len(images), 1)
+
+
+class TranscodeAdmissionTests(TestCase):
+    """Test suite for the transcode admission control."""
+    def test_fast_jobs_use_reserved_slot(self):
+        """Test that a fast job gets a slot while regular jobs fill their share."""
+        from unittest import mock
+        from django.test import override_settings
+        from .api import admission
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            TRANSCODE_SLOT_DIR=tmp, TRANSCODE_CORES_PER_SLOT=2, TRANSCODE_FAST_RESERVED_SLOTS=1
+        ), mock.patch.object(admission, '_cpu_count', return_value=4), \
+                mock.patch.object(admission, '_memory_mb', return_value=None):
+            self.assertEqual(admission.slot_limits(), (1, 2))
+            with admission.transcode_slot():
+                self.assertIsNone(admission._try_lock(admission.Path(tmp) / 'slot_0.lock'))
+                with mock.patch.object(admission, '_is_fast_job', return_value=True):
+                    with admission.transcode_slot():
+                        self.assertIsNone(admission._try_lock(admission.Path(tmp) / 'slot_1.lock'))
+            slot_file = admission._try_lock(admission.Path(tmp) / 'slot_0.lock')
+            self.assertIsNotNone(slot_file)
+            slot_file.close()
+
+
+class IngestVideosTests(TestCase):
+    """Test suite for the ingest_videos management command."""
+    def test_scan_finds_videos_in_subdirectories(self):
+        """Test that the concurrent scan finds video files at every depth."""
+        from pathlib import Path
+        from .management.commands.ingest_videos import scan_directory
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / 'a' / 'b').mkdir(parents=True)
+            for name in ['one.mp4', 'a/two.MKV', 'a/b/three.mov', 'a/notes.txt']:
+                (root / name).write_bytes(b'')
+            files = scan_directory(root, workers=2)
+        self.assertEqual([path.name for path in files], ['three.mov', 'two.MKV', 'one.mp4'])
+
+    def test_ingested_copy_of_processed_content_reuses_its_media(self):
+        """Test that ingested files identical to a processed video are neither copied nor transcoded."""
+        import hashlib
+        import io
+        from pathlib import Path
+        from unittest import mock
+        from django.core.management import call_command
+        from django.test import override_settings
+        from .management.commands import ingest_videos
+        from .models import VideoMetadata
+        original = Video.objects.create(
+            title='Original', file=SimpleUploadedFile('original.mp4', b'same content'),
+            hls_playlist='videos/original/hls/master.m3u8', duration=30,
+            content_hash=hashlib.sha256(b'same content').hexdigest(),
+        )
+        VideoMetadata.objects.create(video=original, width=1280, height=720, duration=30, encoder_profile='fast')
+        fields = {'width': 640, 'height': 360, 'duration': 12.0}
+        queue = mock.MagicMock(count=0)
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root), \
+                mock.patch.object(ingest_videos, '_probe_video_metadata', return_value=fields), \
+                mock.patch.object(ingest_videos.django_rq, 'get_queue', return_value=queue):
+            (Path(source) / 'copy.mp4').write_bytes(b'same content')
+            (Path(source) / 'other.mp4').write_bytes(b'other content')
+            call_command('ingest_videos', source, stdout=io.StringIO())
+            copy, other = Video.objects.get(title='copy'), Video.objects.get(title='other')
+            self.assertEqual(
+                [path.relative_to(media_root) for path in Path(media_root).glob('**/*.mp4')], [Path(other.file.name)]
+            )
+
+        self.assertEqual(
+            (copy.file.name, copy.hls_playlist.name, copy.duration),
+            (original.file.name, original.hls_playlist.name, 30),
+        )
+        self.assertEqual((copy.metadata.width, copy.metadata.encoder_profile), (1280, ''))
+        self.assertEqual(other.metadata.width, 640)
+        queued = [data for call in queue.enqueue_many.call_args_list for data in call.args[0]]
+        self.assertEqual({data.args for data in queued}, {(other.id,)})
+
+    def test_files_are_skipped_by_content_and_not_by_name(self):
+        """Test that a rerun skips ingested files while new files sharing a name are ingested."""
+        import io
+        from pathlib import Path
+        from unittest import mock
+        from django.core.management import call_command
+        from django.test import override_settings
+        from .management.commands import ingest_videos
+        fields = {'width': 640, 'height': 360, 'duration': 12.0}
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root), \
+                mock.patch.object(ingest_videos, '_probe_video_metadata', return_value=fields), \
+                mock.patch.object(ingest_videos.django_rq, 'get_queue', return_value=mock.MagicMock(count=0)):
+            for folder, content in (('drama', b'drama intro'), ('comedy', b'comedy intro')):
+                (Path(source) / folder).mkdir()
+                (Path(source) / folder / 'intro.mp4').write_bytes(content)
+            call_command('ingest_videos', Path(source) / 'drama', stdout=io.StringIO())
+            output = io.StringIO()
+            call_command('ingest_videos', source, stdout=output)
+
+        self.assertEqual(Video.objects.filter(title='intro').count(), 2)
+        self.assertIn('Ingested 1 videos, 1 already ingested, 0 failed.', output.getvalue())
+
+
+class BenchmarkTranscodeTests(TestCase):
+    """Test suite for the benchmark baseline comparison."""
+    def test_slowdown_beyond_threshold_is_a_regression(self):
+        """Test that only cases slower than the threshold are flagged."""
+        from .management.commands.benchmark_transcode import compare
+        baseline = [
+            {"clip": "640x360_10s", "stage": "hls", "mode": "single_pass", "wall_seconds": 10.0},
+            {"clip": "640x360_10s", "stage": "preview", "mode": "-", "wall_seconds": 4.0},
+        ]
+        results = [
+            {"clip": "640x360_10s", "stage": "hls", "mode": "single_pass", "wall_seconds": 12.0},
+            {"clip": "640x360_10s", "stage": "preview", "mode": "-", "wall_seconds": 4.2},
+            {"clip": "640x360_10s", "stage": "thumbnail", "mode": "-", "wall_seconds": 1.0},
+        ]
+        comparison = compare(results, baseline, threshold=0.1)
+        self.assertEqual([case for case, *_, regressed in comparison if regressed], [("640x360_10s", "hls", "single_pass")])
+        self.assertEqual(len(comparison), 2)
+
+
+class EncoderProfileTests(TestCase):
+    """Test suite for the queue depth dependent encoder profiles."""
+    def test_profile_follows_heavy_queue_backlog(self):
+        """Test that deep backlogs get the fast and idle workers the efficient profile."""
+        from django.test import override_settings
+        from .api.profiles import encoder_options, select_encoder_profile
+        with override_settings(HLS_BACKLOG_DEEP=10, HLS_BACKLOG_IDLE=0, TRANSCODE_CORES_PER_SLOT=2):
+            self.assertEqual(select_encoder_profile(0), 'efficient')
+            self.assertEqual(select_encoder_profile(4), 'balanced')
+            self.assertEqual(select_encoder_profile(25), 'fast')
+            self.assertEqual(encoder_options('fast'), {'preset': 'veryfast', 'threads': 2})
+
+    def test_retried_progressive_encode_keeps_profile_and_checkpoints(self):
+        """Test that a retry after the first rung was published ignores the grown backlog."""
+        import json
+        from pathlib import Path
+        from unittest import mock
+        from .api import tasks
+        from .models import VideoMetadata
+        video = Video.objects.create(title='Retried', file=SimpleUploadedFile('retried.mp4', b'source'))
+        metadata = VideoMetadata.objects.create(
+            video=video, width=1280, height=720, duration=10, video_codec='mpeg4', bitrate=4000000
+        )
+        hls_dir = Path(video.file.path).parent / 'hls'
+        encoded = []
+
+        def fake_run_ffmpeg(output, *args, **kwargs):
+            """Writes a one segment rendition instead of running ffmpeg, the second run is killed."""
+            command = output.compile()
+            segment_path = Path(command[command.index('-hls_segment_filename') + 1].replace('%03d', '000'))
+            encoded.append(segment_path.name.split('_')[0])
+            if encoded == ['360p', '480p']:
+                raise RuntimeError('killed')
+            segment_path.write_bytes(b'segment')
+            Path(command[-1]).write_text(f'#EXTM3U\n#EXTINF:4.0,\n{segment_path.name}\n#EXT-X-ENDLIST\n')
+
+        queue = mock.MagicMock(count=0)
+        with mock.patch.object(tasks.settings, 'HLS_ENCODE_MODE', 'progressive'), \
+                mock.patch.object(tasks.settings, 'HLS_SHARED_AUDIO', False), \
+                mock.patch.object(tasks, '_run_ffmpeg', side_effect=fake_run_ffmpeg), \
+                mock.patch.object(tasks, 'publish_state'), \
+                mock.patch.object(tasks.django_rq, 'get_queue', return_value=queue):
+            with self.assertRaises(RuntimeError):
+                tasks.convert_to_hls(video.id)
+            marker = json.loads((hls_dir / '.checkpoints' / '360p.json').read_text())
+            video.refresh_from_db()
+            self.assertTrue(video.hls_playlist)
+
+            queue.count = 50
+            tasks.convert_to_hls(video.id)
+
+        metadata.refresh_from_db()
+        self.assertEqual((metadata.encoder_profile, metadata.needs_reencode), ('efficient', False))
+        self.assertEqual(encoded, ['360p', '480p', '480p', '720p'])
+        self.assertEqual(json.loads((hls_dir / '.checkpoints' / '360p.json').read_text()), marker)
+        self.assertIn('720p.m3u8', (hls_dir / 'master.m3u8').read_text())
+
+
+class SinglePassEncodeTests(TestCase):
+    """Test suite for the single pass encode of all renditions."""
+    def setUp(self):
+        from pathlib import Path
+        from .models import VideoMetadata
+        self.video = Video.objects.create(title='Single', file=SimpleUploadedFile('single.mp4', b'source'))
+        VideoMetadata.objects.create(video=self.video, width=1280, height=720, duration=10, video_codec='mpeg4')
+        self.source_path = Path(self.video.file.path)
+        self.hls_dir = self.source_path.parent / 'hls'
+        self.hls_dir.mkdir(exist_ok=True)
+        self.commands = []
+
+    def fake_run_ffmpeg(self, output, *args, **kwargs):
+        """Writes a one segment playlist for every HLS output of the command instead of running ffmpeg."""
+        from pathlib import Path
+        command = output.compile()
+        self.commands.append(command)
+        for index, arg in enumerate(command):
+            if arg == '-hls_segment_filename':
+                segment_path = Path(command[index + 1].replace('%03d', '000'))
+                playlist = next(arg for arg in command[index:] if arg.endswith('.m3u8'))
+                segment_path.write_bytes(b'segment')
+                Path(playlist).write_text(f'#EXTM3U\n#EXTINF:4.0,\n{segment_path.name}\n#EXT-X-ENDLIST\n')
+
+    def test_one_decode_is_split_into_every_rung(self):
+        """Test that one ffmpeg process splits the decoded video into a scaled branch per rung and the sprites."""
+        from unittest import mock
+        from .api import tasks
+        with mock.patch.object(tasks, '_run_ffmpeg', side_effect=self.fake_run_ffmpeg):
+            entries = tasks._process_resolutions_single_pass(
+                self.source_path, self.hls_dir, tasks.HLS_RESOLUTIONS, (1280, 720),
+                trickplay_dir=self.source_path.parent / 'trickplay',
+            )
+
+        self.assertEqual([entry['filename'] for entry in entries], ['360p.m3u8', '480p.m3u8', '720p.m3u8'])
+        command, = self.commands
+        self.assertEqual(command.count('-i'), 1)
+        graph = command[command.index('-filter_complex') + 1]
+        self.assertIn('split=4', graph)
+        for scale in ('640:360', '854:480', '1280:720'):
+            self.assertIn(f'scale={scale}', graph)
+        self.assertEqual(sum(arg.endswith('.m3u8') for arg in command), 3)
+        self.assertTrue(command[-1].endswith('sprite_%03d.jpg'))
+
+    def test_interrupted_single_pass_falls_back_to_renditions(self):
+        """Test that the retry after a killed single pass encodes one rendition per process and clears the marker."""
+        from unittest import mock
+        from .api import tasks
+
+        def killed(output, *args, **kwargs):
+            self.commands.append(output.compile())
+            raise RuntimeError('killed')
+
+        with mock.patch.object(tasks.settings, 'HLS_ENCODE_MODE', 'single_pass'), \
+                mock.patch.object(tasks.settings, 'HLS_SHARED_AUDIO', False), \
+                mock.patch.object(tasks, 'publish_state'), \
+                mock.patch.object(tasks, 'create_trickplay') as create_trickplay, \
+                mock.patch.object(tasks.django_rq, 'get_queue', return_value=mock.MagicMock(count=0)) as get_queue:
+            with mock.patch.object(tasks, '_run_ffmpeg', side_effect=killed), self.assertRaises(RuntimeError):
+                tasks.convert_to_hls(self.video.id)
+            self.assertTrue((self.hls_dir / '.checkpoints' / f'{tasks.SINGLE_PASS_CHECKPOINT}.json').exists())
+
+            with mock.patch.object(tasks, '_run_ffmpeg', side_effect=self.fake_run_ffmpeg):
+                tasks.convert_to_hls(self.video.id)
+
+        single_pass, *renditions = self.commands
+        self.assertEqual(sum(arg.endswith('.m3u8') for arg in single_pass), 3)
+        self.assertEqual([[arg for arg in command if arg.endswith('.m3u8')] for command in renditions], [
+            [str(self.hls_dir / '360p.m3u8')], [str(self.hls_dir / '480p.m3u8')], [str(self.hls_dir / '720p.m3u8')],
+        ])
+        self.assertFalse((self.hls_dir / '.checkpoints' / f'{tasks.SINGLE_PASS_CHECKPOINT}.json').exists())
+        self.assertIn('720p.m3u8', (self.hls_dir / 'master.m3u8').read_text())
+        create_trickplay.assert_not_called()
+        get_queue.assert_called_with('default', autocommit=True)
+        get_queue.return_value.enqueue.assert_called_with(create_trickplay, self.video.id)
+
+    def test_unpublished_run_uses_the_given_mode_and_profile(self):
+        """Test that a run without publishing chunks with the pinned profile and touches neither queues nor states."""
+        from unittest import mock
+        from .api import tasks
+        with mock.patch.object(tasks.settings, 'HLS_ENCODE_MODE', 'parallel'), \
+                mock.patch.object(tasks.settings, 'HLS_SHARED_AUDIO', False), \
+                mock.patch.object(tasks, 'publish_state') as publish_state, \
+                mock.patch.object(tasks, '_process_resolutions_chunked', return_value=None) as chunked, \
+                mock.patch.object(tasks, '_run_ffmpeg', side_effect=self.fake_run_ffmpeg), \
+                mock.patch.object(tasks.django_rq, 'get_queue') as get_queue:
+            tasks.convert_to_hls(self.video.id, mode='chunked', encoder_profile='fast', publish=False)
+
+        chunked.assert_called_once()
+        self.assertEqual({opts['encoder']['preset'] for opts in chunked.call_args.args[2].values()}, {'veryfast'})
+        self.assertIn('720p.m3u8', (self.hls_dir / 'master.m3u8').read_text())
+        publish_state.assert_not_called()
+        get_queue.assert_not_called()
+        self.video.metadata.refresh_from_db()
+        self.assertEqual(self.video.metadata.encoder_profile, '')
+
+
+class ParallelEncodeTests(TestCase):
+    """Test suite for the rendition jobs of the parallel encode mode."""
+    def setUp(self):
+        from pathlib import Path
+        from .models import VideoMetadata
+        self.video = Video.objects.create(title='Parallel', file=SimpleUploadedFile('parallel.mp4', b'source'))
+        VideoMetadata.objects.create(video=self.video, width=1280, height=720, duration=10, video_codec='mpeg4')
+        self.hls_dir = Path(self.video.file.path).parent / 'hls'
+        self.hls_dir.mkdir(exist_ok=True)
+
+    def _encode(self, *labels, failing=()):
+        """Runs the rendition jobs with a fake ffmpeg which fails for the labels in failing."""
+        from pathlib import Path
+        from unittest import mock
+        import ffmpeg
+        from .api import tasks
+
+        def fake_run_ffmpeg(output, *args, **kwargs):
+            command = output.compile()
+            segment_path = Path(command[command.index('-hls_segment_filename') + 1].replace('%03d', '000'))
+            if segment_path.name.split('_')[0] in failing:
+                raise ffmpeg.Error('ffmpeg', b'', b'failed')
+            segment_path.write_bytes(b'segment')
+            Path(command[-1]).write_text(f'#EXTM3U\n#EXTINF:4.0,\n{segment_path.name}\n#EXT-X-ENDLIST\n')
+
+        with mock.patch.object(tasks, '_run_ffmpeg', side_effect=fake_run_ffmpeg):
+            for label in labels:
+                tasks.encode_rendition(self.video.id, label, tasks.HLS_RESOLUTIONS[label], (1280, 720))
+
+    def _finalize(self):
+        """Runs the finalizer and returns the published state."""
+        from unittest import mock
+        from .api import tasks
+        with mock.patch.object(tasks, 'publish_state') as publish_state, \
+                mock.patch.object(tasks, '_schedule_upgrade'):
+            tasks.finalize_hls(self.video.id, 10, tasks.HLS_RESOLUTIONS, (1280, 720))
+        return publish_state.call_args.args[1]
+
+    def test_finalizer_lists_renditions_finished_on_disk(self):
+        """Test that finished renditions are found by their markers, sorted by bandwidth, failed ones skipped."""
+        self._encode('720p', '480p', '360p', failing=('480p',))
+        self.assertEqual(self._finalize(), 'finished')
+        master = (self.hls_dir / 'master.m3u8').read_text()
+        self.assertLess(master.index('360p.m3u8'), master.index('720p.m3u8'))
+        self.assertNotIn('480p.m3u8', master)
+        self.video.refresh_from_db()
+        self.assertTrue(self.video.hls_playlist.name.endswith('hls/master.m3u8'))
+
+    def test_finalizer_fails_without_finished_rendition(self):
+        """Test that the video is marked as failed if every rendition job failed."""
+        self._encode('720p', '360p', failing=('720p', '360p'))
+        self.assertEqual(self._finalize(), 'failed')
+        self.assertFalse((self.hls_dir / 'master.m3u8').exists())
+
+    def test_renditions_are_enqueued_before_the_finalizer(self):
+        """Test that every eligible rung gets a job and the finalizer waits for all of them, failed or not."""
+        from unittest import mock
+        from rq.job import Job
+        from .api import tasks
+        queue = mock.MagicMock()
+        queue.enqueue.side_effect = lambda func, *args, **kwargs: mock.MagicMock(spec=Job, id=f'{func.__name__}:{args[1]}')
+        copy_opts = {'scale': '1280x720', 'bitrate': '2500k'}
+        with mock.patch.object(tasks.django_rq, 'get_queue', return_value=queue) as get_queue:
+            tasks._enqueue_parallel_renditions(
+                self.video.id, tasks.HLS_RESOLUTIONS, (1280, 720), 10, {'720p': copy_opts}
+            )
+
+        get_queue.assert_called_with('heavy', autocommit=True)
+        *renditions, finalizer = queue.enqueue.call_args_list
+        self.assertEqual(
+            [call.args for call in renditions],
+            [(tasks.encode_rendition, self.video.id, label, tasks.HLS_RESOLUTIONS[label], (1280, 720), copy)
+             for label, copy in (('360p', None), ('480p', None), ('720p', copy_opts))],
+        )
+        self.assertEqual(finalizer.args[0], tasks.finalize_hls)
+        dependency = finalizer.kwargs['depends_on']
+        self.assertTrue(dependency.allow_failure)
+        self.assertEqual(
+            [job.id for job in dependency.dependencies],
+            ['encode_rendition:360p', 'encode_rendition:480p', 'encode_rendition:720p'],
+        )
+
+
+class ContentDeduplicationTests(TestCase):
+    """Test suite for the content hash deduplication of uploads."""
+    def test_reupload_reuses_processed_media(self):
+        """Test that an identical upload shares the media of the original and keeps it on delete."""
+        from pathlib import Path
+        from unittest import mock
+        from .api import tasks
+        from .models import VideoMetadata
+        original = Video.objects.create(title='Original', file=SimpleUploadedFile('clip.mp4', b'same content'))
+        original.content_hash = tasks.file_digest(Path(original.file.path))
+        original.hls_playlist.name = 'videos/original/hls/master.m3u8'
+        original.save()
+        VideoMetadata.objects.create(
+            video=original, width=1280, height=720, ladder=[{'label': '720p'}],
+            encoder_profile='fast', needs_reencode=True,
+        )
+        upload = Video.objects.create(title='Upload', file=SimpleUploadedFile('clip.mp4', b'same content'))
+        upload_path = Path(upload.file.path)
+
+        with mock.patch.object(tasks.django_rq, 'get_queue') as get_queue:
+            tasks.probe_video(upload.id)
+            get_queue.assert_called_with('default', autocommit=True)
+            get_queue.return_value.enqueue.assert_called_with(tasks.hash_video, upload.id)
+            tasks.hash_video(upload.id)
+            get_queue.assert_called_with('fast', autocommit=True)
+            get_queue.return_value.enqueue.assert_called_with(tasks.probe_video, upload.id)
+        with mock.patch.object(tasks, 'enqueue_processing_jobs') as enqueue, \
+                mock.patch.object(tasks, 'publish_state'):
+            tasks.probe_video(upload.id)
+
+        enqueue.assert_not_called()
+        upload.refresh_from_db()
+        self.assertEqual(upload.content_hash, original.content_hash)
+        self.assertEqual(upload.file.name, original.file.name)
+        self.assertEqual(upload.hls_playlist.name, original.hls_playlist.name)
+        self.assertFalse(upload_path.exists())
+        metadata = VideoMetadata.objects.get(video=upload)
+        self.assertEqual(((metadata.width, metadata.height), metadata.ladder), ((1280, 720), [{'label': '720p'}]))
+        self.assertEqual((metadata.encoder_profile, metadata.needs_reencode), ('', False))
+        original.delete()
+        self.assertTrue(Path(upload.file.path).exists())
+
+    def test_deleted_duplicate_takes_only_its_own_media(self):
+        """Test that a duplicate's own folder is deleted with it and the shared one with its last user."""
+        from pathlib import Path
+        original = Video.objects.create(
+            title='Original', file=SimpleUploadedFile('clip.mp4', b'same content'),
+            preview=SimpleUploadedFile('preview.mp4', b'preview'),
+        )
+        source_folder = Path(original.file.path).parent
+        (source_folder / 'hls').mkdir()
+        (source_folder / 'hls' / 'master.m3u8').write_text('#EXTM3U\n')
+        original.hls_playlist.name = str(Path(original.file.name).parent / 'hls' / 'master.m3u8')
+        original.save()
+
+        def duplicate(title):
+            """Creates a re-upload with its own thumbnail, pointed at the media of the original."""
+            video = Video.objects.create(
+                title=title, file=SimpleUploadedFile('clip.mp4', b'same content'),
+                thumbnail=SimpleUploadedFile('own.jpg', b'thumbnail'),
+            )
+            own_folder = Path(video.file.path).parent
+            Path(video.file.path).unlink()
+            video.file.name, video.hls_playlist.name = original.file.name, original.hls_playlist.name
+            video.preview.name = original.preview.name
+            video.save()
+            return video, own_folder
+
+        first, first_folder = duplicate('First')
+        second, second_folder = duplicate('Second')
+        first.delete()
+        self.assertFalse(first_folder.exists())
+        self.assertTrue(Path(second.thumbnail.path).exists())
+
+        original.delete()
+        for path in (second.file.path, second.preview.path, second.hls_playlist.path):
+            self.assertTrue(Path(path).exists())
+
+        second.delete()
+        self.assertFalse(second_folder.exists())
+        self.assertFalse(source_folder.exists())
+
+
+class VideoUploadTests(APITestCase):
+    """Test suite for the resumable chunked upload endpoint."""
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='admin123', is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def test_chunks_are_appended_and_create_video(self):
+        """Test that chunks resume at the stored offset and the last one creates the hashed video."""
+        import base64
+        import hashlib
+        from .api.uploads import OFFSET_CONTENT_TYPE
+        content = b'chunked video content'
+        metadata = ','.join(
+            f'{key} {base64.b64encode(value.encode()).decode()}'
+            for key, value in {'filename': 'movie.mp4', 'title': 'Chunked', 'category': 'Drama'}.items()
+        )
+        response = self.client.post(
+            reverse('content_app:video-upload-list'),
+            HTTP_UPLOAD_LENGTH=str(len(content)), HTTP_UPLOAD_METADATA=metadata, HTTP_TUS_RESUMABLE='1.0.0',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        url = response['Location']
+
+        response = self.client.patch(url, content[:7], content_type=OFFSET_CONTENT_TYPE, HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response['Upload-Offset'], '7')
+        response = self.client.patch(url, content[7:], content_type=OFFSET_CONTENT_TYPE, HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.client.head(url)['Upload-Offset'], '7')
+        response = self.client.patch(url, content[7:], content_type=OFFSET_CONTENT_TYPE, HTTP_UPLOAD_OFFSET='7')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        video = Video.objects.get(title='Chunked')
+        self.assertEqual(video.category, 'Drama')
+        self.assertEqual(video.content_hash, hashlib.sha256(content).hexdigest())
+        self.assertTrue(video.file.name.endswith('/movie.mp4'))
+        with video.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+
+    def test_concurrent_final_chunk_completes_once(self):
+        """Test that a repeated final PATCH is rejected while the first one still creates the video."""
+        import base64
+        from unittest import mock
+        from .api import uploads
+        from .api.uploads import OFFSET_CONTENT_TYPE
+        content = b'final chunk'
+        metadata = ','.join(
+            f'{key} {base64.b64encode(value.encode()).decode()}'
+            for key, value in {'filename': 'race.mp4', 'title': 'Race'}.items()
+        )
+        url = self.client.post(
+            reverse('content_app:video-upload-list'),
+            HTTP_UPLOAD_LENGTH=str(len(content)), HTTP_UPLOAD_METADATA=metadata, HTTP_TUS_RESUMABLE='1.0.0',
+        )['Location']
+
+        with mock.patch('content_app.api.views.complete_upload') as complete:
+            response = self.client.patch(url, content, content_type=OFFSET_CONTENT_TYPE, HTTP_UPLOAD_OFFSET='0')
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            response = self.client.patch(
+                url, b'', content_type=OFFSET_CONTENT_TYPE, HTTP_UPLOAD_OFFSET=str(len(content))
+            )
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        complete.assert_called_once()
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_409_CONFLICT)
+
+        upload = complete.call_args.args[0]
+        with mock.patch.object(uploads.Video, 'save', side_effect=OSError), self.assertRaises(OSError):
+            uploads.complete_upload(upload)
+        response = self.client.patch(url, b'', content_type=OFFSET_CONTENT_TYPE, HTTP_UPLOAD_OFFSET=str(len(content)))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Video.objects.filter(title='Race').count(), 1)
+
+
+    def test_running_hashes_are_dropped(self):
+        """Test that outdated and abandoned running hashes do not stay in memory."""
+        import hashlib
+        import io
+        from unittest import mock
+        from django.test import override_settings
+        from .api import uploads
+        from .models import VideoUpload
+        with tempfile.TemporaryDirectory() as tmp, override_settings(MEDIA_ROOT=tmp, VIDEO_UPLOAD_HASH_TTL=60):
+            first, second = (
+                uploads.create_upload({'title': title, 'length': 4}, 'clip.mp4') for title in ('First', 'Second')
+            )
+            self.addCleanup(uploads._running_hashes.clear)
+            with mock.patch.object(uploads.time, 'monotonic', return_value=1000):
+                uploads.append_chunk(first, io.BytesIO(b'ab'))
+                uploads.append_chunk(second, io.BytesIO(b'ab'))
+            uploads._running_hashes[second.pk] = (1, hashlib.sha256(b'a'), 1000)
+
+            with mock.patch.object(uploads.time, 'monotonic', return_value=1030):
+                uploads.append_chunk(VideoUpload.objects.get(pk=second.pk), io.BytesIO(b'cd'))
+            self.assertEqual(uploads._running_hashes[second.pk][0], 4)
+            self.assertEqual(uploads._running_hashes[second.pk][1].hexdigest(), hashlib.sha256(b'abcd').hexdigest())
+
+            with mock.patch.object(uploads.time, 'monotonic', return_value=1061):
+                uploads.append_chunk(VideoUpload.objects.get(pk=second.pk), io.BytesIO(b''))
+            self.assertEqual(list(uploads._running_hashes), [second.pk])
+            uploads.discard_upload(second)
+            self.assertEqual(uploads._running_hashes, {})
+
+
+class ThumbnailVariantTests(TestCase):
+    """Test suite for the in-memory thumbnail resizing."""
+    def test_piped_frames_become_resized_variants(self):
+        """Test that PPM frames are split, the detailed one wins and no variant is upscaled."""
+        import io
+        from pathlib import Path
+        from django.test import override_settings
+        from PIL import Image
+        from .api.thumbnails import pick_thumbnail_frame, read_ppm_frames, thumbnail_srcset, write_thumbnail_variants
+        black = Image.new('RGB', (400, 200))
+        noise = Image.effect_noise((400, 200), 64).convert('RGB')
+        data = b''.join(b'P6\n400 200\n255\n' + image.tobytes() for image in (black, noise, black))
+        frames = read_ppm_frames(io.BufferedReader(io.BytesIO(data)), 2)
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(pick_thumbnail_frame(frames).tobytes(), noise.tobytes())
+
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            MEDIA_ROOT=tmp, THUMBNAIL_WIDTHS=[320, 640], THUMBNAIL_FORMATS=['webp', 'jpeg']
+        ):
+            variants = write_thumbnail_variants(frames[1], Path(tmp) / 'thumbnails', 'clip')
+            with Image.open(Path(tmp) / variants['webp']['320']) as image:
+                self.assertEqual(image.size, (320, 160))
+        self.assertEqual(variants['jpeg'], {'320': 'thumbnails/clip_320w.jpg', '400': 'thumbnails/clip_400w.jpg'})
+        self.assertEqual(
+            thumbnail_srcset(variants, lambda path: f'/media/{path}')['webp'],
+            '/media/thumbnails/clip_320w.webp 320w, /media/thumbnails/clip_400w.webp 400w',
+        )
+
+
+    def test_thumbnail_and_preview_share_one_job(self):
+        """Test that the pipeline creates thumbnail and preview in one job on the default queue."""
+        from .api import tasks
+        jobs = [(queue_name, task) for queue_name, task, _ in tasks.processing_jobs()]
+        self.assertIn(('default', tasks.create_thumbnail_and_preview), jobs)
+        self.assertFalse({tasks.create_thumbnail, tasks.create_preview} & {task for _, task in jobs})
+        self.assertNotIn('fast', [queue_name for queue_name, _ in jobs])
+
+
+class HLSMediaDeliveryTests(APITestCase):
+    """Test suite for the authenticated HLS media view."""
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+        self.user = User.objects.create_user(username='viewer', email='viewer@example.com', password='viewer123')
+        self.token = str(AccessToken.for_user(self.user))
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        hls_dir = os.path.join(self.media_root.name, 'videos', 'Clip_1', 'hls')
+        os.makedirs(hls_dir)
+        self.content = bytes(range(256)) * 40
+        with open(os.path.join(hls_dir, '720p_001.ts'), 'wb') as f:
+            f.write(self.content)
+        self.url = '/media/videos/Clip_1/hls/720p_001.ts'
+
+    def test_segments_need_login_and_support_ranges(self):
+        """Test that segments are only sent with a valid cookie, as byte ranges and revalidated by ETag."""
+        from django.test import override_settings
+        with override_settings(MEDIA_ROOT=self.media_root.name, MEDIA_DELIVERY_BACKEND='django'):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+            self.client.cookies['access_token'] = self.token
+
+            response = self.client.get(self.url, HTTP_RANGE='bytes=100-299')
+            self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+            self.assertEqual(response['Content-Range'], f'bytes 100-299/{len(self.content)}')
+            self.assertEqual(b''.join(response.streaming_content), self.content[100:300])
+
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with override_settings(MEDIA_ROOT=self.media_root.name, MEDIA_DELIVERY_BACKEND='x-accel'):
+            response = self.client.get(self.url)
+            self.assertEqual(response['X-Accel-Redirect'], '/protected-media/videos/Clip_1/hls/720p_001.ts')
+
+    def test_signed_token_replaces_login_and_is_added_to_playlists(self):
+        """Test that a folder token grants access without cookie and is carried into every playlist URI."""
+        from django.test import override_settings
+        from .api.signing import sign_media_path, verify_media_token
+        hls_dir = os.path.join(self.media_root.name, 'videos', 'Clip_1', 'hls')
+        with open(os.path.join(hls_dir, 'master.m3u8'), 'w') as f:
+            f.write('#EXTM3U\n#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aud",NAME="a",URI="audio.m3u8"\n'
+                    '#EXT-X-STREAM-INF:BANDWIDTH=1\n720p.m3u8\n')
+        with override_settings(MEDIA_ROOT=self.media_root.name, MEDIA_TOKEN_TTL=600, MEDIA_TOKEN_BUCKET=300):
+            token = sign_media_path('videos/Clip_1/hls/master.m3u8', now=1000)
+            self.assertEqual(token, sign_media_path('videos/Clip_1/hls/master.m3u8', now=1100))
+            self.assertTrue(verify_media_token(token, 'videos/Clip_1/hls/720p_001.ts', now=1500))
+            self.assertFalse(verify_media_token(token, 'videos/Clip_2/hls/720p_001.ts', now=1500))
+            self.assertFalse(verify_media_token(token, 'videos/Clip_1/hls/720p_001.ts', now=1801))
+
+            token = sign_media_path('videos/Clip_1/hls/master.m3u8')
+            response = self.client.get('/media/videos/Clip_1/hls/master.m3u8', {'token': token})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn(f'URI="audio.m3u8?token={token}"', response.content.decode())
+            self.assertIn(f'\n720p.m3u8?token={token}\n', response.content.decode())
+            response = self.client.get(self.url, {'token': token})
+            self.assertEqual(b''.join(response.streaming_content), self.content)
+            self.assertEqual(self.client.get(self.url, {'token': '1-bad'}).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CatalogCacheTests(APITestCase):
+    """Test suite for the cached catalog payloads."""
+    def setUp(self):
+        self.user = User.objects.create_user(username='cached', email='cached@example.com', password='cached123')
+        self.client.force_authenticate(user=self.user)
+        self.video = Video.objects.create(title='Cached', file=SimpleUploadedFile('cached.mp4', b'x'))
+
+    def test_payloads_are_cached_until_the_video_is_saved(self):
+        """Test that list and retrieve skip changes without signal and pick up saved changes."""
+        detail_url = reverse('content_app:video-detail', kwargs={'pk': self.video.pk})
+        list_url = reverse('content_app:video-list')
+        self.assertEqual(self.client.get(detail_url).data['title'], 'Cached')
+        self.client.get(list_url)
+
+        Video.objects.filter(pk=self.video.pk).update(title='Unsignalled')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(detail_url).data['title'], 'Cached')
+            self.assertEqual(self.client.get(list_url).data['results'][0]['title'], 'Cached')
+
+        self.video.title = 'Saved'
+        self.video.save()
+        self.assertEqual(self.client.get(detail_url).data['title'], 'Saved')
+        self.assertEqual(self.client.get(list_url).data['results'][0]['title'], 'Saved')
+
+    def test_saves_outside_the_payload_keep_the_cache(self):
+        """Test that pipeline saves of unserialized fields keep the cache and payload fields drop it."""
+        detail_url = reverse('content_app:video-detail', kwargs={'pk': self.video.pk})
+        self.client.get(detail_url)
+
+        Video.objects.filter(pk=self.video.pk).update(title='Unsignalled')
+        self.video.content_hash = 'a' * 64
+        self.video.save(update_fields=['content_hash'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(detail_url).data['title'], 'Cached')
+
+        self.video.title = 'Saved'
+        self.video.save(update_fields=['title'])
+        self.assertEqual(self.client.get(detail_url).data['title'], 'Saved')
+
+    def test_payload_read_before_an_invalidation_is_not_cached(self):
+        """Test that a retrieve racing with a save does not cache the payload of the old row."""
+        from unittest import mock
+        from .api.cache import catalog_cache, video_key
+        from .api.views import VideoViewSet
+        detail_url = reverse('content_app:video-detail', kwargs={'pk': self.video.pk})
+        get_object = VideoViewSet.get_object
+
+        def get_object_then_save(view):
+            instance = get_object(view)
+            Video.objects.filter(pk=self.video.pk).update(title='Concurrent')
+            catalog_cache.invalidate([self.video.pk])
+            return instance
+
+        with mock.patch.object(VideoViewSet, 'get_object', get_object_then_save):
+            self.assertEqual(self.client.get(detail_url).data['title'], 'Cached')
+        self.assertIsNone(catalog_cache.get(video_key(self.video.pk), 'http://testserver'))
+        self.assertEqual(self.client.get(detail_url).data['title'], 'Concurrent')
+
+
+class ConditionalRequestTests(APITestCase):
+    """Test suite for ETag and Last-Modified on the catalog endpoints."""
+    def setUp(self):
+        self.user = User.objects.create_user(username='conditional', email='conditional@example.com', password='conditional123')
+        self.client.force_authenticate(user=self.user)
+        self.video = Video.objects.create(title='Conditional', file=SimpleUploadedFile('conditional.mp4', b'x'))
+
+    def test_unchanged_payloads_are_not_modified(self):
+        """Test that matching validators get 304 without queries until the video is saved."""
+        for url in (reverse('content_app:video-detail', kwargs={'pk': self.video.pk}), reverse('content_app:video-list')):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('Last-Modified', response)
+            etag = response['ETag']
+
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            self.video.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
@@ -13,4 +13,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# The stream reads models, so it can only be imported once the apps are loaded.
+from content_app.api.streams import PROGRESS_STREAM_PATH, progress_stream
+
+
+async def application(scope, receive, send):
+    """
+    Serves the server-sent progress stream directly, so long lived
+    connections bypass the Django request cycle, and everything else with Django.
+    """
+    if scope["type"] == "http":
+        match = PROGRESS_STREAM_PATH.fullmatch(scope["path"])
+        if match:
+            return await progress_stream(scope, receive, send, int(match["video_id"]))
+    await django_application(scope, receive, send)
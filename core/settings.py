@@ -166,6 +166,93 @@ RQ_QUEUES = {
     },
 }
 
+# Video processing
+# "single_pass" decodes the source once and encodes every rendition from one
+# ffmpeg filter graph, "per_rendition" runs one ffmpeg process per rendition,
+# "parallel" enqueues one job per rendition on the heavy queue and
+# "progressive" publishes the master playlist as soon as the lowest rendition
+# is done and rewrites it after every higher one.
+HLS_ENCODE_MODE = os.environ.get("HLS_ENCODE_MODE", default="single_pass")
+# Sources at least this long (seconds) are split into keyframe aligned chunks
+# of HLS_CHUNK_DURATION seconds which are encoded by HLS_CHUNK_WORKERS
+# parallel ffmpeg processes.
+HLS_CHUNKED_MIN_DURATION = int(os.environ.get("HLS_CHUNKED_MIN_DURATION", default=1800))
+HLS_CHUNK_DURATION = int(os.environ.get("HLS_CHUNK_DURATION", default=120))
+HLS_CHUNK_WORKERS = int(os.environ.get("HLS_CHUNK_WORKERS", default=4))
+# "mpegts" writes .ts segments, "fmp4" writes CMAF segments plus an init
+# segment. HLS_SINGLE_FILE writes one media file per rendition whose segments
+# are addressed with #EXT-X-BYTERANGE.
+HLS_SEGMENT_TYPE = os.environ.get("HLS_SEGMENT_TYPE", default="mpegts")
+HLS_SINGLE_FILE = os.environ.get("HLS_SINGLE_FILE", "False") == "True"
+# Remux instead of encode the rendition an H.264/AAC source already matches
+# in size, if its bitrate is at most this many times the rendition bitrate.
+HLS_STREAM_COPY = os.environ.get("HLS_STREAM_COPY", "True") == "True"
+HLS_STREAM_COPY_MAX_BITRATE_RATIO = float(os.environ.get("HLS_STREAM_COPY_MAX_BITRATE_RATIO", default=1.5))
+# Choose the rung bitrates per title from HLS_PER_TITLE_SAMPLES short
+# constant quality (CRF) probe encodes and drop redundant rungs.
+HLS_PER_TITLE_LADDER = os.environ.get("HLS_PER_TITLE_LADDER", "False") == "True"
+HLS_PER_TITLE_SAMPLES = int(os.environ.get("HLS_PER_TITLE_SAMPLES", default=3))
+HLS_PER_TITLE_CRF = int(os.environ.get("HLS_PER_TITLE_CRF", default=23))
+# Encode the audio once into its own rendition which all video-only
+# variants reference through an #EXT-X-MEDIA audio group.
+HLS_SHARED_AUDIO = os.environ.get("HLS_SHARED_AUDIO", "True") == "True"
+# Trickplay sprite sheets: one thumbnail every TRICKPLAY_INTERVAL seconds,
+# packed into sheets of TRICKPLAY_COLUMNS x TRICKPLAY_ROWS tiles.
+TRICKPLAY_INTERVAL = int(os.environ.get("TRICKPLAY_INTERVAL", default=10))
+TRICKPLAY_COLUMNS = int(os.environ.get("TRICKPLAY_COLUMNS", default=10))
+TRICKPLAY_ROWS = int(os.environ.get("TRICKPLAY_ROWS", default=10))
+TRICKPLAY_TILE_WIDTH = int(os.environ.get("TRICKPLAY_TILE_WIDTH", default=160))
+# Transcode progress is written to Redis at most every TRANSCODE_PROGRESS_INTERVAL
+# seconds per stage and expires TRANSCODE_PROGRESS_TTL seconds after the last update.
+TRANSCODE_PROGRESS_INTERVAL = float(os.environ.get("TRANSCODE_PROGRESS_INTERVAL", default=1.0))
+TRANSCODE_PROGRESS_TTL = int(os.environ.get("TRANSCODE_PROGRESS_TTL", default=86400))
+# Admission control: at most one ffmpeg process per TRANSCODE_CORES_PER_SLOT cores
+# and TRANSCODE_MEMORY_PER_SLOT_MB of memory runs on a host, TRANSCODE_FAST_RESERVED_SLOTS
+# of these slots are kept free for jobs of the fast queue.
+TRANSCODE_CORES_PER_SLOT = int(os.environ.get("TRANSCODE_CORES_PER_SLOT", default=2))
+TRANSCODE_MEMORY_PER_SLOT_MB = int(os.environ.get("TRANSCODE_MEMORY_PER_SLOT_MB", default=1024))
+TRANSCODE_FAST_RESERVED_SLOTS = int(os.environ.get("TRANSCODE_FAST_RESERVED_SLOTS", default=1))
+TRANSCODE_SLOT_DIR = os.environ.get("TRANSCODE_SLOT_DIR", default="/tmp/videoflix-slots")
+TRANSCODE_SLOT_POLL_INTERVAL = float(os.environ.get("TRANSCODE_SLOT_POLL_INTERVAL", default=1.0))
+# Encoder profile by heavy queue backlog: "fast" from HLS_BACKLOG_DEEP queued jobs,
+# "efficient" up to HLS_BACKLOG_IDLE, "balanced" in between. Fast encodes are
+# upgraded to the efficient profile once the workers are idle.
+HLS_BACKLOG_DEEP = int(os.environ.get("HLS_BACKLOG_DEEP", default=10))
+HLS_BACKLOG_IDLE = int(os.environ.get("HLS_BACKLOG_IDLE", default=0))
+HLS_REENCODE_FAST_ENCODES = os.environ.get("HLS_REENCODE_FAST_ENCODES", "True") == "True"
+# Thumbnails are written in every width of THUMBNAIL_WIDTHS (pixels, never
+# upscaled) and every format of THUMBNAIL_FORMATS Pillow can encode. The
+# most detailed of THUMBNAIL_CANDIDATES frames one second apart is used.
+THUMBNAIL_WIDTHS = [int(width) for width in os.environ.get("THUMBNAIL_WIDTHS", default="320,640,1280").split(",")]
+THUMBNAIL_FORMATS = os.environ.get("THUMBNAIL_FORMATS", default="avif,webp,jpeg").split(",")
+THUMBNAIL_CANDIDATES = int(os.environ.get("THUMBNAIL_CANDIDATES", default=3))
+# The frames are taken from THUMBNAIL_SECONDS into the video. With
+# THUMBNAIL_FROM_PREVIEW they are taken at the start of the preview instead,
+# so the combined thumbnail and preview pass seeks the source only once.
+THUMBNAIL_SECONDS = float(os.environ.get("THUMBNAIL_SECONDS", default=5))
+THUMBNAIL_FROM_PREVIEW = os.environ.get("THUMBNAIL_FROM_PREVIEW", "False") == "True"
+# How HLS playlists and segments are sent after the access check: "django"
+# lets the app server sendfile() them, "x-accel" hands them to nginx via an
+# internal location MEDIA_ACCEL_PREFIX aliasing MEDIA_ROOT, "x-sendfile" to
+# Apache or lighttpd.
+MEDIA_DELIVERY_BACKEND = os.environ.get("MEDIA_DELIVERY_BACKEND", default="django")
+MEDIA_ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", default="/protected-media/")
+# Signed HLS URLs stay valid for at least MEDIA_TOKEN_TTL seconds, their
+# expiry is rounded up to MEDIA_TOKEN_BUCKET seconds so every viewer of a
+# video shares one token and cached playlists per bucket.
+MEDIA_TOKEN_TTL = int(os.environ.get("MEDIA_TOKEN_TTL", default=4 * 3600))
+MEDIA_TOKEN_BUCKET = int(os.environ.get("MEDIA_TOKEN_BUCKET", default=900))
+# Videos per page of the catalog list, clients may ask for up to 100.
+VIDEO_PAGE_SIZE = int(os.environ.get("VIDEO_PAGE_SIZE", default=24))
+# Serialized catalog pages and videos are cached for CATALOG_CACHE_TTL
+# seconds in Redis and in memory of every worker, which keeps at most
+# CATALOG_LOCAL_CACHE_SIZE entries for CATALOG_LOCAL_CACHE_TTL seconds.
+CATALOG_CACHE_TTL = int(os.environ.get("CATALOG_CACHE_TTL", default=3600))
+CATALOG_LOCAL_CACHE_SIZE = int(os.environ.get("CATALOG_LOCAL_CACHE_SIZE", default=512))
+CATALOG_LOCAL_CACHE_TTL = int(os.environ.get("CATALOG_LOCAL_CACHE_TTL", default=60))
+# Largest file in bytes accepted by the resumable upload endpoint.
+VIDEO_UPLOAD_MAX_SIZE = int(os.environ.get("VIDEO_UPLOAD_MAX_SIZE", default=50 * 1024 ** 3))
+
 
 
 # Password validation
@@ -259,3 +346,6 @@ SIMPLE_JWT = {
 
 PASSWORD_RESET_TIMEOUT = 60 * 60 * 24
 
+# Seconds the running hash of an upload is kept in memory after its last chunk.
+# Abandoned uploads are rehashed from their partial file if they are resumed later.
+VIDEO_UPLOAD_HASH_TTL = int(os.environ.get("VIDEO_UPLOAD_HASH_TTL", default=3600))
@@ -15,9 +15,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf.urls.static import static
 from django.conf import settings
+from content_app.api.delivery import HLS_MEDIA_PATH, hls_media
 
 api_urlpatterns =[
     path('', include('user_app.api.urls')),
@@ -28,4 +29,5 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(api_urlpatterns)),
     path('django-rq/', include('django_rq.urls')),
+    re_path(HLS_MEDIA_PATH, hls_media, name='hls-media'),
 ] + static(settings.MEDIA_URL, document_root = settings.MEDIA_ROOT)